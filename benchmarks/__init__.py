@@ -0,0 +1,11 @@
+"""Package benchmarking the Mod Manager on synthetic game installs.
+
+Usage, from the repository folder:
+
+    python -m benchmarks --output results.json
+    python -m benchmarks --binary --cfg-keys 2000 --compare baseline.json
+
+Every run generates a fresh install in a temporary folder (text or CSFFBS
+configs, a stand-in exe made of random bytes), times the operations of the
+Mod Manager on it in a separate process, and writes the timings as JSON.
+"""
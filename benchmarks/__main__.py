@@ -0,0 +1,142 @@
+"""Main Module of the benchmarks: generates an install, times it and compares against a baseline."""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from .generate import generate_install
+
+# format version of the results files
+RESULTS_VERSION = 1
+
+# slowdowns below this many seconds are timing noise, never regressions
+MIN_DELTA = 0.001
+
+# repository folder, holding the `src` package and the `modsmgr` entry point
+REPO = Path(__file__).resolve().parent.parent
+
+def main(
+    argv: list = None
+) -> int:
+    """
+    Runs the benchmarks, writes their results and compares them against a baseline.
+
+    Args:
+        argv (list) : command line arguments, defaults to sys.argv
+
+    Returns:
+        int: exit code, 1 if a regression was found
+
+    """
+    parser = argparse.ArgumentParser(prog='benchmarks', description='Benchmarks of the Mod Manager.')
+    parser.add_argument('--cfg-count', type=int,   default=0,       help='extra config files')
+    parser.add_argument('--cfg-keys',  type=int,   default=200,     help='options per config file')
+    parser.add_argument('--exe-size',  type=int,   default=4 << 20, help='size in bytes of the stand-in exe')
+    parser.add_argument('--binary',    action='store_true',         help='write configs in the CSFFBS format')
+    parser.add_argument('--repeat',    type=int,   default=5,       help='timed runs of each benchmark')
+    parser.add_argument('--output',    type=Path,                   help='results file')
+    parser.add_argument('--compare',   type=Path,                   help='baseline results file')
+    parser.add_argument('--threshold', type=float, default=0.25,    help='tolerated slowdown ratio')
+    args = parser.parse_args(argv)
+
+    params = {
+        'cfg_count': args.cfg_count,
+        'cfg_keys' : args.cfg_keys,
+        'exe_size' : args.exe_size,
+        'binary'   : args.binary,
+        'repeat'   : args.repeat
+    }
+    results = {
+        'version' : RESULTS_VERSION,
+        'params'  : params,
+        'python'  : platform.python_version(),
+        'platform': platform.platform(),
+        'results' : run_install(params)
+    }
+
+    for name, timings in results['results'].items():
+        print(f'{name:<16} min {timings["min"] * 1000:9.2f} ms   median {timings["median"] * 1000:9.2f} ms')
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as handle:
+            json.dump(results, handle, indent=1)
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as handle:
+            baseline = json.load(handle)
+        return 1 if compare(baseline, results, args.threshold) else 0
+    return 0
+
+def run_install(
+    params: dict
+) -> dict:
+    """
+    Generates a synthetic install in a temporary folder and times it, in a
+    separate process whose working directory is the install.
+
+    Args:
+        params (dict) : generation parameters and number of runs
+
+    Returns:
+        dict: benchmark name -> timings
+
+    Raises:
+        subprocess.CalledProcessError: failed benchmarks
+
+    """
+    with tempfile.TemporaryDirectory(prefix='modsmgr-bench-') as tmp_dir:
+        root = Path(tmp_dir) / 'game'
+        generate_install(root,
+                         cfg_count = params['cfg_count'],
+                         cfg_keys  = params['cfg_keys'],
+                         exe_size  = params['exe_size'],
+                         binary    = params['binary'])
+
+        output = Path(tmp_dir) / 'results.json'
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [str(REPO), os.environ.get('PYTHONPATH')])))
+        subprocess.run([sys.executable, '-m', 'benchmarks.suite', str(output), str(params['repeat'])],
+                       cwd=root, env=env, check=True)
+        with open(output, 'r', encoding='utf-8') as handle:
+            return json.load(handle)
+
+def compare(
+    baseline : dict,
+    results  : dict,
+    threshold: float
+) -> list:
+    """
+    Compares results against a baseline, on the minimum time of each benchmark.
+    A benchmark regressed if it is slower than the tolerated ratio and MIN_DELTA.
+
+    Args:
+        baseline  (dict)  : baseline results
+        results   (dict)  : current results
+        threshold (float) : tolerated slowdown ratio (e.g. 0.25 for 25%)
+
+    Returns:
+        list: names of the regressed benchmarks
+
+    """
+    if baseline.get('params') != results['params']:
+        print('> Warning: baseline generated with different parameters.')
+
+    regressions = []
+    for name, timings in results['results'].items():
+        if name not in baseline['results']:
+            continue
+        before = baseline['results'][name]['min']
+        ratio = timings['min'] / max(before, 1e-9)
+        flag = ''
+        if ratio > 1 + threshold and timings['min'] - before > MIN_DELTA:
+            regressions.append(name)
+            flag = '  REGRESSION'
+        print(f'{name:<16} {ratio:6.2f}x baseline{flag}')
+    return regressions
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,133 @@
+"""Module generating synthetic game installs for the benchmarks."""
+
+import json
+import os
+import random
+from pathlib import Path
+
+from src import csffbs
+from src import manifest
+from src import mods
+from src.config import Config
+from src.paths import PATH
+
+# manifests of the mods shipped with the Mod Manager, copied into the generated installs
+MANIFESTS = sorted((Path(__file__).resolve().parent.parent / PATH.MODS.value).glob(f'*/{manifest.MANIFEST}'))
+
+# config files the mods act on, with the options they need to find
+REQUIRED_OPTIONS = {}
+for manifest_path in MANIFESTS:
+    with open(manifest_path, 'r', encoding='utf-8') as handle:
+        for cfg_path, cfg_options in json.load(handle).get('options', {}).items():
+            REQUIRED_OPTIONS.setdefault(Path(cfg_path), []).extend(cfg_options)
+
+# options per section of the generated configs
+SECTION_SIZE = 50
+
+def generate_install(
+    root     : Path,
+    cfg_count: int  = 0,
+    cfg_keys : int  = 200,
+    exe_size : int  = 4 << 20,
+    binary   : bool = False,
+    seed     : int  = 0
+):
+    """
+    Generates a synthetic game install, with the folders and mods of the Mod Manager.
+    The configs restored by the mods are always generated, together with
+    cfg_count extra configs in the config folder.
+
+    Args:
+        root      (Path) : folder of the install, created if missing
+        cfg_count (int)  : number of extra config files
+        cfg_keys  (int)  : number of options of each config file
+        exe_size  (int)  : size in bytes of the stand-in exe
+        binary    (bool) : defines if the configs are written in the CSFFBS format
+        seed      (int)  : seed of the generated contents
+
+    Returns:
+        None
+
+    """
+    rng = random.Random(seed)
+
+    cfg_paths = list(dict.fromkeys(to_path for _, to_path in mods.ORIG_FILES if to_path.suffix == '.cfg'))
+    cfg_paths += [PATH.CFG.value / f'Extra{i:03d}.cfg' for i in range(cfg_count)]
+    for cfg_path in cfg_paths:
+        text = synthetic_config(rng, cfg_keys, REQUIRED_OPTIONS.get(cfg_path, []))
+        contents = csffbs.encode(Config(text)) if binary else text.encode('latin-1')
+        for folder in (Path(''), PATH.DEMO.value, PATH.ORIG.value):
+            __write__(root / folder / cfg_path, contents)
+
+    # the stand-in exe is never run, and the widescreen variant differs in a few bytes only
+    exe = bytearray(rng.getrandbits(8) for _ in range(min(exe_size, 1 << 16)))
+    exe = (exe * (exe_size // max(len(exe), 1) + 1))[:exe_size]
+    __write__(root / PATH.EXE.value, bytes(exe))
+    __write__(root / PATH.ORIG.value / PATH.EXE.value, bytes(exe))
+    for offset in range(0, exe_size, max(exe_size // 8, 1)):
+        exe[offset] ^= 0xff
+    __write__(root / PATH.WSFIX.value / PATH.EXE.value, bytes(exe))
+
+    for manifest_path in MANIFESTS:
+        __write__(root / PATH.MODS.value / manifest_path.parent.name / manifest.MANIFEST, manifest_path.read_bytes())
+
+    os.makedirs(root / PATH.RES_STATE.value.parent, exist_ok=True)
+
+def synthetic_config(
+    rng     : random.Random,
+    keys    : int,
+    required: list
+) -> str:
+    """
+    Generates the text of a config file, laid out like the configs of the game.
+
+    Args:
+        rng      (random.Random) : generator of the contents
+        keys     (int)           : number of options
+        required (list)          : option names that must be present
+
+    Returns:
+        str: text contents of the config file
+
+    """
+    options = [f'.{name} 0.500000' for name in required]
+    for i in range(max(keys - len(required), 0)):
+        kind = rng.randrange(4)
+        if kind == 0:
+            options.append(f'.iOpcion{i} {rng.randrange(1000)}')
+        elif kind == 1:
+            options.append(f'.fOpcion{i} {rng.uniform(-100, 100):f}')
+        elif kind == 2:
+            options.append(f'.vOpcion{i} ( {rng.uniform(0, 360):f} {rng.uniform(0, 360):f} )')
+        else:
+            options.append(f'.sOpcion{i} "valor{rng.randrange(100)}"')
+
+    lines = ['[']
+    for section in range(0, len(options), SECTION_SIZE):
+        lines.append(f' .SECCION{section // SECTION_SIZE}')
+        lines.append(' [')
+        lines.extend(f'  {option}' for option in options[section:section + SECTION_SIZE])
+        lines.append(' ]')
+    lines.append(']')
+    return '\r\n'.join(lines) + '\r\n'
+
+####################          Utility functions          ####################
+
+def __write__(
+    to_path : Path,
+    contents: bytes
+):
+    """
+    Utility function that writes a file, creating its folder.
+
+    Args:
+        to_path  (Path)  : absolute path of the file
+        contents (bytes) : contents of the file
+
+    Returns:
+        None
+
+    """
+    os.makedirs(to_path.parent, exist_ok=True)
+    with open(to_path, 'wb') as handle:
+        handle.write(contents)
@@ -0,0 +1,141 @@
+"""Module timing the operations of the Mod Manager, run from the folder of a synthetic install.
+
+The game folder is the working directory when the Mod Manager is imported, so
+this module is run in its own process: `python -m benchmarks.suite <output> <repeat>`.
+"""
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from src import backup
+from src import cache
+from src import csffbs
+from src import history
+from src import manifest
+from src import mods
+from src import plan
+from src import profile
+from src import verify
+from src.env import Environment
+from src.paths import home
+
+def run(
+    repeat: int
+) -> dict:
+    """
+    Times every benchmark in the current install.
+
+    Args:
+        repeat (int) : number of timed runs of each benchmark
+
+    Returns:
+        dict: benchmark name -> timings
+
+    """
+    results = {}
+    env = Environment()
+    mod_ids = tuple(mod.id for mod in manifest.discover())
+    options = manifest.get('noextv').options
+    cfg_paths = list(options)
+    contents = {cfg_path: (home() / cfg_path).read_bytes() for cfg_path in cfg_paths}
+
+    def reset_cold():
+        plan.apply_selection(())
+        cache.clear()
+
+    def patch_config():
+        for cfg_path, cfg_options in options.items():
+            config = csffbs.load(contents[cfg_path])
+            mods.set_config_options(config, cfg_options)
+            config.to_bytes()
+
+    def patch_file():
+        for cfg_path, cfg_options in options.items():
+            mods.change_config_options(cfg_path, cfg_options)
+
+    results['backup_variants'] = measure(backup.store_variants, repeat)
+    results['apply_cold']      = measure(lambda: plan.apply_selection(mod_ids), repeat, setup=reset_cold)
+    results['apply_warm']      = measure(lambda: plan.apply_selection(mod_ids), repeat)
+    results['restore']         = measure(lambda: plan.apply_selection(()), repeat,
+                                         setup=lambda: plan.apply_selection(mod_ids))
+    results['patch_config']    = measure(patch_config, repeat)
+    results['patch_file']      = measure(patch_file, repeat, setup=lambda: plan.apply_selection(()))
+    results['state_save']      = measure(env.save_state, repeat)
+    results['state_load']      = measure(env.load_state, repeat)
+    results['detect_state']    = measure(env.detect_state, repeat)
+    results['verify']          = measure(verify.verify, repeat)
+    profile.save('mods', mod_ids)
+    profile.save('orig', ())
+    results['profile_switch']  = measure(lambda: profile.activate('mods'), repeat,
+                                         setup=lambda: profile.activate('orig'))
+    results['history_restore'] = measure(lambda: history.restore(history.steps()[-2]['id']), repeat,
+                                         setup=lambda: plan.apply_selection(mod_ids))
+    plan.apply_selection(())
+    results['cold_start']      = measure(cold_start, repeat)
+    return results
+
+def measure(
+    func  : object,
+    repeat: int,
+    setup : object = None
+) -> dict:
+    """
+    Times the runs of a function, the setup being run untimed before each of them.
+
+    Args:
+        func   (object) : function to be timed
+        repeat (int)    : number of timed runs
+        setup  (object) : function run before each run, if any
+
+    Returns:
+        dict: minimum and median time in seconds, and number of runs
+
+    """
+    timings = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return {
+        'min'   : min(timings),
+        'median': statistics.median(timings),
+        'runs'  : repeat
+    }
+
+def cold_start():
+    """
+    Runs the headless status command in a new interpreter.
+
+    Args:
+        None
+
+    Returns:
+        None
+
+    Raises:
+        subprocess.CalledProcessError: failed command
+
+    """
+    subprocess.run([sys.executable, '-m', 'modsmgr', 'status'],
+                   cwd=home(), stdout=subprocess.DEVNULL, check=True)
+
+if __name__ == '__main__':
+    output, runs = Path(sys.argv[1]), int(sys.argv[2])
+
+    # the Mod Manager prints its progress, only the results are of interest
+    with open(os.devnull, 'w', encoding='utf-8') as devnull:
+        stdout, sys.stdout = sys.stdout, devnull
+        try:
+            timings = run(runs)
+        finally:
+            sys.stdout = stdout
+
+    with open(output, 'w', encoding='utf-8') as handle:
+        json.dump(timings, handle, indent=1)
@@ -0,0 +1,259 @@
+"""Module reading mods shipped as zip archives, one member at a time.
+
+A mod archive (e.g. `modsmgr/menus.zip`) holds a manifest and the files of the
+mod, laid out like a mod folder. Opening an archive only reads its central
+directory. Members are decompressed only when a plan needs them, and streamed
+straight into the store. The extracted-member cache maps each member to its
+stored blob, so the same asset is never decompressed twice. Manifests are
+cached by the stat signature of their archive, so unchanged archives are not
+even opened at startup.
+"""
+
+import json
+import threading
+import zipfile
+from pathlib import Path
+
+from . import store
+from . import trace
+from .paths import PATH, home, on_home_change
+from .logs import LOG
+
+# file name suffix of the mod archives
+SUFFIX = '.zip'
+
+# name of the manifest member of a mod archive
+MANIFEST = 'manifest.json'
+
+# absolute path of an archive -> (stat signature, open archive), for the archives opened so far
+__archives__ = {}
+
+# 'archive/member' -> [crc, size, digest] of every extracted member, None until loaded
+__members__ = None
+
+# serializes the opening of archives and the updates of the member cache, done by the pipeline threads
+__lock__ = threading.Lock()
+
+def split(
+    rel_path: Path
+) -> tuple:
+    """
+    Splits the path of an archive member into the archive and the member name.
+
+    Args:
+        rel_path (Path) : relative path of the file (e.g. 'modsmgr/menus.zip/menu.bik')
+
+    Returns:
+        tuple: relative path of the archive and name of the member, None if not an archive member
+
+    """
+    parts = Path(rel_path).parts
+    for i, part in enumerate(parts[:-1]):
+        if part.endswith(SUFFIX):
+            archive_path = Path(*parts[:i + 1])
+            if Path.is_file(home() / archive_path):
+                return archive_path, '/'.join(parts[i + 1:])
+    return None
+
+@trace.traced('archive')
+def read_manifest(
+    archive_path: Path
+) -> bytes:
+    """
+    Reads the manifest of a mod archive, from the manifest cache unless the
+    archive changed since it was last read.
+
+    Args:
+        archive_path (Path) : relative path of the archive
+
+    Returns:
+        bytes: contents of the manifest
+
+    Raises:
+        KeyError: no manifest in the archive
+        zipfile.BadZipFile: not a zip archive
+
+    """
+    signature = __signature__(home() / archive_path)
+    cache_path = home() / PATH.CACHE.value / 'archives.json'
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as handle:
+            manifests = json.load(handle)
+    except (FileNotFoundError, ValueError):
+        manifests = {}
+
+    key = Path(archive_path).as_posix()
+    if key in manifests and manifests[key]['signature'] == signature:
+        return manifests[key]['manifest'].encode('utf-8')
+
+    contents = __open__(archive_path).read(MANIFEST)
+    manifests[key] = {'signature': signature, 'manifest': contents.decode('utf-8')}
+    store.save_json(cache_path, manifests)
+    return contents
+
+def identity(
+    archive_path: Path,
+    member      : str
+) -> list:
+    """
+    Identifies the contents of a member of an archive from the central directory, without decompressing it.
+
+    Args:
+        archive_path (Path) : relative path of the archive
+        member       (str)  : name of the member
+
+    Returns:
+        list: CRC and size of the member
+
+    Raises:
+        FileNotFoundError: member not in the archive
+
+    """
+    info = __info__(archive_path, member)
+    return [info.CRC, info.file_size]
+
+@trace.traced('archive')
+def extract(
+    archive_path: Path,
+    member      : str
+) -> str:
+    """
+    Stores a member of an archive, decompressing it only if it wasn't extracted
+    before. Members are identified by their archive, name, CRC and size, as
+    listed in the central directory.
+
+    Args:
+        archive_path (Path) : relative path of the archive
+        member       (str)  : name of the member
+
+    Returns:
+        str: hex digest of the stored member
+
+    Raises:
+        FileNotFoundError: member not in the archive
+
+    """
+    handle = __open__(archive_path)
+    info = __info__(archive_path, member)
+    key = f'{Path(archive_path).as_posix()}/{member}'
+    members = __load_members__()
+    entry = members.get(key)
+    if entry and entry[:2] == [info.CRC, info.file_size] and Path.exists(store.blob_path(entry[2])):
+        return entry[2]
+
+    with trace.span('decompress', 'archive', path=key) as span, handle.open(info) as stream:
+        digest = store.put_stream(stream)
+        span.add(read=info.compress_size, written=info.file_size)
+    with __lock__:
+        members[key] = [info.CRC, info.file_size, digest]
+        store.save_json(home() / PATH.CACHE.value / 'members.json', members)
+    return digest
+
+####################          Utility functions          ####################
+
+def __open__(
+    archive_path: Path
+) -> zipfile.ZipFile:
+    """
+    Utility function that opens an archive, reading its central directory only
+    once per run unless the archive changed.
+
+    Args:
+        archive_path (Path) : relative path of the archive
+
+    Returns:
+        zipfile.ZipFile: the open archive
+
+    Raises:
+        zipfile.BadZipFile: not a zip archive
+
+    """
+    abs_path = home() / archive_path
+    signature = __signature__(abs_path)
+    with __lock__:
+        opened = __archives__.get(abs_path)
+        if opened is None or opened[0] != signature:
+            if opened is not None:
+                opened[1].close()
+            with trace.span('open', 'archive', path=archive_path):
+                opened = __archives__[abs_path] = (signature, zipfile.ZipFile(abs_path))
+    return opened[1]
+
+def __info__(
+    archive_path: Path,
+    member      : str
+) -> zipfile.ZipInfo:
+    """
+    Utility function that gets the central directory entry of a member of an archive.
+
+    Args:
+        archive_path (Path) : relative path of the archive
+        member       (str)  : name of the member
+
+    Returns:
+        zipfile.ZipInfo: entry of the member
+
+    Raises:
+        FileNotFoundError: member not in the archive
+
+    """
+    try:
+        return __open__(archive_path).getinfo(member)
+    except KeyError as err:
+        raise FileNotFoundError(f'{LOG.ERR_ARCHIVE_MEMBER.value} "{member}" in "{archive_path}"') from err
+
+def __load_members__() -> dict:
+    """
+    Utility function that loads the extracted-member cache.
+
+    Args:
+        None
+
+    Returns:
+        dict: 'archive/member' -> [crc, size, digest]
+
+    """
+    global __members__
+    with __lock__:
+        if __members__ is None:
+            try:
+                with open(home() / PATH.CACHE.value / 'members.json', 'r', encoding='utf-8') as handle:
+                    __members__ = json.load(handle)
+            except (FileNotFoundError, ValueError):
+                __members__ = {}
+    return __members__
+
+def __signature__(
+    abs_path: Path
+) -> list:
+    """
+    Utility function that gets the stat signature of an archive.
+
+    Args:
+        abs_path (Path) : absolute path of the archive
+
+    Returns:
+        list: size and modification time (ns) of the archive
+
+    """
+    stat = abs_path.stat()
+    return [stat.st_size, stat.st_mtime_ns]
+
+@on_home_change
+def __reset__():
+    """
+    Utility function that drops the archives opened and the member cache of the previous install, when the install root changes.
+
+    Args:
+        None
+
+    Returns:
+        None
+
+    """
+    global __members__
+    with __lock__:
+        for _, handle in __archives__.values():
+            handle.close()
+        __archives__.clear()
+        __members__ = None
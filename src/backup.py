@@ -2,23 +2,40 @@
 
 import shutil
 import os
+import subprocess
 from pathlib import Path
 
-from .paths import PATH
+from . import delta
+from . import manifest
+from . import store
+from . import trace
+from .paths import PATH, home
 from .logs import LOG
 
+# name of the store manifest recording the backups
+BACKUP_MANIFEST = 'backups'
+
+# store manifest names of the folders shipping each variant of the game files
+VARIANTS = {
+    'orig' : PATH.ORIG.value,
+    'demo' : PATH.DEMO.value,
+    'wsfix': PATH.WSFIX.value
+}
+
+@trace.traced('backup')
 def backup(
     from_path: str,
     to_path  : str = None,
     copy     : bool = True
 ):
     """
-    Makes a backup of original data (file/folder).
+    Makes a backup of original data (file/folder). The data is kept in the
+    content-addressed store, so identical files are stored only once.
     
     Args:
         from_path (str)  : relative path of original data
         to_path   (str)  : relative path of the backup
-        copy      (bool) : defines if original data should be copied or moved to the backup location
+        copy      (bool) : defines if original data should be kept or removed after the backup
 
     Returns: 
         None
@@ -32,35 +49,30 @@ def backup(
 
     print(f'> Creating backup of "{from_path}" to "{to_path}"...')
 
-    # shutil requires absolute paths instead of relative ones
-    from_path = PATH.HOME.value / from_path
-    to_path   = PATH.HOME.value / to_path
-
-    if Path.exists(from_path):
-        # remove existing backups
-        if Path.exists(to_path):
-            __delete_path__(to_path)
+    if Path.exists(home() / from_path):
+        # store the data and record it as the backup, replacing existing backups
+        entries = store.resolve(from_path)
+        store.record(BACKUP_MANIFEST, to_path, entries)
 
-        # create the backup
-        if copy:
-            __copy_path__(from_path, to_path)       # keep both original and backup
-        else:
-            __rename_path__(from_path, to_path)     # rename original into backup
+        if not copy:
+            __delete_path__(home() / from_path)     # move original into backup
     else:
         raise FileNotFoundError(LOG.ERR_BAK_NOORIG.value)
 
+@trace.traced('backup')
 def recover(
     to_path  : str,
     from_path: str = None,
     copy     : bool = True
 ):
     """
-    Recovers original data (file/folder) from a backup.
+    Recovers original data (file/folder) from a backup. Only the files whose
+    contents differ from the backup are written.
     
     Args:
         to_path   (str)  : relative path of recovered data
         from_path (str)  : relative path of the backup
-        copy      (bool) : defines if backup should be copied or moved to the recovery location
+        copy      (bool) : defines if backup should be kept or removed after the recovery
 
     Returns: 
         None
@@ -74,97 +86,130 @@ def recover(
 
     print(f'> Recovering "{to_path}" from "{from_path}"...')
 
-    # shutil requires absolute paths instead of relative ones
-    from_path = PATH.HOME.value / from_path
-    to_path   = PATH.HOME.value / to_path
-
-    if Path.exists(from_path):
-        # remove existing recovered data
-        if Path.exists(to_path):
-            __delete_path__(to_path)
-
-        # recover from the backup
-        if copy:
-            __copy_path__(from_path, to_path)      # keep both backup and recovered
-        else:
-            __rename_path__(from_path, to_path)    # rename the backup into recovered
-    else:
-        raise FileNotFoundError(LOG.ERR_BAK_NOBAK.value)
-
-####################          Utility functions          ####################
-
-def __delete_path__(
-    from_path: str
+    try:
+        entries = store.resolve(from_path)
+    except FileNotFoundError as err:
+        raise FileNotFoundError(LOG.ERR_BAK_NOBAK.value) from err
+
+    # remove recovered data that is not part of the backup
+    abs_to_path = home() / to_path
+    if '' in entries:
+        if Path.is_dir(abs_to_path):
+            __delete_path__(abs_to_path)
+    elif Path.is_dir(abs_to_path):
+        for file_path in sorted(abs_to_path.rglob('*'), reverse=True):
+            if file_path.is_file() and file_path.relative_to(abs_to_path).as_posix() not in entries:
+                __delete_path__(file_path)
+    elif Path.exists(abs_to_path):
+        __delete_path__(abs_to_path)
+
+    # recover from the backup
+    store.restore(entries, to_path)
+
+    if not copy and Path.exists(home() / from_path):
+        __delete_path__(home() / from_path)          # move the backup into recovered
+
+@trace.traced('backup')
+def store_variants(
+    prune: bool = False
 ):
     """
-    Utility function, used by backup and recover, to delete data (file/folder).
+    Stores the files of every variant folder, recording one manifest per variant.
+    Files shared between variants are stored only once.
     
     Args:
-        from_path (str) : relative path of data (files/folder) to be deleted
+        prune (bool) : defines if the variant folders should be emptied once stored
 
     Returns: 
         None
 
-    Raises:
-        FileNotFoundError: missing files to be deleted 
-
     """
-    if Path.exists(from_path):
-        if Path.is_dir(from_path):
-            shutil.rmtree(from_path)
-        else:
-            os.chmod(from_path, 0o777)
-            os.unlink(from_path)
-    else:
-        raise FileNotFoundError(LOG.ERR_BAK_DELETE.value)
+    for name, rel_path in VARIANTS.items():
+        if Path.exists(home() / rel_path):
+            print(f'> Storing variant "{name}"...')
+            store.snapshot(name, rel_path, prune=prune)
 
-def __copy_path__(
-    from_path: str,
-    to_path  : str
-):
+@trace.traced('backup')
+def migrate_variants():
     """
-    Utility function, used by backup and recover, to copy data (file/folder).
+    Moves the files of the variant folders that git doesn't track (added by the
+    user, or shipped outside of a checkout) into the store, once: they're then
+    read through the manifests of the variants. Files tracked by git, delta
+    patches and mod manifests are left in place. A variant whose stored blobs
+    don't match is left as it is.
     
     Args:
-        from_path (str) : relative path of data to be copied
-        to_path   (str) : relative path of copied data 
+        None
 
     Returns: 
         None
 
-    Raises:
-        FileNotFoundError: missing files to be copied 
+    """
+    for name, rel_path in VARIANTS.items():
+        abs_path = home() / rel_path
+        tracked = __tracked_files__(rel_path)
+        pending = [p.relative_to(abs_path).as_posix() for p in abs_path.rglob('*')
+                   if p.is_file() and p.suffix != delta.SUFFIX and p.name != manifest.MANIFEST and
+                      p.relative_to(home()).as_posix() not in tracked] if Path.is_dir(abs_path) else []
+        if not pending:
+            continue
+        print(f'> Moving variant "{name}" into the store...')
+        # keeps the files moved by an earlier migration, no longer on disk
+        prefix = Path(rel_path).as_posix() + '/'
+        entries = {key[len(prefix):]: digest for key, digest in store.load_manifest(name).items()
+                   if key.startswith(prefix)}
+        entries.update(store.resolve(rel_path))
+        store.record(name, rel_path, entries)
+        try:
+            store.prune_stored(rel_path, {suffix: entries[suffix] for suffix in pending})
+        except ValueError as err:
+            print(f'> {err}')
+
+####################          Utility functions          ####################
 
+def __tracked_files__(
+    rel_path: str
+) -> set:
     """
-    if Path.exists(from_path):
-        if Path.is_dir(from_path) and Path.is_dir(to_path):
-            shutil.copytree(from_path, to_path)
-        else:
-            shutil.copy2(from_path, to_path)
-    else:
-        raise FileNotFoundError(LOG.ERR_BAK_COPY.value)
+    Utility function, used by migrate_variants, to list the files of a folder
+    tracked by git, which must stay in place.
+    
+    Args:
+        rel_path (str) : relative path of the folder
 
-def __rename_path__(
-    from_path: str,
-    to_path  : str
+    Returns: 
+        set: posix paths, relative to the game folder, of the tracked files
+             (none if git or the repository is missing)
+
+    """
+    try:
+        listed = subprocess.run(['git', 'ls-files', '-z', '--', rel_path], cwd=home(),
+                                capture_output=True, check=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return set()
+    return {path for path in listed.decode('utf-8', 'surrogateescape').split('\0') if path}
+
+def __delete_path__(
+    from_path: str
 ):
     """
-    Utility function, used by backup and recover, to rename data (file/folder).
+    Utility function, used by backup and recover, to delete data (file/folder).
     
     Args:
-        from_path (str) : relative path of data to be renamed
-        to_path   (str) : relative path of renamed data 
+        from_path (str) : relative path of data (files/folder) to be deleted
 
     Returns: 
         None
 
     Raises:
-        FileNotFoundError: missing files to be renamed 
+        FileNotFoundError: missing files to be deleted 
 
     """
     if Path.exists(from_path):
-        if Path.exists(to_path):
-            __delete_path__(to_path)
-        from_path.rename(to_path)
+        if Path.is_dir(from_path):
+            shutil.rmtree(from_path)
+        else:
+            os.chmod(from_path, 0o777)
+            os.unlink(from_path)
     else:
-        raise FileNotFoundError(LOG.ERR_BAK_RENAME.value)
+        raise FileNotFoundError(LOG.ERR_BAK_DELETE.value)
@@ -0,0 +1,211 @@
+"""Module applying, restoring or verifying a selection of mods across many game installs.
+
+Every install (e.g. the machines of a LAN party, or disk images mounted
+locally) is handled by a worker of a process pool, which points the install
+root at it for the time of the operation. Installs share nothing, so the run
+time scales with the number of cores rather than with the number of installs.
+The output of each operation is captured, and reported with its result.
+"""
+
+import contextlib
+import io
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from . import journal
+from . import manifest
+from . import plan
+from . import trace
+from .env import Environment
+from .paths import set_home
+from .logs import LOG
+
+# operations run on each install
+ACTIONS = ('apply', 'restore', 'verify')
+
+class Result:
+    """Outcome of an operation on one install."""
+
+    __slots__ = ('root', 'action', 'ok', 'message', 'written', 'seconds', 'output')
+
+    # install root, and operation run on it
+    root  : Path
+    action: str
+
+    # defines if the operation succeeded, and the message describing its outcome
+    ok     : bool
+    message: str
+
+    # number of game files written
+    written: int
+
+    # wall time of the operation
+    seconds: float
+
+    # text printed by the operation
+    output: str
+
+    def __init__(self,
+        root  : Path,
+        action: str
+    ):
+        """
+        Constructor method to initialize the result of an operation, failed until it succeeds.
+
+        Args:
+            root   (Path) : install root
+            action (str)  : operation run on the install
+
+        Returns:
+            None
+
+        """
+        self.root = root
+        self.action = action
+        self.ok = False
+        self.message = ''
+        self.written = 0
+        self.seconds = 0.0
+        self.output = ''
+
+    def __str__(self) -> str:
+        """Describes the result."""
+        return f'{"ok  " if self.ok else "FAIL"} {self.root}: {self.message} ({self.seconds:.2f} s)'
+
+def run(
+    action : str,
+    mod_ids: tuple,
+    roots  : list,
+    workers: int    = None,
+    report : object = print
+) -> list:
+    """
+    Runs an operation on many installs, on a pool of worker processes. Roots
+    are resolved, an install given twice (e.g. through a link) running once.
+
+    Args:
+        action  (str)    : 'apply', 'restore' or 'verify'
+        mod_ids (tuple)  : names of the mods to be applied or verified, none for the original files
+        roots   (list)   : install roots
+        workers (int)    : number of worker processes, the number of cores if None
+        report  (object) : function called with each result as soon as it's known, if any
+
+    Returns:
+        list: results, in the order of the resolved install roots
+
+    Raises:
+        ValueError: unknown operation
+
+    """
+    if action not in ACTIONS:
+        raise ValueError(f'{LOG.ERR_BATCH_ACTION.value} "{action}"')
+    roots = list(dict.fromkeys(Path(os.path.realpath(root)) for root in roots))
+    workers = min(workers or os.cpu_count() or 1, max(len(roots), 1))
+
+    results = {}
+    with ProcessPoolExecutor(max_workers=workers, initializer=trace.enable_worker) as pool:
+        futures = {pool.submit(run_install, action, tuple(mod_ids), root): root for root in roots}
+        for future in as_completed(futures):
+            result = future.result()
+            results[futures[future]] = result
+            if report is not None:
+                report(result)
+    return [results[root] for root in roots]
+
+def run_install(
+    action : str,
+    mod_ids: tuple,
+    root   : Path
+) -> Result:
+    """
+    Runs an operation on one install, capturing its output. The install root
+    is restored afterwards, so a worker can handle several installs in turn.
+
+    Args:
+        action  (str)   : 'apply', 'restore' or 'verify'
+        mod_ids (tuple) : names of the mods to be applied or verified
+        root    (Path)  : install root
+
+    Returns:
+        Result: outcome of the operation
+
+    """
+    result = Result(root, action)
+    output = io.StringIO()
+    start = time.perf_counter()
+    previous = set_home(root)
+    try:
+        with contextlib.redirect_stdout(output):
+            if not Path.is_dir(root):
+                raise FileNotFoundError(f'{LOG.ERR_BATCH_ROOT.value} "{root}"')
+            journal.recover()
+            if action == 'verify':
+                expected = tuple(mod.id for mod in manifest.selection(mod_ids))
+                applied = plan.applied_selection([expected])
+                result.ok = applied == expected
+                result.message = __describe__(applied) if result.ok else \
+                                 f'{LOG.WARN_BATCH_MISMATCH.value} {__describe__(applied)}'
+            else:
+                selection = mod_ids if action == 'apply' else ()
+                result.written = len(plan.apply_selection(selection))
+                env = Environment()
+                try:
+                    env.load_state()
+                except FileNotFoundError:
+                    pass
+                env.select_mods(selection)
+                env.save_state()
+                result.ok = True
+                result.message = plan.selection_message(selection)
+    except (KeyError, ValueError) as err:
+        result.message = str(err.args[0])
+    except OSError as err:
+        result.message = str(err)
+    except Exception as err:
+        # any other failure is the install's own, the rest of the batch going on
+        result.message = f'{type(err).__name__}: {err}'
+    finally:
+        set_home(previous)
+        result.seconds = time.perf_counter() - start
+        result.output = output.getvalue()
+    return result
+
+def summary(
+    results: list
+) -> str:
+    """
+    Summarizes the results of an operation on many installs.
+
+    Args:
+        results (list) : results of the installs
+
+    Returns:
+        str: number of installs succeeded and failed, files written and total time
+
+    """
+    failed = sum(1 for result in results if not result.ok)
+    written = sum(result.written for result in results)
+    seconds = sum(result.seconds for result in results)
+    return (f'{len(results) - failed}/{len(results)} installs ok, {failed} failed, '
+            f'{written} files written, {seconds:.2f} s of work')
+
+####################          Utility functions          ####################
+
+def __describe__(
+    selection: tuple
+) -> str:
+    """
+    Utility function that describes the selection of mods found on an install.
+
+    Args:
+        selection (tuple) : names of the applied mods, None if matching no selection
+
+    Returns:
+        str: description of the selection
+
+    """
+    if selection is None:
+        return LOG.WARN_STATE_DRIFT.value
+    return ' '.join(selection) or '(original)'
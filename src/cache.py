@@ -0,0 +1,292 @@
+"""Module caching the fully materialized game files of each combination of mods."""
+
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+
+from . import archive
+from . import store
+from . import trace
+from .paths import PATH, home
+
+# bump when the way plans are built changes, to invalidate every cached entry
+CACHE_VERSION = 3
+
+# size bounds of the cache, evicting the least recently used entries
+MAX_ENTRIES = 16
+MAX_BYTES   = 512 << 20
+
+@trace.traced('cache')
+def selection_key(
+    selected: tuple,
+    compiled: tuple
+) -> str:
+    """
+    Computes the cache key of a combination of mods, from the digests of their
+    manifests and of their source files. Source digests are stat-cached, so the
+    key changes (and the entry is rebuilt) whenever a manifest or a source file changes.
+
+    Args:
+        selected (tuple) : selected mods, in the order they're applied
+        compiled (tuple) : compiled plan of the mods, as (files, patches, options, tables, conflicts)
+
+    Returns:
+        str: hex digest identifying the materialized files
+
+    Raises:
+        FileNotFoundError: missing source files
+
+    """
+    files, patches = compiled[:2]
+    sources = [[Path(from_path).as_posix(), Path(to_path).as_posix(), source_identity(from_path)]
+               for from_path, to_path in files]
+    sources += [[Path(delta_path).as_posix(), Path(to_path).as_posix(), source_identity(delta_path)]
+                for delta_path, to_path in patches]
+    manifests = [[mod.id, mod.digest] for mod in selected]
+    store.save_index()
+
+    description = json.dumps([CACHE_VERSION, sources, manifests], sort_keys=True)
+    return hashlib.sha256(description.encode('utf-8')).hexdigest()
+
+@trace.traced('cache')
+def load(
+    key: str
+) -> dict:
+    """
+    Loads a cached combination of mods, marking it as the most recently used.
+
+    Args:
+        key (str) : cache key of the combination
+
+    Returns:
+        dict: relative path -> digest of the stored contents, None if not cached
+
+    """
+    index = __load_index__()
+    if key not in index:
+        return None
+    try:
+        with open(__entry_path__(key), 'r', encoding='utf-8') as handle:
+            entries = json.load(handle)
+    except (FileNotFoundError, ValueError):
+        return None
+    if not all(Path.exists(store.blob_path(digest)) for digest in entries.values()):
+        return None
+
+    index[key]['used'] = time.time()
+    __save_index__(index)
+    return entries
+
+@trace.traced('cache')
+def save(
+    key    : str,
+    plan   : dict,
+    mod_ids: tuple = ()
+) -> dict:
+    """
+    Stores the planned contents of a combination of mods in the cache,
+    evicting the least recently used combinations beyond the size bounds.
+
+    Args:
+        key     (str)   : cache key of the combination
+        plan    (dict)  : target contents (bytes), or digest (str) of the stored contents, for each relative path
+        mod_ids (tuple) : names of the mods of the combination
+
+    Returns:
+        dict: relative path -> digest of the stored contents
+
+    """
+    entries = {Path(rel_path).as_posix(): contents if isinstance(contents, str) else store.put_bytes(contents)
+               for rel_path, contents in plan.items()}
+    store.save_json(__entry_path__(key), entries)
+
+    index = __load_index__()
+    index[key] = {
+        'used': time.time(),
+        'blobs': {digest: os.stat(store.blob_path(digest)).st_size for digest in set(entries.values())},
+        'mods': list(mod_ids)
+    }
+    __evict__(index, keep=key)
+    __save_index__(index)
+    return entries
+
+def selections() -> list:
+    """
+    Gets the combinations of mods in the cache, the most recently used first.
+
+    Args:
+        None
+
+    Returns:
+        list: names of the mods of each combination, as tuples
+
+    """
+    index = __load_index__()
+    return [tuple(index[key].get('mods', ())) for key in sorted(index, key=lambda k: -index[k]['used'])]
+
+def clear():
+    """
+    Evicts every cached combination of mods.
+
+    Args:
+        None
+
+    Returns:
+        None
+
+    """
+    index = __load_index__()
+    for key in list(index):
+        __discard__(index, key)
+    __save_index__(index)
+
+def source_identity(
+    rel_path: Path
+) -> object:
+    """
+    Identifies the contents of a source file: members of mod archives by their
+    central directory entry, so that they're not decompressed, the other files
+    by their digest.
+
+    Args:
+        rel_path (Path) : relative path of the source file
+
+    Returns:
+        object: hex digest, or [crc, size] of an archive member
+
+    Raises:
+        FileNotFoundError: missing source file
+
+    """
+    member = archive.split(rel_path)
+    if member is not None:
+        return archive.identity(*member)
+    return store.resolve(rel_path)['']
+
+####################          Utility functions          ####################
+
+def __evict__(
+    index: dict,
+    keep : str
+):
+    """
+    Utility function that evicts the least recently used entries beyond the size bounds,
+    the blobs shared by several entries being counted once.
+
+    Args:
+        index (dict) : cache index to be updated
+        keep  (str)  : key of the entry that must not be evicted
+
+    Returns:
+        None
+
+    """
+    for key in sorted(index, key=lambda k: index[k]['used']):
+        if len(index) <= MAX_ENTRIES and __size__(index) <= MAX_BYTES:
+            break
+        if key != keep:
+            print(f'> Evicting cached mods "{key[:12]}"...')
+            __discard__(index, key)
+
+def __size__(
+    index: dict
+) -> int:
+    """
+    Utility function that gets the size of the blobs referred to by the cache, each counted once.
+
+    Args:
+        index (dict) : cache index
+
+    Returns:
+        int: bytes
+
+    """
+    blobs = {}
+    size = 0
+    for entry in index.values():
+        if 'blobs' in entry:
+            blobs.update(entry['blobs'])
+        else:
+            size += entry.get('size', 0)            # entries saved by earlier releases only know their own size
+    return size + sum(blobs.values())
+
+def __discard__(
+    index: dict,
+    key  : str
+):
+    """
+    Utility function that removes a cache entry, with the stored blobs no one else refers to.
+
+    Args:
+        index (dict) : cache index to be updated
+        key   (str)  : key of the entry
+
+    Returns:
+        None
+
+    """
+    index.pop(key, None)
+    entry_path = __entry_path__(key)
+    try:
+        with open(entry_path, 'r', encoding='utf-8') as handle:
+            digests = set(json.load(handle).values())
+        os.unlink(entry_path)
+    except (FileNotFoundError, ValueError):
+        return
+
+    for other in index:
+        try:
+            with open(__entry_path__(other), 'r', encoding='utf-8') as handle:
+                digests -= set(json.load(handle).values())
+        except (FileNotFoundError, ValueError):
+            pass
+    store.discard(digests)
+
+def __entry_path__(
+    key: str
+) -> Path:
+    """
+    Utility function that gets the absolute path of a cache entry.
+
+    Args:
+        key (str) : cache key of the combination
+
+    Returns:
+        Path: absolute path of the entry
+
+    """
+    return home() / PATH.CACHE.value / f'{key}.json'
+
+def __load_index__() -> dict:
+    """
+    Utility function that loads the cache index.
+
+    Args:
+        None
+
+    Returns:
+        dict: cache key -> {'used': last use timestamp, 'blobs': digest -> bytes, 'mods': mod names}
+
+    """
+    try:
+        with open(home() / PATH.CACHE.value / 'index.json', 'r', encoding='utf-8') as handle:
+            return json.load(handle)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+def __save_index__(
+    index: dict
+):
+    """
+    Utility function that saves the cache index.
+
+    Args:
+        index (dict) : cache index
+
+    Returns:
+        None
+
+    """
+    store.save_json(home() / PATH.CACHE.value / 'index.json', index)
@@ -0,0 +1,536 @@
+"""Module implementing the command line interface of the Mod Manager.
+
+Each command imports the modules it needs, so that quick commands (e.g.
+status) don't pay for loading the store, the planner or the GUI, and commands
+without arguments don't even build the parser.
+"""
+
+import os
+import sys
+from pathlib import Path
+
+from . import trace
+from .paths import PATH, home
+from .logs import LOG
+
+# commands taking no arguments, dispatched without building the parser
+QUICK_COMMANDS = ('status', 'mods', 'run')
+
+def main(
+    argv: list = None
+) -> int:
+    """
+    Runs the command given on the command line, or the GUI if no command is given.
+    The GUI modules (tkinter, Pillow) are only imported when the GUI is requested.
+
+    Args:
+        argv (list) : command line arguments, defaults to sys.argv
+
+    Returns:
+        int: exit code
+
+    """
+    argv = sys.argv[1:] if argv is None else argv
+    # commands without arguments skip building the parser, which takes longer than they do
+    if len(argv) == 1 and argv[0] in QUICK_COMMANDS:
+        command, args = argv[0], None
+    else:
+        args = __parser__().parse_args(argv)
+        command = args.command
+        if args.trace:
+            trace.enable(args.trace)
+
+    # completes an apply interrupted by a crash, before anything else reads the game files
+    if Path.exists(home() / PATH.JOURNAL.value) or Path.exists(home() / PATH.STAGING.value):
+        from . import journal
+        journal.recover()
+
+    with trace.span(command or 'gui', 'cli'):
+        if command in (None, 'gui'):
+            from .gui import GUI
+            GUI()
+            return 0
+        if command == 'apply':
+            return apply_mods(tuple(args.mods))
+        if command == 'restore':
+            return apply_mods(())
+        if command == 'status':
+            return status()
+        if command == 'mods':
+            return list_mods()
+        if command == 'verify':
+            return verify_files(args.all)
+        if command in ('get', 'find'):
+            return find_keys(args.key, args.file, command == 'get')
+        if command == 'set':
+            return set_keys(args.values, args.file)
+        if command == 'profile':
+            return manage_profiles(args.action, getattr(args, 'name', None), tuple(getattr(args, 'mods', ())))
+        if command == 'history':
+            return manage_history(args.action, getattr(args, 'step', None))
+        if command == 'batch':
+            return run_batch(args.action, tuple(args.mods), args.root, args.roots_file, args.workers)
+        if command == 'make-delta':
+            return make_delta(args.source, args.target, args.output)
+        if command == 'migrate':
+            return migrate()
+        return run_game()
+
+def apply_mods(
+    mod_ids: tuple
+) -> int:
+    """
+    Applies a selection of mods and saves the resulting environment.
+
+    Args:
+        mod_ids (tuple) : names of the mods, none to restore the original files
+
+    Returns:
+        int: exit code
+
+    """
+    from . import plan
+
+    env = __load_environment__()
+    try:
+        plan.apply_selection(mod_ids)
+        env.select_mods(mod_ids)
+        env.save_state()
+    except KeyError as err:
+        print(err.args[0])
+        return 1
+    except OSError as err:
+        print(str(err))
+        return 1
+    print(plan.selection_message(mod_ids))
+    return 0
+
+def status() -> int:
+    """
+    Prints the state of the mods actually applied onto the game files. The
+    saved state is trusted when the game files are still the ones it recorded,
+    which takes a stat sweep; otherwise the applied mods are detected and the
+    state is saved again.
+
+    Args:
+        None
+
+    Returns:
+        int: exit code
+
+    """
+    from . import state
+
+    try:
+        saved = state.load()
+    except (FileNotFoundError, ValueError):
+        saved = None
+
+    if saved is not None and state.is_current(saved):
+        flags, names = saved['flags'], saved['names']
+    else:
+        from . import manifest
+
+        env = __load_environment__()
+        try:
+            if env.detect_state():
+                env.save_state()
+            else:
+                print(LOG.WARN_STATE_DRIFT.value)
+        except FileNotFoundError as err:
+            print(str(err))
+        flags, names = env.state, [[mod.id, mod.name] for mod in manifest.discover()]
+
+    print(f'original config    : {"on" if flags.get("cfg_orig", 1) else "off"}')
+    for mod_id, name in names:
+        print(f'{name.lower():<19}: {"on" if flags.get(f"mod_{mod_id}", 0) else "off"}')
+    return 0
+
+def list_mods() -> int:
+    """
+    Prints the mods declared by manifests, in the order they're applied.
+
+    Args:
+        None
+
+    Returns:
+        int: exit code
+
+    """
+    from . import manifest
+
+    for mod in manifest.discover():
+        print(f'{mod.id:<16} {mod.name:<24} priority {mod.priority}')
+    return 0
+
+def verify_files(
+    show_all: bool
+) -> int:
+    """
+    Prints the game files not matching any known-good variant or selection of mods.
+
+    Args:
+        show_all (bool) : defines if the files matching are printed too
+
+    Returns:
+        int: exit code, 1 if any file is missing or unknown
+
+    """
+    from . import verify
+
+    checks = verify.verify()
+    for check in checks:
+        if show_all or not check.ok:
+            print(check)
+    failed = sum(1 for check in checks if not check.ok)
+    print(f'{len(checks) - failed}/{len(checks)} files ok, {failed} missing or unknown.')
+    return 1 if failed else 0
+
+def find_keys(
+    pattern    : str,
+    files      : str,
+    show_values: bool
+) -> int:
+    """
+    Prints the config keys matching a glob pattern.
+
+    Args:
+        pattern     (str)  : glob pattern of the option names or qualified keys
+        files       (str)  : glob pattern of the config file names
+        show_values (bool) : defines if the values are printed too
+
+    Returns:
+        int: exit code, 1 if no key matches
+
+    """
+    from . import query
+
+    matches = query.find(pattern, files)
+    for rel_path, key, value in matches:
+        print(f'{rel_path}: {key} {value}' if show_values else f'{rel_path}: {key}')
+    if not matches:
+        print(f'{LOG.ERR_CFG_KEY.value} {pattern}')
+        return 1
+    return 0
+
+def set_keys(
+    values: list,
+    files : str
+) -> int:
+    """
+    Sets the values of the config keys matching glob patterns, writing each config file once.
+
+    Args:
+        values (list) : 'KEY=VALUE' assignments
+        files  (str)  : glob pattern of the config file names
+
+    Returns:
+        int: exit code, 1 if an assignment is malformed or matches no key, nothing being written then
+
+    """
+    from . import query
+
+    assignments = {}
+    for assignment in values:
+        pattern, sep, value = assignment.partition('=')
+        if not sep or not pattern:
+            print(f'{LOG.ERR_CFG_ASSIGNMENT.value} {assignment}')
+            return 1
+        assignments[pattern] = value
+
+    # nothing is written unless every assignment matches
+    index = query.refresh()
+    missing = [pattern for pattern in assignments if not query.find(pattern, files, index)]
+    for pattern in missing:
+        print(f'{LOG.ERR_CFG_KEY.value} {pattern}')
+    if missing:
+        return 1
+
+    try:
+        edits = query.set_values(assignments, files, index)
+    except (OSError, ValueError) as err:
+        print(str(err))
+        return 1
+    for rel_path, keys in edits.items():
+        print(f'> Set {len(keys)} keys in "{rel_path}"')
+    return 0
+
+def manage_profiles(
+    action : str,
+    name   : str,
+    mod_ids: tuple
+) -> int:
+    """
+    Defines, activates, deletes or lists the profiles. Activating a profile
+    saves the resulting environment.
+
+    Args:
+        action  (str)   : 'save', 'use', 'delete' or 'list'
+        name    (str)   : name of the profile, unused to list them
+        mod_ids (tuple) : names of the mods of the profile to be saved
+
+    Returns:
+        int: exit code
+
+    """
+    from . import profile
+
+    try:
+        if action == 'save':
+            profile.save(name, mod_ids)
+        elif action == 'delete':
+            profile.delete(name)
+        elif action == 'use':
+            env = __load_environment__()
+            env.select_mods(profile.activate(name))
+            env.save_state()
+            print(f'"{name}" {LOG.OK_PROFILE.value}')
+        else:
+            active = profile.active()
+            for profile_name, definition in sorted(profile.profiles().items()):
+                marker = '*' if profile_name == active else ' '
+                print(f'{marker} {profile_name:<16} {" ".join(definition["mods"]) or "(original)"}')
+    except (KeyError, ValueError) as err:
+        print(err.args[0])
+        return 1
+    except OSError as err:
+        print(str(err))
+        return 1
+    return 0
+
+def manage_history(
+    action : str,
+    step_id: int
+) -> int:
+    """
+    Lists the steps of the history, marking the ones matching the game files,
+    or restores the game files of a step and saves the resulting environment.
+
+    Args:
+        action  (str) : 'list' or 'restore'
+        step_id (int) : id of the step to be restored, unused to list them
+
+    Returns:
+        int: exit code
+
+    """
+    from . import history
+
+    try:
+        if action == 'restore':
+            env = __load_environment__()
+            history.restore(step_id)
+            if not env.detect_state():
+                print(LOG.WARN_STATE_DRIFT.value)
+            env.save_state()
+            print(f'{LOG.OK_HISTORY.value} {step_id}')
+        else:
+            files = history.current_files()
+            for step in reversed(history.steps()):
+                print(f'{"*" if step["files"] == files else " "} {history.describe(step)}')
+    except KeyError as err:
+        print(err.args[0])
+        return 1
+    except (OSError, ValueError) as err:
+        print(str(err))
+        return 1
+    return 0
+
+def run_batch(
+    action    : str,
+    mod_ids   : tuple,
+    roots     : list,
+    roots_file: Path,
+    workers   : int
+) -> int:
+    """
+    Runs an operation on many game installs at once, printing the result of
+    each install as soon as it's known, then a summary.
+
+    Args:
+        action     (str)   : 'apply', 'restore' or 'verify'
+        mod_ids    (tuple) : names of the mods to be applied or verified
+        roots      (list)  : install roots
+        roots_file (Path)  : file listing more install roots, one per line, if any
+        workers    (int)   : number of worker processes, the number of cores if None
+
+    Returns:
+        int: exit code, 1 if any install failed
+
+    """
+    # imported only here, batch pulling in multiprocessing
+    from . import batch
+
+    roots = list(roots)
+    if roots_file is not None:
+        try:
+            roots += [Path(line.strip()) for line in roots_file.read_text(encoding='utf-8').splitlines() if line.strip()]
+        except OSError as err:
+            print(str(err))
+            return 1
+
+    def report(result: batch.Result):
+        print(result)
+        if not result.ok and result.output:
+            print(''.join(f'    {line}\n' for line in result.output.splitlines()), end='')
+
+    results = batch.run(action, mod_ids, roots, workers, report)
+    print(batch.summary(results))
+    return 0 if all(result.ok for result in results) else 1
+
+def make_delta(
+    source: Path,
+    target: Path,
+    output: Path
+) -> int:
+    """
+    Makes the delta patch turning a source file into a target file, checking
+    that it rebuilds the target.
+
+    Args:
+        source (Path) : path of the source file
+        target (Path) : path of the target file
+        output (Path) : path of the delta to be written
+
+    Returns:
+        int: exit code
+
+    """
+    from . import delta
+
+    try:
+        delta.make(source, target, output)
+        check_path = output.with_name(output.name + '.check')
+        delta.apply(output, source, check_path)
+        os.unlink(check_path)
+    except (OSError, ValueError) as err:
+        print(str(err))
+        return 1
+    print(f'> Delta written to "{output}": {os.stat(output).st_size} bytes, '
+          f'target {os.stat(target).st_size} bytes.')
+    return 0
+
+def migrate() -> int:
+    """
+    Moves the files of the variant folders that git doesn't track into the store.
+
+    Args:
+        None
+
+    Returns:
+        int: exit code
+
+    """
+    from . import backup
+
+    try:
+        backup.migrate_variants()
+    except OSError as err:
+        print(str(err))
+        return 1
+    print('> Variant folders migrated.')
+    return 0
+
+def run_game() -> int:
+    """
+    Runs the game.
+
+    Args:
+        None
+
+    Returns:
+        int: exit code
+
+    """
+    from . import mods
+
+    try:
+        mods.run_game()
+    except FileNotFoundError as err:
+        print(str(err))
+        return 1
+    return 0
+
+####################          Utility functions          ####################
+
+def __load_environment__() -> 'Environment':
+    """
+    Utility function that loads the last saved environment, or the default one.
+
+    Args:
+        None
+
+    Returns:
+        Environment: the loaded environment
+
+    """
+    from .env import Environment
+
+    env = Environment()
+    try:
+        env.load_state()
+    except FileNotFoundError as err:
+        print(str(err))
+    return env
+
+def __parser__() -> 'argparse.ArgumentParser':
+    """
+    Utility function that builds the parser of the command line.
+
+    Args:
+        None
+
+    Returns:
+        ArgumentParser: parser of the commands and their arguments
+
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(prog='modsmgr', description='Commandos: Strike Force mods manager.')
+    commands = parser.add_subparsers(dest='command')
+
+    commands.add_parser('gui', help='open the graphical interface (default)')
+    apply_parser = commands.add_parser('apply', help='apply a selection of mods')
+    apply_parser.add_argument('mods', nargs='*', metavar='MOD', help='names of the mods (e.g. wsfix noextv)')
+    commands.add_parser('restore', help='restore the original game files')
+    commands.add_parser('status',  help='show the applied mods')
+    commands.add_parser('mods',    help='list the available mods')
+    verify_parser = commands.add_parser('verify', help='check the game files against the known-good variants')
+    verify_parser.add_argument('--all', action='store_true', help='list every file, not only the failed ones')
+    get_parser = commands.add_parser('get', help='show the values of config keys')
+    get_parser.add_argument('key', help='option name or qualified key, glob patterns allowed (e.g. fCansancio*)')
+    find_parser = commands.add_parser('find', help='list the config keys matching a glob pattern')
+    find_parser.add_argument('key', help='option name or qualified key, glob patterns allowed (e.g. .PREFERENCES.f*)')
+    set_parser = commands.add_parser('set', help='set the values of config keys')
+    set_parser.add_argument('values', nargs='+', metavar='KEY=VALUE', help='option names or qualified keys, glob patterns allowed')
+    for query_parser in (get_parser, find_parser, set_parser):
+        query_parser.add_argument('--file', default='*', help='glob pattern of the config file names (e.g. Juego*.cfg)')
+    profile_parser = commands.add_parser('profile', help='manage named profiles of mods, switched at once')
+    profile_commands = profile_parser.add_subparsers(dest='action', required=True)
+    save_parser = profile_commands.add_parser('save', help='define a profile')
+    save_parser.add_argument('name', help='name of the profile (e.g. competitive)')
+    save_parser.add_argument('mods', nargs='*', metavar='MOD', help='names of the mods (e.g. wsfix noextv)')
+    use_parser = profile_commands.add_parser('use', help='activate a profile')
+    use_parser.add_argument('name', help='name of the profile')
+    delete_parser = profile_commands.add_parser('delete', help='delete a profile')
+    delete_parser.add_argument('name', help='name of the profile')
+    profile_commands.add_parser('list', help='list the profiles')
+    history_parser = commands.add_parser('history', help='list or restore the game files as left by past operations')
+    history_commands = history_parser.add_subparsers(dest='action', required=True)
+    history_commands.add_parser('list', help='list the steps of the history, newest first')
+    restore_parser = history_commands.add_parser('restore', help='restore the game files of a step')
+    restore_parser.add_argument('step', type=int, help='id of the step')
+    batch_parser = commands.add_parser('batch', help='apply, restore or verify mods across many game installs')
+    batch_parser.add_argument('action', choices=('apply', 'restore', 'verify'), help='operation run on each install')
+    batch_parser.add_argument('mods', nargs='*', metavar='MOD', help='names of the mods to be applied or verified')
+    batch_parser.add_argument('--root', action='append', default=[], type=Path, help='install root, may be repeated')
+    batch_parser.add_argument('--roots-file', type=Path, help='file listing an install root per line')
+    batch_parser.add_argument('--workers', type=int, help='number of worker processes (default: number of cores)')
+    commands.add_parser('migrate', help='move the variant folders into the store, once')
+    commands.add_parser('run',     help='run the game')
+    delta_parser = commands.add_parser('make-delta', help='make the delta patch turning a file into another')
+    delta_parser.add_argument('source', type=Path, help='source file (e.g. modsmgr/orig/CommXPC.exe)')
+    delta_parser.add_argument('target', type=Path, help='target file (e.g. modsmgr/wsfix/CommXPC.exe)')
+    delta_parser.add_argument('output', type=Path, help='delta to be written (e.g. modsmgr/wsfix/CommXPC.exe.delta)')
+    parser.add_argument('--trace', metavar='PATH', help='write a Chrome trace of the operations')
+    return parser
@@ -0,0 +1,395 @@
+"""Module parsing the text config files of the game into an indexed tree.
+
+Keys are qualified by the names of their sections (e.g. '.PREFERENCES.fFOV'),
+unnamed children by their position in their parent (e.g. '.LISTADATOS[2]'), and
+names repeated within a block by their occurrence among the children with that
+name (e.g. '.PM_ITEM[0]', '.PM_ITEM[1]'), so that every node has a key of its own.
+"""
+
+import re
+from collections import Counter
+
+from .logs import LOG
+
+# text configs may contain latin-1 characters, decoded one byte per character
+# so that character offsets are also byte offsets
+ENCODING = 'latin-1'
+
+# tokens of the text config files, whitespace and comments being trivia
+TOKENS = re.compile(r'''
+      (?P<trivia>  (?: \s+ | //[^\n]* )+ )
+    | (?P<open>    [\[(] )
+    | (?P<close>   [\])] )
+    | (?P<name>    \.[^\s\[\]()"]+ )
+    | (?P<string>  "[^"]*" )
+    | (?P<scalar>  [^\s\[\]()"]+ )
+''', re.VERBOSE)
+
+# kinds of the values a key can be set to, ints and floats being interchangeable
+VALUE_KINDS = {'int': 'number', 'float': 'number', 'string': 'string', 'tuple': 'tuple'}
+
+# characters that would end a value in the game's own parser: line breaks and comments
+VALUE_BREAKS = '\r\n;'
+
+class Node:
+    """Node of a parsed config: a block `[ ]`, a tuple `( )` or a scalar value."""
+
+    __slots__ = ('kind', 'name', 'start', 'end', 'children')
+
+    # 'block', 'tuple', 'int', 'float' or 'string'
+    kind: str
+
+    # name of the node (e.g. '.fFOV'), None for unnamed nodes
+    name: str
+
+    # span of the value of the node in the source text
+    start: int
+    end  : int
+
+    # child nodes of blocks and tuples
+    children: list
+
+    def __init__(self,
+        kind : str,
+        name : str,
+        start: int
+    ):
+        """
+        Constructor method to initialize a node whose value starts at the given offset.
+
+        Args:
+            kind  (str) : kind of the node
+            name  (str) : name of the node, None for unnamed nodes
+            start (int) : offset of the value in the source text
+
+        Returns:
+            None
+
+        """
+        self.kind = kind
+        self.name = name
+        self.start = start
+        self.end = start
+        self.children = []
+
+class Config:
+    """Text config file parsed into a lossless tree, indexing the span of every key."""
+
+    # source text of the config file
+    text: str
+
+    # root node of the tree
+    root: Node
+
+    # section-qualified key (e.g. '.PREFERENCES.fFOV') -> node
+    index: dict
+
+    # bare option name (e.g. 'fFOV') -> list of section-qualified keys
+    names: dict
+
+    # start offset of the edited spans -> (end offset, new value)
+    edits: dict
+
+    def __init__(self,
+        text: str
+    ):
+        """
+        Constructor method that parses the text of a config file.
+
+        Args:
+            text (str) : text contents of the config file
+
+        Returns:
+            None
+
+        Raises:
+            ValueError: malformed config text
+
+        """
+        self.text = text
+        self.index = {}
+        self.names = {}
+        self.edits = {}
+        self.root = self.__parse__()
+
+    @classmethod
+    def from_bytes(cls,
+        contents: bytes
+    ) -> 'Config':
+        """
+        Parses the raw contents of a config file.
+
+        Args:
+            contents (bytes) : raw contents of the config file
+
+        Returns:
+            Config: the parsed config
+
+        """
+        return cls(contents.decode(ENCODING))
+
+    def to_bytes(self) -> bytes:
+        """
+        Renders the config, with its edits, into raw contents.
+
+        Args:
+            None
+
+        Returns:
+            bytes: raw contents of the config file
+
+        """
+        return self.render().encode(ENCODING)
+
+    def find(self,
+        option: str
+    ) -> list:
+        """
+        Finds the section-qualified keys matching an option. Qualified keys
+        (starting with a dot) match themselves, bare names match every key
+        with that name.
+
+        Args:
+            option (str) : qualified key or bare option name
+
+        Returns:
+            list: matching section-qualified keys
+
+        """
+        if option.startswith('.'):
+            return [option] if option in self.index else []
+        return self.names.get(option, [])
+
+    def get(self,
+        key: str
+    ) -> str:
+        """
+        Gets the current text of the value of a key.
+
+        Args:
+            key (str) : section-qualified key
+
+        Returns:
+            str: text of the value
+
+        Raises:
+            KeyError: missing key
+
+        """
+        node = self.__node__(key)
+        if node.start in self.edits:
+            return self.edits[node.start][1]
+        return self.text[node.start:node.end]
+
+    def set(self,
+        key  : str,
+        value: str
+    ):
+        """
+        Sets the text of the value of a key. The edit is spliced into the
+        source text when rendering, leaving every other byte untouched, so the
+        value must be a single scalar or tuple of the same kind as the current one.
+
+        Args:
+            key   (str) : section-qualified key
+            value (str) : new text of the value
+
+        Returns:
+            None
+
+        Raises:
+            KeyError: missing key
+            ValueError: value not a single value of the kind of the key
+
+        """
+        node = self.__node__(key)
+        if VALUE_KINDS.get(node.kind) is None or VALUE_KINDS.get(node.kind) != __value_kind__(value):
+            raise ValueError(f'{LOG.ERR_CFG_VALUE.value} {key}')
+        self.edits[node.start] = (node.end, value)
+
+    def render(self) -> str:
+        """
+        Renders the source text with the edited spans spliced in.
+
+        Args:
+            None
+
+        Returns:
+            str: text contents of the config file
+
+        """
+        if not self.edits:
+            return self.text
+        parts = []
+        offset = 0
+        for start in sorted(self.edits):
+            end, value = self.edits[start]
+            parts.append(self.text[offset:start])
+            parts.append(value)
+            offset = end
+        parts.append(self.text[offset:])
+        return ''.join(parts)
+
+    def __node__(self,
+        key: str
+    ) -> Node:
+        """
+        Gets the node of a key.
+
+        Args:
+            key (str) : section-qualified key
+
+        Returns:
+            Node: the node of the key
+
+        Raises:
+            KeyError: missing key
+
+        """
+        try:
+            return self.index[key]
+        except KeyError as err:
+            raise KeyError(f'{LOG.ERR_CFG_KEY.value} {key}') from err
+
+    def __parse__(self) -> Node:
+        """
+        Parses the source text into a tree, indexing every key.
+
+        Args:
+            None
+
+        Returns:
+            Node: root node of the tree
+
+        Raises:
+            ValueError: malformed config text
+
+        """
+        root = Node('block', None, 0)
+        root.end = len(self.text)
+        stack = [root]
+        name = None
+        for token in TOKENS.finditer(self.text):
+            kind = token.lastgroup
+            if kind == 'trivia':
+                continue
+
+            parent = stack[-1]
+            if kind == 'name':
+                if name is not None:
+                    raise ValueError(f'{LOG.ERR_CFG_PARSE.value} {token.start()}')
+                name = token.group()
+                continue
+
+            if kind == 'close':
+                if name is not None or len(stack) == 1 or \
+                   (token.group() == ']') != (parent.kind == 'block'):
+                    raise ValueError(f'{LOG.ERR_CFG_PARSE.value} {token.start()}')
+                parent.end = token.end()
+                stack.pop()
+                continue
+
+            if kind == 'open':
+                node_kind = 'block' if token.group() == '[' else 'tuple'
+            elif kind == 'string':
+                node_kind = 'string'
+            else:
+                node_kind = 'float' if '.' in token.group() else 'int'
+
+            node = Node(node_kind, name, token.start())
+            node.end = token.end()
+            parent.children.append(node)
+            name = None
+
+            if kind == 'open':
+                stack.append(node)
+
+        if len(stack) != 1 or name is not None:
+            raise ValueError(f'{LOG.ERR_CFG_PARSE.value} {len(self.text)}')
+        self.__index_children__(root, '', True)
+        return root
+
+    def __index_children__(self,
+        parent : Node,
+        path   : str,
+        is_root: bool = False
+    ):
+        """
+        Indexes the keys of the children of a node, and of their own children.
+
+        Args:
+            parent  (Node) : parent node
+            path    (str)  : section-qualified key of the parent
+            is_root (bool) : defines if the parent is the root of the tree
+
+        Returns:
+            None
+
+        """
+        counts = Counter(child.name for child in parent.children if child.name)
+        seen = Counter()
+        for position, child in enumerate(parent.children):
+            # the unnamed top-level block is the document itself, and has no key
+            if is_root and child.name is None:
+                key = path
+            else:
+                if child.name is None:
+                    key = f'{path}[{position}]'
+                elif counts[child.name] > 1:
+                    key = f'{path}{child.name}[{seen[child.name]}]'
+                    seen[child.name] += 1
+                else:
+                    key = path + child.name
+                self.__index_key__(key, child)
+            if child.children:
+                self.__index_children__(child, key)
+
+    def __index_key__(self,
+        key : str,
+        node: Node
+    ):
+        """
+        Indexes the node of a key, also by its bare option name.
+
+        Args:
+            key  (str)  : section-qualified key
+            node (Node) : node of the key
+
+        Returns:
+            None
+
+        """
+        self.index[key] = node
+        if node.name:
+            self.names.setdefault(node.name[1:], []).append(key)
+
+####################          Utility functions          ####################
+
+def __value_kind__(
+    value: str
+) -> str:
+    """
+    Utility function that gets the kind of the text of a value, parsed as the
+    single value of a key.
+
+    Args:
+        value (str) : text of the value
+
+    Returns:
+        str: kind of the value (see VALUE_KINDS), None if the text isn't a single value
+             or holds a block
+
+    """
+    # characters no token matches (e.g. an unbalanced quote) would be skipped by the parser
+    if any(char in value for char in VALUE_BREAKS) or \
+       ''.join(token.group() for token in TOKENS.finditer(value)) != value:
+        return None
+    try:
+        parsed = Config(f'[ .v {value} ]')
+    except ValueError:
+        return None
+    node = parsed.index.get('.v')
+    if node is None or len(parsed.root.children[0].children) != 1 or \
+       any(other.kind == 'block' for other in parsed.index.values()):
+        return None
+    return VALUE_KINDS.get(node.kind)
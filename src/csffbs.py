@@ -0,0 +1,734 @@
+"""Module reading and writing the binary CSFFBS format of the game config files.
+
+Layout (little endian):
+    header       : magic 'CSFFBS\\0\\0', version, node count, name count, string count (u32 each)
+    node table   : node count entries of 12 bytes (i32 next, i32 data, u16 name, u16 type)
+    name table   : name count entries (u32 length, chars and NUL terminator)
+    string table : string count entries (u32 length, chars and NUL terminator if not empty)
+
+Nodes are stored in pre-order. `next` is the index of the next sibling (0 for
+the last one) and `name` the index of the name (0xffff for unnamed nodes).
+Depending on the type, `data` holds the number of children (tuples, blocks),
+the value itself (ints, floats) or the index of the string (strings). A named
+scalar is a key node (data -1) immediately followed by its value node.
+"""
+
+import math
+import mmap
+import struct
+from collections import Counter
+
+from .config import Config, ENCODING
+from .logs import LOG
+
+MAGIC   = b'CSFFBS\x00\x00'
+VERSION = 1
+
+HEADER = struct.Struct('<8s4I')
+NODE   = struct.Struct('<iiHH')
+UINT   = struct.Struct('<I')
+INT    = struct.Struct('<i')
+FLOAT  = struct.Struct('<f')
+
+NO_NAME = 0xffff
+
+# node types
+T_KEY, T_TUPLE, T_BLOCK, T_INT, T_FLOAT, T_STRING = range(6)
+
+# node types of the text config kinds
+TYPES = {
+    'tuple' : T_TUPLE,
+    'block' : T_BLOCK,
+    'int'   : T_INT,
+    'float' : T_FLOAT,
+    'string': T_STRING
+}
+
+def is_binary(
+    contents: bytes
+) -> bool:
+    """
+    Checks if the contents of a config file are in the binary format.
+
+    Args:
+        contents (bytes) : raw contents of the config file
+
+    Returns:
+        bool: True for binary configs
+
+    """
+    return bytes(contents[:len(MAGIC)]) == MAGIC
+
+def load(
+    contents: bytes
+):
+    """
+    Parses the raw contents of a config file, in either format.
+
+    Args:
+        contents (bytes) : raw contents of the config file
+
+    Returns:
+        BinaryConfig or Config: the parsed config
+
+    """
+    if is_binary(contents):
+        return BinaryConfig(contents)
+    return Config.from_bytes(contents)
+
+class BinaryConfig:
+    """Binary config file, read in place through a memoryview and indexed by qualified key."""
+
+    # raw contents of the config file
+    buffer: memoryview
+
+    # number of nodes, and offset of the node table
+    node_count: int
+
+    # name table and string table
+    name_list  : list
+    string_list: list
+
+    # number of strings stored in the string table
+    strings_stored: int
+
+    # section-qualified key (e.g. '.PREFERENCES.fFOV') -> index of the value node
+    index: dict
+
+    # bare option name (e.g. 'fFOV') -> list of section-qualified keys
+    names: dict
+
+    # section-qualified key -> new value, for the edited keys
+    edits: dict
+
+    def __init__(self,
+        contents
+    ):
+        """
+        Constructor method that indexes a binary config without copying it.
+
+        Args:
+            contents (bytes, bytearray or mmap) : raw contents of the config file
+
+        Returns:
+            None
+
+        Raises:
+            ValueError: malformed binary config
+
+        """
+        self.buffer = memoryview(contents)
+        self.index = {}
+        self.names = {}
+        self.edits = {}
+
+        if len(self.buffer) < HEADER.size:
+            raise ValueError(LOG.ERR_CFG_BINARY.value)
+        magic, _, self.node_count, name_count, string_count = HEADER.unpack_from(self.buffer, 0)
+        if magic != MAGIC:
+            raise ValueError(LOG.ERR_CFG_BINARY.value)
+
+        offset = HEADER.size + self.node_count * NODE.size
+        self.name_list, offset = self.__read_table__(offset, name_count)
+        self.strings_stored = string_count
+        self.string_list, offset = self.__read_table__(offset, string_count)
+        if offset != len(self.buffer):
+            raise ValueError(LOG.ERR_CFG_BINARY.value)
+
+        if self.node_count:
+            self.__index_node__(0, '', is_root=True)
+
+    @classmethod
+    def open(cls,
+        path    : str,
+        writable: bool = False
+    ) -> 'BinaryConfig':
+        """
+        Maps a binary config file in memory, so that reading it and patching its
+        fixed-width values does not copy nor rewrite the file.
+
+        Args:
+            path     (str)  : path of the config file
+            writable (bool) : defines if edits are written through to the file
+
+        Returns:
+            BinaryConfig: the mapped config
+
+        """
+        with open(path, 'r+b' if writable else 'rb') as handle:
+            mapping = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ)
+        return cls(mapping)
+
+    def node(self,
+        node_index: int
+    ) -> tuple:
+        """
+        Reads a node of the node table.
+
+        Args:
+            node_index (int) : index of the node
+
+        Returns:
+            tuple: next sibling, data, name index and type of the node
+
+        """
+        return NODE.unpack_from(self.buffer, HEADER.size + node_index * NODE.size)
+
+    def find(self,
+        option: str
+    ) -> list:
+        """
+        Finds the section-qualified keys matching an option (see Config.find).
+
+        Args:
+            option (str) : qualified key or bare option name
+
+        Returns:
+            list: matching section-qualified keys
+
+        """
+        if option.startswith('.'):
+            return [option] if option in self.index else []
+        return self.names.get(option, [])
+
+    def get(self,
+        key: str
+    ) -> str:
+        """
+        Gets the text form of the value of a key.
+
+        Args:
+            key (str) : section-qualified key
+
+        Returns:
+            str: text of the value
+
+        Raises:
+            KeyError: missing key
+
+        """
+        return self.__value_text__(self.__node_index__(key))
+
+    def set(self,
+        key  : str,
+        value: str
+    ):
+        """
+        Sets the value of a key from its text form. Scalars are patched in
+        place in the node table; tuples are patched element by element.
+
+        Args:
+            key   (str) : section-qualified key
+            value (str) : new text of the value
+
+        Returns:
+            None
+
+        Raises:
+            KeyError: missing key
+            ValueError: value not fitting the structure of the key
+
+        """
+        node_index = self.__node_index__(key)
+        _, _, _, node_type = self.node(node_index)
+
+        text = f'[ .v {value} ]'
+        parsed = Config(text).index.get('.v')
+        if parsed is None or parsed.kind == 'block' or \
+           (parsed.kind == 'tuple') != (node_type in (T_TUPLE, T_BLOCK)):
+            raise ValueError(f'{LOG.ERR_CFG_BINARY_SET.value} {key}')
+
+        if parsed.kind == 'tuple':
+            children = self.__children__(node_index)
+            if node_type != T_TUPLE or len(parsed.children) != len(children) or \
+               any(element.kind in ('tuple', 'block') for element in parsed.children):
+                raise ValueError(f'{LOG.ERR_CFG_BINARY_SET.value} {key}')
+            for child, element in zip(children, parsed.children):
+                self.__set_scalar__(child, element.kind, text[element.start:element.end])
+        else:
+            self.__set_scalar__(node_index, parsed.kind, value)
+        self.edits[key] = value
+
+    def set_numbers(self,
+        keys  : list,
+        values: list
+    ):
+        """
+        Sets the values of numeric keys at once, patching the node table in
+        place. Each key keeps its type, values of int keys being rounded.
+
+        Args:
+            keys   (list) : section-qualified keys of int or float values
+            values (list) : new values of the keys
+
+        Returns:
+            None
+
+        Raises:
+            KeyError: missing key
+            ValueError: key not holding a number
+
+        """
+        buffer = self.__writable__()
+        for key, value in zip(keys, values):
+            node_index = self.__node_index__(key)
+            next_index, _, name, node_type = self.node(node_index)
+            if node_type == T_INT:
+                data = int(round(value))
+                self.edits[key] = str(data)
+            elif node_type == T_FLOAT:
+                data = INT.unpack(FLOAT.pack(value))[0]
+                self.edits[key] = format_float(value)
+            else:
+                raise ValueError(f'{LOG.ERR_CFG_BINARY_SET.value} {key}')
+            NODE.pack_into(buffer, HEADER.size + node_index * NODE.size, next_index, data, name, node_type)
+
+    def to_bytes(self) -> bytes:
+        """
+        Serializes the config, with its edits.
+
+        Args:
+            None
+
+        Returns:
+            bytes: raw contents of the config file
+
+        """
+        if self.strings_stored == len(self.string_list):
+            return bytes(self.buffer)
+
+        # strings added by the edits are appended to the string table
+        _, _, _, name_count, _ = HEADER.unpack_from(self.buffer, 0)
+        header = HEADER.pack(MAGIC, VERSION, self.node_count, name_count, len(self.string_list))
+        return header + bytes(self.buffer[HEADER.size:]) + \
+               __encode_table__(self.string_list[self.strings_stored:], True)
+
+    def in_place(self) -> bool:
+        """
+        Checks if every edit fits in the current contents, i.e. no string was added.
+
+        Args:
+            None
+
+        Returns:
+            bool: True if the contents hold every edit
+
+        """
+        return self.strings_stored == len(self.string_list)
+
+    def to_text(self) -> str:
+        """
+        Converts the config into the text format.
+
+        Args:
+            None
+
+        Returns:
+            str: text contents of the config file
+
+        """
+        lines = []
+        if self.node_count:
+            self.__render__(0, 0, lines)
+        return '\n'.join(lines) + '\n'
+
+    def close(self):
+        """
+        Releases the memory mapping of the config, if any.
+
+        Args:
+            None
+
+        Returns:
+            None
+
+        """
+        obj = self.buffer.obj
+        self.buffer.release()
+        if isinstance(obj, mmap.mmap):
+            obj.flush()
+            obj.close()
+
+    ####################          Utility functions          ####################
+
+    def __read_table__(self,
+        offset: int,
+        count : int
+    ) -> tuple:
+        """
+        Reads a table of strings.
+
+        Args:
+            offset (int) : offset of the table
+            count  (int) : number of strings
+
+        Returns:
+            tuple: the list of strings and the offset following the table
+
+        """
+        table = []
+        for _ in range(count):
+            (length,) = UINT.unpack_from(self.buffer, offset)
+            offset += UINT.size
+            table.append(bytes(self.buffer[offset:offset + max(length - 1, 0)]).decode(ENCODING))
+            offset += length
+        return table, offset
+
+    def __index_node__(self,
+        node_index: int,
+        path      : str,
+        name      : str  = None,
+        is_root   : bool = False
+    ) -> int:
+        """
+        Indexes the keys of a node and of its children. Names repeated among
+        the children are numbered by occurrence, as in Config.
+
+        Args:
+            node_index (int)  : index of the node
+            path       (str)  : section-qualified key of the node
+            name       (str)  : name of the node (e.g. '.fFOV'), None for unnamed nodes
+            is_root    (bool) : defines if the node is the document itself
+
+        Returns:
+            int: index of the node following the subtree of the node
+
+        """
+        _, data, _, node_type = self.node(node_index)
+        if node_type == T_KEY:
+            self.__add_key__(path, name, node_index + 1)
+            return node_index + 2
+        if not is_root:
+            self.__add_key__(path, name, node_index)
+        if node_type not in (T_TUPLE, T_BLOCK):
+            return node_index + 1
+
+        name_indexes = [self.node(child)[2] for child in self.__children__(node_index)]
+        counts = Counter(name_index for name_index in name_indexes if name_index != NO_NAME)
+        seen = Counter()
+        child_index = node_index + 1
+        for position, name_index in enumerate(name_indexes[:data]):
+            if name_index == NO_NAME:
+                child_name = None
+                child_path = f'{path}[{position}]'
+            elif counts[name_index] > 1:
+                child_name = self.name_list[name_index]
+                child_path = f'{path}{child_name}[{seen[name_index]}]'
+                seen[name_index] += 1
+            else:
+                child_name = self.name_list[name_index]
+                child_path = path + child_name
+            child_index = self.__index_node__(child_index, child_path, child_name)
+        return child_index
+
+    def __add_key__(self,
+        key       : str,
+        name      : str,
+        node_index: int
+    ):
+        """
+        Indexes the node of a key, also by its bare option name.
+
+        Args:
+            key        (str) : section-qualified key
+            name       (str) : name of the node (e.g. '.fFOV'), None for unnamed nodes
+            node_index (int) : index of the value node of the key
+
+        Returns:
+            None
+
+        """
+        self.index[key] = node_index
+        if name:
+            self.names.setdefault(name[1:], []).append(key)
+
+    def __node_index__(self,
+        key: str
+    ) -> int:
+        """
+        Gets the index of the value node of a key.
+
+        Args:
+            key (str) : section-qualified key
+
+        Returns:
+            int: index of the value node
+
+        Raises:
+            KeyError: missing key
+
+        """
+        try:
+            return self.index[key]
+        except KeyError as err:
+            raise KeyError(f'{LOG.ERR_CFG_KEY.value} {key}') from err
+
+    def __children__(self,
+        node_index: int
+    ) -> list:
+        """
+        Gets the indexes of the children of a tuple or a block, following the sibling links.
+
+        Args:
+            node_index (int) : index of the node
+
+        Returns:
+            list: indexes of the child nodes
+
+        """
+        _, data, _, _ = self.node(node_index)
+        children = []
+        child_index = node_index + 1 if data > 0 else 0
+        while child_index:
+            children.append(child_index)
+            child_index = self.node(child_index)[0]
+        return children
+
+    def __value_text__(self,
+        node_index: int
+    ) -> str:
+        """
+        Formats the value of a node into its text form.
+
+        Args:
+            node_index (int) : index of the node
+
+        Returns:
+            str: text of the value
+
+        """
+        _, data, _, node_type = self.node(node_index)
+        if node_type == T_INT:
+            return str(data)
+        if node_type == T_FLOAT:
+            return format_float(FLOAT.unpack(INT.pack(data))[0])
+        if node_type == T_STRING:
+            return f'"{self.string_list[data]}"'
+        if node_type == T_KEY:
+            return self.__value_text__(node_index + 1)
+        elements = ' '.join(self.__value_text__(child) for child in self.__children__(node_index))
+        return f'( {elements} )' if node_type == T_TUPLE else f'[ {elements} ]'
+
+    def __set_scalar__(self,
+        node_index: int,
+        kind      : str,
+        value     : str
+    ):
+        """
+        Patches a scalar node in place.
+
+        Args:
+            node_index (int) : index of the node
+            kind       (str) : kind of the new value ('int', 'float' or 'string')
+            value      (str) : text of the new value
+
+        Returns:
+            None
+
+        """
+        next_index, _, name, _ = self.node(node_index)
+        if kind == 'int':
+            data = int(value)
+        elif kind == 'float':
+            data = INT.unpack(FLOAT.pack(float(value)))[0]
+        else:
+            text = value[1:-1]
+            if text not in self.string_list:
+                self.string_list.append(text)
+            data = self.string_list.index(text)
+        NODE.pack_into(self.__writable__(), HEADER.size + node_index * NODE.size, next_index, data, name, TYPES[kind])
+
+    def __writable__(self) -> memoryview:
+        """
+        Gets a writable view of the contents, copying read-only contents on the first edit.
+
+        Args:
+            None
+
+        Returns:
+            memoryview: writable view of the contents
+
+        """
+        if self.buffer.readonly:
+            self.buffer = memoryview(bytearray(self.buffer))
+        return self.buffer
+
+    def __render__(self,
+        node_index: int,
+        depth     : int,
+        lines     : list
+    ) -> int:
+        """
+        Renders a node and its children into lines of the text format.
+
+        Args:
+            node_index (int)  : index of the node
+            depth      (int)  : nesting depth of the node
+            lines      (list) : rendered lines to be extended
+
+        Returns:
+            int: index of the node following the subtree of the node
+
+        """
+        _, data, name, node_type = self.node(node_index)
+        indent = ' ' * depth
+        label = self.name_list[name] if name != NO_NAME else ''
+
+        if node_type == T_KEY:
+            lines.append(f'{indent}{label:<19} {self.__value_text__(node_index + 1)}')
+            return node_index + 2
+        if node_type not in (T_TUPLE, T_BLOCK):
+            lines.append(f'{indent}{label:<19} {self.__value_text__(node_index)}' if label else
+                         f'{indent}{self.__value_text__(node_index)}')
+            return node_index + 1
+
+        children = self.__children__(node_index)
+        if node_type == T_TUPLE and all(self.node(child)[3] > T_BLOCK for child in children):
+            value = self.__value_text__(node_index)
+            lines.append(f'{indent}{label:<19} {value}' if label else f'{indent}{value}')
+            return node_index + 1 + len(children)
+
+        if label:
+            lines.append(f'{indent}{label}')
+        lines.append(indent + ('(' if node_type == T_TUPLE else '['))
+        child_index = node_index + 1
+        for _ in range(data):
+            child_index = self.__render__(child_index, depth + 1, lines)
+        lines.append(indent + (')' if node_type == T_TUPLE else ']'))
+        return child_index
+
+def format_float(
+    value: float
+) -> str:
+    """
+    Formats a float the way the game does, falling back to a longer form
+    whenever six decimals would not give back the same 32-bit value.
+
+    Args:
+        value (float) : value to be formatted
+
+    Returns:
+        str: text of the value, always containing a decimal point
+
+    """
+    text = f'{value:f}'
+    if math.isfinite(value) and FLOAT.pack(float(text)) != FLOAT.pack(value):
+        text = f'{value:.9e}'
+    return text
+
+def encode(
+    config: Config
+) -> bytes:
+    """
+    Encodes a text config into the binary format.
+
+    Args:
+        config (Config) : parsed text config
+
+    Returns:
+        bytes: raw contents of the binary config file
+
+    Raises:
+        ValueError: config without a top-level block
+
+    """
+    blocks = [node for node in config.root.children if node.kind == 'block' and node.name is None]
+    if len(blocks) != 1:
+        raise ValueError(LOG.ERR_CFG_BINARY.value)
+
+    nodes = []
+    names = {}
+    strings = {}
+    __encode_node__(config.text, blocks[0], nodes, names, strings)
+
+    header = HEADER.pack(MAGIC, VERSION, len(nodes), len(names), len(strings))
+    table = b''.join(NODE.pack(*node) for node in nodes)
+    return header + table + __encode_table__(names, False) + __encode_table__(strings, True)
+
+def decode(
+    contents: bytes
+) -> str:
+    """
+    Converts the raw contents of a binary config into the text format.
+
+    Args:
+        contents (bytes) : raw contents of the binary config file
+
+    Returns:
+        str: text contents of the config file
+
+    """
+    return BinaryConfig(contents).to_text()
+
+####################          Utility functions          ####################
+
+def __encode_node__(
+    text   : str,
+    node,
+    nodes  : list,
+    names  : dict,
+    strings: dict
+) -> int:
+    """
+    Utility function that appends a text config node, and its children, to the node table.
+
+    Args:
+        text    (str)  : source text of the config
+        node    (Node) : node to be encoded
+        nodes   (list) : node table, as [next, data, name, type] entries
+        names   (dict) : name -> index, in order of first appearance
+        strings (dict) : string -> index, in order of first appearance
+
+    Returns:
+        int: index of the encoded node
+
+    """
+    node_index = len(nodes)
+    name = names.setdefault(node.name, len(names)) if node.name else NO_NAME
+
+    if node.kind in ('tuple', 'block'):
+        nodes.append([0, len(node.children), name, TYPES[node.kind]])
+        previous = None
+        for child in node.children:
+            child_index = __encode_node__(text, child, nodes, names, strings)
+            if previous is not None:
+                nodes[previous][0] = child_index
+            previous = child_index
+        return node_index
+
+    if name != NO_NAME:
+        nodes.append([0, -1, name, T_KEY])
+
+    value = text[node.start:node.end]
+    if node.kind == 'int':
+        data = int(value)
+    elif node.kind == 'float':
+        data = INT.unpack(FLOAT.pack(float(value)))[0]
+    else:
+        data = strings.setdefault(value[1:-1], len(strings))
+    nodes.append([0, data, NO_NAME, TYPES[node.kind]])
+    return node_index
+
+def __encode_table__(
+    table    : list,
+    allow_empty: bool
+) -> bytes:
+    """
+    Utility function that encodes a table of strings.
+
+    Args:
+        table       (list) : strings to be encoded, in order
+        allow_empty (bool) : defines if empty strings are stored without terminator
+
+    Returns:
+        bytes: the encoded table
+
+    """
+    parts = []
+    for item in table:
+        if allow_empty and not item:
+            parts.append(UINT.pack(0))
+        else:
+            raw = item.encode(ENCODING) + b'\x00'
+            parts.append(UINT.pack(len(raw)) + raw)
+    return b''.join(parts)
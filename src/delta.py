@@ -0,0 +1,382 @@
+"""Module making and applying binary delta patches, e.g. between variants of the game exe.
+
+Layout (little endian):
+    header     : magic 'MMDELTA\\0', version (u32), source sha256, target sha256 (32 bytes each), target size (u64)
+    operations : sequence of operations, ended by an END operation (type 0)
+        COPY   : type 1 (u8), source offset (u64), length (u32)
+        INSERT : type 2 (u8), length (u32), then the inserted bytes
+
+Deltas are applied as a stream, with memory bounded by CHUNK_SIZE. The source is
+verified before patching and the target after, so a delta can't silently produce
+a corrupted exe. Deltas compose: a delta whose source is the target of another
+one is applied on top of it.
+"""
+
+import hashlib
+import os
+import struct
+from pathlib import Path
+
+from .logs import LOG
+
+MAGIC   = b'MMDELTA\x00'
+VERSION = 1
+
+HEADER = struct.Struct('<8sI32s32sQ')
+OP     = struct.Struct('<B')
+COPY   = struct.Struct('<QI')
+LENGTH = struct.Struct('<I')
+
+# operation types
+OP_END, OP_COPY, OP_INSERT = range(3)
+
+# file name suffix of the delta of a file
+SUFFIX = '.delta'
+
+# bytes compared at once when measuring a match
+BLOCK_SIZE = 4096
+
+# bytes that must match to start a COPY, the source being indexed by aligned runs of this size
+ANCHOR_SIZE = 32
+
+CHUNK_SIZE = 1 << 20
+
+def read_header(
+    delta_path: Path
+) -> tuple:
+    """
+    Reads the header of a delta.
+
+    Args:
+        delta_path (Path) : path of the delta
+
+    Returns:
+        tuple: hex digests of the source and the target, and size of the target
+
+    Raises:
+        ValueError: not a delta, or unsupported version
+
+    """
+    with open(delta_path, 'rb') as handle:
+        return __read_header__(handle)
+
+def make(
+    source_path: Path,
+    target_path: Path,
+    delta_path : Path,
+    max_insert : int = None
+) -> bool:
+    """
+    Makes the delta turning a source file into a target file. Matches are looked
+    for along the current diagonal first (patched bytes), then after the last
+    match (inserted bytes), then among the aligned runs of the source, indexed
+    by contents (moved data). Each byte of the target is thus looked up in
+    constant time, however far the data moved. Both files are read in memory,
+    only applying a delta is streamed.
+
+    Args:
+        source_path (Path) : path of the source file (e.g. the original exe)
+        target_path (Path) : path of the target file (e.g. the patched exe)
+        delta_path  (Path) : path of the delta to be written
+        max_insert  (int)  : bytes missing from the source beyond which the delta
+                             isn't worth it, and is given up, unbounded if None
+
+    Returns:
+        bool: True if the delta was written, False if it was given up
+
+    """
+    with open(source_path, 'rb') as handle:
+        source = handle.read()
+    with open(target_path, 'rb') as handle:
+        target = handle.read()
+
+    anchors = {}
+    for offset in range(0, len(source) - ANCHOR_SIZE + 1, ANCHOR_SIZE):
+        anchors.setdefault(source[offset:offset + ANCHOR_SIZE], offset)
+
+    with open(delta_path, 'wb') as delta:
+        delta.write(HEADER.pack(MAGIC, VERSION, hashlib.sha256(source).digest(),
+                                hashlib.sha256(target).digest(), len(target)))
+        writer = DeltaWriter(delta)
+        position = 0
+        inserted = 0
+        last_target = 0
+        last_source = 0
+        while position < len(target):
+            anchor = target[position:position + ANCHOR_SIZE]
+            for match in (last_source + position - last_target, last_source, anchors.get(anchor)):
+                if match is not None and source[match:match + len(anchor)] == anchor:
+                    length = __common_length__(source, match, target, position)
+                    writer.copy(match, length)
+                    position += length
+                    last_target, last_source = position, match + length
+                    break
+            else:
+                writer.insert(target[position:position + 1])
+                position += 1
+                inserted += 1
+                if max_insert is not None and inserted > max_insert:
+                    break
+        writer.close()
+
+    if max_insert is not None and inserted > max_insert:
+        os.unlink(delta_path)
+        return False
+    return True
+
+def apply(
+    delta_path   : Path,
+    source_path  : Path,
+    to_path      : Path,
+    source_digest: str = None
+) -> str:
+    """
+    Applies a delta to a source file, streaming the target into a new file.
+
+    Args:
+        delta_path    (Path) : path of the delta
+        source_path   (Path) : path of the source file
+        to_path       (Path) : path of the target file to be written
+        source_digest (str)  : known hex digest of the source, hashed if None
+
+    Returns:
+        str: hex digest of the target
+
+    Raises:
+        ValueError: source not matching the delta, or corrupted target
+        FileNotFoundError: missing source or delta
+
+    """
+    if source_digest is None:
+        source_digest = __digest_path__(source_path)
+
+    with open(delta_path, 'rb') as delta:
+        source_hex, target_hex, target_size = __read_header__(delta)
+        if source_digest != source_hex:
+            raise ValueError(f'{LOG.ERR_DELTA_SOURCE.value} {source_path}')
+
+        hasher = hashlib.sha256()
+        try:
+            with open(source_path, 'rb') as source, open(to_path, 'wb') as target:
+                while True:
+                    op, = OP.unpack(delta.read(OP.size))
+                    if op == OP_END:
+                        break
+                    if op == OP_COPY:
+                        offset, length = COPY.unpack(delta.read(COPY.size))
+                        source.seek(offset)
+                        chunks = __read_chunks__(source, length)
+                    elif op == OP_INSERT:
+                        length, = LENGTH.unpack(delta.read(LENGTH.size))
+                        chunks = __read_chunks__(delta, length)
+                    else:
+                        raise ValueError(LOG.ERR_DELTA_FORMAT.value)
+                    for chunk in chunks:
+                        hasher.update(chunk)
+                        target.write(chunk)
+                size = target.tell()
+        except (ValueError, struct.error) as err:
+            os.unlink(to_path)
+            raise ValueError(LOG.ERR_DELTA_FORMAT.value) from err
+
+    if size != target_size or hasher.hexdigest() != target_hex:
+        os.unlink(to_path)
+        raise ValueError(f'{LOG.ERR_DELTA_TARGET.value} {to_path}')
+    return target_hex
+
+class DeltaWriter:
+    """Writer of delta operations, merging contiguous copies and inserts."""
+
+    # file the operations are written to
+    handle: object
+
+    # pending copy as [source offset, length], None if none
+    pending_copy: list
+
+    # pending inserted bytes
+    pending_insert: bytearray
+
+    def __init__(self,
+        handle: object
+    ):
+        """
+        Constructor method to initialize a writer with no pending operation.
+
+        Args:
+            handle (object) : binary file the operations are written to
+
+        Returns:
+            None
+
+        """
+        self.handle = handle
+        self.pending_copy = None
+        self.pending_insert = bytearray()
+
+    def copy(self,
+        offset: int,
+        length: int
+    ):
+        """
+        Adds the copy of a source range.
+
+        Args:
+            offset (int) : offset in the source
+            length (int) : bytes to be copied
+
+        Returns:
+            None
+
+        """
+        self.__flush_insert__()
+        if self.pending_copy and sum(self.pending_copy) == offset and \
+           self.pending_copy[1] + length < 1 << 32:
+            self.pending_copy[1] += length
+            return
+        self.__flush_copy__()
+        self.pending_copy = [offset, length]
+
+    def insert(self,
+        data: bytes
+    ):
+        """
+        Adds bytes missing from the source.
+
+        Args:
+            data (bytes) : inserted bytes
+
+        Returns:
+            None
+
+        """
+        self.__flush_copy__()
+        self.pending_insert += data
+        if len(self.pending_insert) >= CHUNK_SIZE:
+            self.__flush_insert__()
+
+    def close(self):
+        """
+        Writes the pending operations and the END operation.
+
+        Args:
+            None
+
+        Returns:
+            None
+
+        """
+        self.__flush_copy__()
+        self.__flush_insert__()
+        self.handle.write(OP.pack(OP_END))
+
+    def __flush_copy__(self):
+        """Writes the pending copy, if any."""
+        if self.pending_copy:
+            self.handle.write(OP.pack(OP_COPY) + COPY.pack(*self.pending_copy))
+            self.pending_copy = None
+
+    def __flush_insert__(self):
+        """Writes the pending inserted bytes, if any."""
+        if self.pending_insert:
+            self.handle.write(OP.pack(OP_INSERT) + LENGTH.pack(len(self.pending_insert)))
+            self.handle.write(self.pending_insert)
+            self.pending_insert = bytearray()
+
+####################          Utility functions          ####################
+
+def __read_header__(
+    handle: object
+) -> tuple:
+    """
+    Utility function that reads the header of an open delta.
+
+    Args:
+        handle (object) : binary file of the delta
+
+    Returns:
+        tuple: hex digests of the source and the target, and size of the target
+
+    Raises:
+        ValueError: not a delta, or unsupported version
+
+    """
+    try:
+        magic, version, source, target, size = HEADER.unpack(handle.read(HEADER.size))
+    except struct.error as err:
+        raise ValueError(LOG.ERR_DELTA_FORMAT.value) from err
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(LOG.ERR_DELTA_FORMAT.value)
+    return source.hex(), target.hex(), size
+
+def __common_length__(
+    source  : bytes,
+    match   : int,
+    target  : bytes,
+    position: int
+) -> int:
+    """
+    Utility function that measures the run of matching bytes of the source and
+    the target, comparing whole blocks first.
+
+    Args:
+        source   (bytes) : source contents
+        match    (int)   : offset of the run in the source
+        target   (bytes) : target contents
+        position (int)   : offset of the run in the target
+
+    Returns:
+        int: length of the run
+
+    """
+    length = 0
+    limit = min(len(source) - match, len(target) - position, (1 << 32) - 1)
+    while length + BLOCK_SIZE <= limit and \
+          source[match + length:match + length + BLOCK_SIZE] == target[position + length:position + length + BLOCK_SIZE]:
+        length += BLOCK_SIZE
+    while length < limit and source[match + length] == target[position + length]:
+        length += 1
+    return length
+
+def __read_chunks__(
+    handle: object,
+    length: int
+):
+    """
+    Utility function that reads a range of a file in bounded chunks.
+
+    Args:
+        handle (object) : binary file, positioned at the start of the range
+        length (int)    : bytes to be read
+
+    Returns:
+        generator: chunks of the range
+
+    Raises:
+        ValueError: file ending before the range
+
+    """
+    while length > 0:
+        chunk = handle.read(min(length, CHUNK_SIZE))
+        if not chunk:
+            raise ValueError(LOG.ERR_DELTA_FORMAT.value)
+        length -= len(chunk)
+        yield chunk
+
+def __digest_path__(
+    abs_path: Path
+) -> str:
+    """
+    Utility function that hashes a file.
+
+    Args:
+        abs_path (Path) : path of the file
+
+    Returns:
+        str: hex digest of the file
+
+    """
+    hasher = hashlib.sha256()
+    with open(abs_path, 'rb') as handle:
+        for chunk in iter(lambda: handle.read(CHUNK_SIZE), b''):
+            hasher.update(chunk)
+    return hasher.hexdigest()
@@ -1,7 +1,12 @@
 """Module storing the current state of the applied mods."""
 
-import pickle as pk
+import time
+from pathlib import Path
 
+from . import manifest
+from . import plan
+from . import state as store_state
+from . import trace
 from .logs import LOG
 from .paths import PATH
 
@@ -11,6 +16,12 @@ class Environment:
 	# state reference
     state: dict
 
+    # names of the mods detected on disk, None if unknown or matching no selection
+    applied: tuple
+
+    # name of each applied mod -> manifest digest, selection key, time applied and source identities
+    metadata: dict
+
     def __init__(self):
         """
         Constructor method to initialize gui root reference, frames and widgets
@@ -24,10 +35,11 @@ class Environment:
         
         """
         self.state = {
-            'cfg_orig'      : 1,
-            'mod_wsfix'     : 0,
-            'mod_noextv'    : 0
+            'cfg_orig'      : 1
         }
+        self.state.update((mod.state_key, 0) for mod in manifest.discover())
+        self.applied = None
+        self.metadata = {}
 
     # change state functions
     def __update_state__(self,
@@ -36,7 +48,8 @@ class Environment:
     ):
         """
         Change state by assigning 0 or 1, to the corresponding state key, 
-        according to the value of enabled.
+        according to the value of enabled. Missing keys (e.g. of a mod added
+        since the state was saved) are added.
 
         Args:
             state_key (str) : state key to be changed
@@ -45,16 +58,10 @@ class Environment:
         Returns:
             None
 
-        Raises:
-            KeyError: missing key for specific state
-
         """
         print('> Updating environment...')
 
-        if state_key in self.state.keys():
-            self.state[state_key] = enabled
-        else:
-            raise KeyError(LOG.ERR_STATE_KEY.value)
+        self.state[state_key] = enabled
 
     def enable(self,
         state_key: str
@@ -86,56 +93,138 @@ class Environment:
         """
         self.__update_state__(state_key, 0)
 
+    def select_mods(self,
+        mod_ids: tuple,
+        record : bool = True
+    ):
+        """
+        Update state after a selection of mods has been applied.
+
+        Args:
+            mod_ids (tuple) : names of the active mods
+            record  (bool)  : defines if the metadata of the mods is recorded, as just applied
+
+        Returns:
+            None
+
+        """
+        self.__update_state__('cfg_orig', 0 if mod_ids else 1)
+        for mod in manifest.discover():
+            self.__update_state__(mod.state_key, 1 if mod.id in mod_ids else 0)
+        self.applied = tuple(mod.id for mod in manifest.selection(mod_ids))
+
+        if record:
+            applied_at = time.strftime('%Y-%m-%dT%H:%M:%S%z')
+            self.metadata = plan.selection_metadata(self.applied)
+            for metadata in self.metadata.values():
+                metadata['applied_at'] = applied_at
+        else:
+            self.metadata = {mod_id: self.metadata[mod_id] for mod_id in self.applied if mod_id in self.metadata}
+
+    @trace.traced('env')
+    def detect_state(self) -> bool:
+        """
+        Update state with the selection of mods actually applied onto the game
+        files, which may differ from the saved one if the files were changed
+        by hand or an apply failed halfway.
+
+        Args:
+            None
+
+        Returns:
+            bool: True if the game files match a selection of mods, False otherwise
+
+        Raises:
+            FileNotFoundError: missing original or mod files
+
+        """
+        print('> Detecting applied mods...')
+        return self.sync_state(plan.applied_selection([self.selected()]))
+
+    def sync_state(self,
+        selection: tuple
+    ) -> bool:
+        """
+        Update state with a selection of mods detected on the game files.
+
+        Args:
+            selection (tuple) : names of the mods detected, None if the game files match no selection
+
+        Returns:
+            bool: True if the game files match a selection of mods, False otherwise
+
+        """
+        if selection is None:
+            self.applied = None
+            return False
+        self.select_mods(selection, record=False)
+        return True
+
     ## serialization functions
+    @trace.traced('env')
     def save_state(self,
         path: str = PATH.RES_STATE.value
     ):
         """
         Saves the current state of active mods and relevant variables
-        in the specified path.
+        in the specified path, along with the names of the mods and the game
+        files of the applied selection, if known.
 
         Args:
-            path (str) : relative path where to store the state
+            path (str) : path where to store the state, relative to the install root
 
         Returns:
             None
 
         Raises:
-            KeyError: missing key for specific state
+            FileNotFoundError: state can't be written
 
         """
         print('> Saving environment...')
 
+        files = {}
+        if self.applied is not None:
+            try:
+                files = {Path(rel_path).as_posix(): digest
+                         for rel_path, digest in plan.selection_entries(self.applied).items()}
+            except (KeyError, FileNotFoundError):
+                pass
+        names = [[mod.id, mod.name] for mod in manifest.discover()]
+
         try:
-            with open(path, 'wb') as handle:
-                pk.dump(self.state, handle, protocol=pk.HIGHEST_PROTOCOL)
-        except FileNotFoundError as err:
+            store_state.save({'flags': self.state, 'mods': self.metadata, 'names': names, 'files': files}, path)
+        except OSError as err:
             raise FileNotFoundError(LOG.ERR_STATE_SAVE.value) from err
 
+    @trace.traced('env')
     def load_state(self,
         path: str = PATH.RES_STATE.value
     ):
         """
         Loads the current state of active mods and relevant variables 
-        from the file stored in specified path.
+        from the file stored in specified path, migrating older states.
 
         Args:
-            path (str) : relative path where the state is stored
+            path (str) : path where the state is stored, relative to the install root
 
         Returns:
             None
 
         Raises:
-            FileNotFoundError: missing environment file
+            FileNotFoundError: missing or unreadable environment file
 
         """
         print('> Loading environment...')
 
         try:
-            with open(path, 'rb') as handle:
-                self.state = pk.load(handle)
+            loaded = store_state.load(path)
         except FileNotFoundError as err:
             raise FileNotFoundError(LOG.ERR_STATE_LOAD.value) from err
+        except ValueError as err:
+            print(f'> {err}')
+            raise FileNotFoundError(LOG.ERR_STATE_LOAD.value) from err
+        self.state.update(loaded['flags'])
+        self.metadata = loaded['mods']
 
     # getters
     def __get_state__(self,
@@ -167,28 +256,30 @@ class Environment:
         """
         return self.__get_state__('cfg_orig')
 
-    def wsfix(self) -> int:
+    def is_active(self,
+        mod_id: str
+    ) -> int:
         """
-        Gets the value for widescreen fix mod active.
+        Gets the value for a mod active.
 
         Args:
-            None
+            mod_id (str) : name of the mod
 
         Returns:
-            int: cfg_orig state value
+            int: state value of the mod, 0 if unknown
 
         """
-        return self.__get_state__('mod_wsfix')
+        return self.state.get(f'mod_{mod_id}', 0)
 
-    def noextv(self) -> int:
+    def selected(self) -> tuple:
         """
-        Gets the value for no-external-view mod active.
+        Gets the names of the active mods.
 
         Args:
             None
 
         Returns:
-            int: cfg_orig state value
+            tuple: names of the active mods, in the order they're applied
 
         """
-        return self.__get_state__('mod_noextv')
+        return tuple(mod.id for mod in manifest.discover() if self.is_active(mod.id))
@@ -0,0 +1,514 @@
+"""Module implementing the graphical interface of the Mod Manager."""
+
+import queue
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor
+from tkinter import Tk, Frame, Toplevel
+from tkinter import Label, Button, Checkbutton, Listbox
+from tkinter import IntVar
+from PIL import ImageTk, Image
+
+from . import history
+from . import manifest
+from . import mods
+from . import plan
+from . import trace
+from .paths import PATH, home
+from .logs import LOG
+from .env import Environment
+from .pipeline import Task
+
+# interval in ms between two polls of the worker thread events
+POLL_MS = 50
+
+# height in pixels of the window, without mods, and of each mod checkbutton
+BASE_HEIGHT = 55
+ROW_HEIGHT  = 25
+
+class GUI:
+    """GUI of the Mod Manager."""
+
+    # Current state
+    env: Environment
+
+    # worker thread running the file operations, with the events it reports
+    # to the main loop, and the task currently running (None if idle)
+    executor: ThreadPoolExecutor
+    events  : queue.Queue
+    task    : Task
+
+    # set once the window is closed while a job runs, closing it when the job is done
+    closing: bool
+
+    # GUI root ref
+    root : Tk
+
+    # frames
+    f_config : Frame
+    f_footer : Frame
+
+    # hold content of mods choices, for each mod name
+    v_mods: dict
+
+    # widgets
+    l_csf_img  : Label
+    b_mods     : dict
+    b_apply    : Button
+    b_run      : Button
+    b_history  : Button
+    l_logger   : Label
+
+    def __init__(self,
+        gui_title: str = 'CSF Mods',
+        gui_size : str = None
+    ):
+        """
+        Constructor method to initialize gui root reference, frames and widgets
+        
+        Args:
+            gui_title (str) : text that will appear in the title bar
+            gui_size  (str) : size of the window application, fitting the mods if None
+
+        Returns: 
+            None
+        
+        """
+        # initializing environment
+        self.env = Environment()
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.events = queue.Queue()
+        self.task = None
+        self.closing = False
+        rows = max(len(manifest.discover()), 3)
+
+        # initializing GUI frames
+        self.gui = Tk()
+        self.gui.title(gui_title)
+        self.gui.geometry(gui_size or f'320x{BASE_HEIGHT + ROW_HEIGHT * rows}')
+        self.gui.resizable(width=False, height=False)
+        self.gui.iconbitmap(home() / PATH.RES_ICO.value)
+        self.gui.protocol('WM_DELETE_WINDOW', self.close)
+
+        self.f_config = Frame(self.gui)
+        self.f_config.pack(padx=5, pady=5)
+
+        self.f_footer = Frame(self.gui)
+        self.f_footer.pack(padx=14)
+
+        # creating widgets
+        img = ImageTk.PhotoImage(Image.open(home() / PATH.RES_CSF.value))
+        self.l_csf_img = Label(
+            self.f_config,
+            image    = img,
+            anchor   = 'w'
+        )
+        self.v_mods = {mod.id: IntVar() for mod in manifest.discover()}
+        self.b_mods = {}
+        for mod in manifest.discover():
+            self.b_mods[mod.id] = Checkbutton(
+                self.f_config,
+                text     = mod.name,
+                width    = 13,
+                anchor   = 'w',
+                variable = self.v_mods[mod.id],
+                command  = lambda: self.add_pending_mod(self.checked_mods())
+            )
+        self.b_apply = Button(
+            self.f_config,
+            text    = 'APPLY',
+            width   = 10,
+            justify = 'center',
+            command = lambda: self.apply_mods(self.checked_mods())
+        )
+        self.b_run = Button(
+            self.f_config,
+            text    = 'RUN',
+            width   = 10,
+            justify = 'center',
+            command = lambda: self.play_game()
+        )
+        self.b_history = Button(
+            self.f_config,
+            text    = 'HISTORY',
+            width   = 10,
+            justify = 'center',
+            command = lambda: self.show_history()
+        )
+        self.l_logger = Label(
+            self.f_footer,
+            text        = LOG.INIT.value,
+            width       = 41 ,
+            anchor      = 'w',
+            borderwidth = 2,
+            relief      = 'groove'
+        )
+        self.load_environment()
+
+        # putting widgets in the interface
+        self.l_csf_img .grid(row=0, column=0, rowspan=rows)
+        for row, b_mod in enumerate(self.b_mods.values()):
+            b_mod.grid(row=row, column=1, padx=15)
+        self.b_apply   .grid(row=0, column=2)
+        self.b_run     .grid(row=1, column=2)
+        self.b_history .grid(row=2, column=2)
+        self.l_logger.pack()
+
+        # run the interface loop
+        self.gui.mainloop()
+
+    @trace.traced('gui')
+    def load_environment(self):
+        """
+        Load the state of the environment.
+        
+        Args:
+            None
+
+        Returns: 
+            None
+        
+        """
+        try:
+            self.env.load_state()
+        except FileNotFoundError as err:
+            self.log(str(err))
+
+        self.select_buttons()
+
+        # the game files may have changed since the state was saved
+        def detect(task: Task) -> tuple:
+            task.step(LOG.PROGRESS_DETECT.value)
+            return plan.applied_selection([self.env.selected()])
+
+        def detected(selection: tuple):
+            if self.env.sync_state(selection):
+                self.select_buttons()
+                self.log(LOG.INIT.value)
+            else:
+                self.log(LOG.WARN_STATE_DRIFT.value)
+
+        self.run_task(detect, detected)
+
+    def select_buttons(self):
+        """
+        Check the buttons of the mods active in the environment.
+        
+        Args:
+            None
+
+        Returns: 
+            None
+        
+        """
+        for mod_id, b_mod in self.b_mods.items():
+            if self.env.is_active(mod_id) > 0:
+                b_mod.select()
+            else:
+                b_mod.deselect()
+
+    def checked_mods(self) -> tuple:
+        """
+        Get the mods whose buttons are checked.
+        
+        Args:
+            None
+
+        Returns: 
+            tuple: names of the checked mods
+        
+        """
+        return tuple(mod_id for mod_id, v_mod in self.v_mods.items() if v_mod.get())
+
+    # creating button functions
+    @trace.traced('gui')
+    def apply_mods(self,
+        mod_ids: tuple
+    ):
+        """
+        Widget function that applies config mods onto original data.
+        
+        Args:
+            mod_ids (tuple) : names of the selected mods
+
+        Returns: 
+            str: Notification message regarding the result of the mods application
+        
+        """
+        # Cancels the running apply, if any: the game files are rolled back.
+        if self.task is not None:
+            self.task.cancel()
+            return
+
+        def applied(written: list):
+            self.env.select_mods(mod_ids)
+
+            # Saves environment. If error is fired, logs it.
+            try:
+                self.env.save_state()
+            except FileNotFoundError as err:
+                self.log(str(err))
+                print(str(err))
+                return
+
+            # updating buttons availability
+            self.b_apply.config(state='disabled')
+            self.b_run.config(state='normal')
+
+            # Logs a successful event corresponding to the required (and activated) mods.
+            self.log(plan.selection_message(mod_ids))
+
+        # Applies the selected mods on the worker thread. If error is fired, logs it.
+        self.run_task(lambda task: plan.apply_selection(mod_ids, task), applied)
+
+    @trace.traced('gui')
+    def show_history(self):
+        """
+        Open a window listing the steps of the history, newest first, the
+        selected one being restored onto the game files.
+        
+        Args:
+            None
+
+        Returns: 
+            None
+        
+        """
+        steps = list(reversed(history.steps()))
+        window = Toplevel(self.gui)
+        window.title('History')
+        window.resizable(width=False, height=False)
+        l_steps = Listbox(
+            window,
+            width  = 60,
+            height = min(max(len(steps), 1), 15)
+        )
+        for step in steps:
+            l_steps.insert('end', history.describe(step))
+
+        def restore():
+            selected = l_steps.curselection()
+            if not selected or self.task is not None:
+                return
+            window.destroy()
+            self.restore_step(steps[selected[0]]['id'])
+
+        b_restore = Button(
+            window,
+            text    = 'RESTORE',
+            width   = 10,
+            justify = 'center',
+            command = restore
+        )
+        l_steps.pack(padx=5, pady=5)
+        b_restore.pack(pady=5)
+
+    @trace.traced('gui')
+    def restore_step(self,
+        step_id: int
+    ):
+        """
+        Widget function that restores the game files of a step of the history,
+        then detects the mods they match.
+        
+        Args:
+            step_id (int) : id of the step
+
+        Returns: 
+            None
+        
+        """
+        def restore(task: Task) -> tuple:
+            history.restore(step_id, task)
+            task.step(LOG.PROGRESS_DETECT.value)
+            return plan.applied_selection([self.env.selected()])
+
+        def restored(selection: tuple):
+            detected = self.env.sync_state(selection)
+            try:
+                self.env.save_state()
+            except FileNotFoundError as err:
+                self.log(str(err))
+                return
+            self.select_buttons()
+            self.log(f'{LOG.OK_HISTORY.value} {step_id}' if detected else LOG.WARN_STATE_DRIFT.value)
+
+        self.run_task(restore, restored)
+
+    def run_task(self,
+        job    : object,
+        on_done: object
+    ):
+        """
+        Run a job on the worker thread, keeping the interface responsive. Its
+        progress is logged, and its result is handed back to the main loop.
+        While it runs, the apply button cancels it.
+        
+        Args:
+            job     (object) : function run on the worker thread, given the Task
+            on_done (object) : function run on the main loop with the result of the job
+
+        Returns: 
+            None
+        
+        """
+        def on_progress(message: str, done: int, total: int):
+            self.events.put(('progress', f'{message} {done}/{total}' if total else message))
+
+        self.task = Task(on_progress)
+        future = self.executor.submit(job, self.task)
+        future.add_done_callback(lambda future: self.events.put(('done', future, on_done)))
+
+        for b_mod in self.b_mods.values():
+            b_mod.config(state='disabled')
+        self.b_apply.config(state='normal', text='CANCEL')
+        self.b_run.config(state='disabled')
+        self.b_history.config(state='disabled')
+        self.gui.after(POLL_MS, self.poll_events)
+
+    def poll_events(self):
+        """
+        Handle the events reported by the worker thread, polled from the main loop
+        until the running job is done.
+        
+        Args:
+            None
+
+        Returns: 
+            None
+        
+        """
+        while True:
+            try:
+                event = self.events.get_nowait()
+            except queue.Empty:
+                break
+            if event[0] == 'progress':
+                self.log(event[1])
+            else:
+                self.finish_task(*event[1:])
+                if self.closing:
+                    self.close()
+                return
+        self.gui.after(POLL_MS, self.poll_events)
+
+    def finish_task(self,
+        future : Future,
+        on_done: object
+    ):
+        """
+        Restore the buttons once a job is done, and hand its result over.
+        
+        Args:
+            future  (Future) : future of the job
+            on_done (object) : function run with the result of the job
+
+        Returns: 
+            None
+        
+        """
+        self.task = None
+        for b_mod in self.b_mods.values():
+            b_mod.config(state='normal')
+        self.b_apply.config(state='normal', text='APPLY')
+        self.b_run.config(state='normal')
+        self.b_history.config(state='normal')
+
+        try:
+            result = future.result()
+        except CancelledError:
+            self.log(LOG.CANCELLED.value)
+            return
+        except (KeyError, ValueError) as err:
+            self.log(str(err.args[0]))
+            print(str(err.args[0]))
+            return
+        except OSError as err:
+            self.log(str(err))
+            return
+        except Exception as err:
+            # any other failure of the job is only logged, so that a pending close still happens
+            self.log(f'{type(err).__name__}: {err}')
+            print(f'{type(err).__name__}: {err}')
+            return
+        on_done(result)
+
+    def close(self):
+        """
+        Close the interface. A running job is cancelled first, and the window
+        is only closed once its rollback is done, the main loop keeping on
+        polling the worker thread meanwhile.
+        
+        Args:
+            None
+
+        Returns: 
+            None
+        
+        """
+        if self.task is not None:
+            self.task.cancel()
+            self.closing = True
+            return
+        self.executor.shutdown(wait=False)
+        self.gui.destroy()
+
+    @trace.traced('gui')
+    def play_game(self):
+        """
+        Run the game.
+        
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        try:
+            mods.run_game()
+            self.close()
+        except FileNotFoundError as err:
+            self.log(str(err))
+
+    @trace.traced('gui')
+    def add_pending_mod(self,
+        mod_ids: tuple
+    ):
+        """
+        Flag the presence of pending changes, if the selected mods differ
+        from the ones actually applied onto the game files.
+        
+        Args:
+            mod_ids (tuple) : names of the selected mods
+
+        Returns:
+            None
+        """
+        if self.env.applied == mod_ids:
+            self.b_apply.config(state='disabled')
+            self.b_run.config(state='normal')
+            self.log(LOG.NO_CHANGES.value)
+            return
+
+        self.b_apply.config(state='normal')
+        self.b_run.config(state='disabled')
+
+        # Warns about conflicting edits, resolved by priority, before they're applied.
+        conflicts = plan.selection_conflicts(mod_ids)
+        if conflicts:
+            self.log(f'{len(conflicts)} {LOG.WARN_MOD_CONFLICTS.value}')
+            return
+        self.log(LOG.PENDING_CHANGES.value)
+
+
+    def log(self,
+        message: str
+    ):
+        """
+        Update the logger label with a new notification message.
+        
+        Args:
+            message (str): Notification message
+
+        Returns:
+            None
+        """
+        self.l_logger.config(text = message)
@@ -0,0 +1,339 @@
+"""Module keeping an undo history of the game files, as chains of deltas between full checkpoints.
+
+Every apply records a step holding the config files and the exe as it left
+them. Files changed outside the Mod Manager since the last step (e.g. values
+tuned by hand) are recorded in a step of their own before the apply, so the
+next apply never loses them. A step only stores the files that changed since
+the previous one, as deltas against their previous version (or in full, when
+too much of the file changed for a delta to be worth it), and every
+CHECKPOINT_INTERVAL steps a checkpoint stores every file in full. Restoring a
+step rebuilds each file into the store from the last checkpoint before it, so
+it never replays more than CHECKPOINT_INTERVAL - 1 deltas, and releases the
+rebuilt versions once they're used, so that the store doesn't grow with the
+history. Only the last MAX_STEPS steps are kept, the oldest being dropped a
+checkpoint at a time.
+"""
+
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+
+from . import delta
+from . import plan
+from . import store
+from . import trace
+from . import verify
+from .pipeline import Task
+from .paths import PATH, home
+from .logs import LOG
+
+# file name of the list of steps, in the history folder
+STEPS = 'history.json'
+
+# one step out of CHECKPOINT_INTERVAL stores every file in full, bounding the deltas replayed by a restore
+CHECKPOINT_INTERVAL = 8
+
+# number of steps kept, the oldest being dropped a checkpoint interval at a time
+MAX_STEPS = 64
+
+# label of the steps recording game files changed outside the Mod Manager
+EXTERNAL = 'edited outside the Mod Manager'
+
+# file name suffix of the deltas, in the folder of a step
+DELTA_SUFFIX = '.delta'
+
+# share of a file that may be missing from its previous version for a delta to be worth it, over storing it in full
+MAX_DELTA_RATIO = 0.5
+
+def steps() -> list:
+    """
+    Loads the steps of the history.
+
+    Args:
+        None
+
+    Returns:
+        list: steps, oldest first, as {'id', 'time', 'label', 'checkpoint', 'files':
+        path relative to the install root -> digest, 'stored': path -> 'full' or 'delta'}
+
+    """
+    try:
+        with open(home() / PATH.HISTORY.value / STEPS, 'r', encoding='utf-8') as handle:
+            return json.load(handle)['steps']
+    except (FileNotFoundError, ValueError, KeyError, TypeError):
+        return []
+
+def current_files() -> dict:
+    """
+    Gets the digests of the game files recorded by the history.
+
+    Args:
+        None
+
+    Returns:
+        dict: path relative to the install root -> digest
+
+    """
+    files = {}
+    for pattern in verify.PATTERNS:
+        for abs_path in sorted(home().glob(pattern)):
+            if Path.is_file(abs_path):
+                files[abs_path.relative_to(home()).as_posix()] = store.digest_path(abs_path)
+    store.save_index()
+    return files
+
+def describe(
+    step: dict
+) -> str:
+    """
+    Describes a step of the history.
+
+    Args:
+        step (dict) : step of the history
+
+    Returns:
+        str: id, time and label of the step, and the number of files it changed
+
+    """
+    return f'{step["id"]:>4}  {step["time"]}  {step["label"]} ({len(step["stored"])} files)'
+
+@trace.traced('history')
+def record(
+    label: str
+) -> dict:
+    """
+    Records the game files as a new step, unless they're the same as in the
+    last step. Changed files are stored as deltas against their previous
+    version, or in full at checkpoints, for files new to the history and for
+    files too different from their previous version.
+
+    Args:
+        label (str) : operation that left the game files as they are (e.g. 'apply wsfix')
+
+    Returns:
+        dict: recorded step, None if the game files didn't change
+
+    """
+    history = steps()
+    files = current_files()
+    if history and history[-1]['files'] == files:
+        return None
+
+    since = 0
+    for step in reversed(history):
+        if step['checkpoint']:
+            break
+        since += 1
+    step = {
+        'id'        : history[-1]['id'] + 1 if history else 1,
+        'time'      : time.strftime('%Y-%m-%d %H:%M:%S'),
+        'label'     : label,
+        'checkpoint': not history or since >= CHECKPOINT_INTERVAL - 1,
+        'files'     : files,
+        'stored'    : {}
+    }
+    print(f'> Recording history step {step["id"]}...')
+    step_path = __step_path__(step['id'])
+    shutil.rmtree(step_path, ignore_errors=True)
+
+    previous = history[-1]['files'] if history else {}
+    for rel_path, digest in files.items():
+        if previous.get(rel_path) == digest and not step['checkpoint']:
+            continue
+        to_path = step_path / rel_path
+        to_path.parent.mkdir(parents=True, exist_ok=True)
+        if previous.get(rel_path) is not None and not step['checkpoint']:
+            rebuilt = set()
+            source_path = __rebuild__(history, len(history) - 1, rel_path, rebuilt)
+            max_insert = int(os.stat(home() / rel_path).st_size * MAX_DELTA_RATIO)
+            made = delta.make(source_path, home() / rel_path, to_path.with_name(to_path.name + DELTA_SUFFIX), max_insert)
+            store.discard(rebuilt)
+            if made:
+                step['stored'][rel_path] = 'delta'
+                continue
+        __keep__(history, rel_path, digest, to_path)
+        step['stored'][rel_path] = 'full'
+
+    history.append(step)
+    dropped = __prune__(history)
+    __save__(history)
+    for old in dropped:
+        shutil.rmtree(__step_path__(old['id']), ignore_errors=True)
+    store.save_index()
+    return step
+
+@trace.traced('history')
+def restore(
+    step_id: int,
+    task   : Task = None
+) -> list:
+    """
+    Restores the game files recorded by a step, rebuilt from the last checkpoint
+    before it, the rebuilt versions being released from the store once placed.
+    The restore is itself recorded as a new step, so it can be undone. Game
+    files missing from the step are left as they are.
+
+    Args:
+        step_id (int)  : id of the step
+        task    (Task) : task reporting the progress and checking for cancellation, if any
+
+    Returns:
+        list: absolute paths of the written files
+
+    Raises:
+        KeyError: unknown step
+        FileNotFoundError: missing files of the history
+        ValueError: corrupted delta
+        OSError: game files can't be written
+        CancelledError: task cancelled, the game files being left as they were
+
+    """
+    history = steps()
+    index = next((i for i, step in enumerate(history) if step['id'] == step_id), None)
+    if index is None:
+        raise KeyError(f'{LOG.ERR_HISTORY_STEP.value} {step_id}')
+
+    if task is not None:
+        task.step(LOG.PROGRESS_PLAN.value)
+    entries = {}
+    rebuilt = set()
+    for rel_path, digest in history[index]['files'].items():
+        __rebuild__(history, index, rel_path, rebuilt)
+        entries[Path(rel_path)] = digest
+    store.save_index()
+
+    if task is not None:
+        task.step(LOG.PROGRESS_APPLY.value)
+    try:
+        return plan.apply_entries(entries, task, f'restore step {step_id}')
+    finally:
+        store.discard(rebuilt)
+
+####################          Utility functions          ####################
+
+def __step_path__(
+    step_id: int
+) -> Path:
+    """
+    Utility function that gets the folder of the files stored by a step.
+
+    Args:
+        step_id (int) : id of the step
+
+    Returns:
+        Path: absolute path of the folder
+
+    """
+    return home() / PATH.HISTORY.value / str(step_id)
+
+def __save__(
+    history: list
+):
+    """
+    Utility function that saves the steps of the history.
+
+    Args:
+        history (list) : steps, oldest first
+
+    Returns:
+        None
+
+    """
+    store.save_json(home() / PATH.HISTORY.value / STEPS, {'steps': history})
+
+def __keep__(
+    history : list,
+    rel_path: str,
+    digest  : str,
+    to_path : Path
+):
+    """
+    Utility function that stores a game file in full, hardlinking an earlier
+    full copy or the stored blob with the same contents when there's one.
+
+    Args:
+        history  (list) : steps recorded so far
+        rel_path (str)  : path of the game file, relative to the install root
+        digest   (str)  : hex digest of the game file
+        to_path  (Path) : absolute path of the full copy
+
+    Returns:
+        None
+
+    """
+    candidates = [__step_path__(step['id']) / rel_path for step in reversed(history)
+                  if step['stored'].get(rel_path) == 'full' and step['files'][rel_path] == digest]
+    for from_path in [*candidates[:1], store.blob_path(digest)]:
+        try:
+            os.link(from_path, to_path)
+            return
+        except OSError:
+            continue
+    shutil.copyfile(home() / rel_path, to_path)
+
+def __rebuild__(
+    history : list,
+    index   : int,
+    rel_path: str,
+    rebuilt : set
+) -> Path:
+    """
+    Utility function that rebuilds into the store the version of a game file
+    recorded by a step, unless it's stored already. Its deltas are replayed
+    from the last full copy, or from the last version still in the store.
+
+    Args:
+        history  (list) : steps of the history
+        index    (int)  : index of the step in the history
+        rel_path (str)  : path of the game file, relative to the install root
+        rebuilt  (set)  : hex digests of the blobs put in the store, updated with the ones put by this rebuild
+
+    Returns:
+        Path: absolute path of the blob
+
+    Raises:
+        FileNotFoundError: missing files of the history
+        ValueError: corrupted delta
+
+    """
+    chain = []
+    for step in reversed(history[:index + 1]):
+        digest = step['files'].get(rel_path)
+        if digest is None or Path.exists(store.blob_path(digest)):
+            break
+        stored = step['stored'].get(rel_path)
+        if stored == 'delta':
+            chain.append(__step_path__(step['id']) / (rel_path + DELTA_SUFFIX))
+            rebuilt.add(digest)
+        elif stored == 'full':
+            rebuilt.add(store.put_path(__step_path__(step['id']) / rel_path))
+            break
+    with trace.span('replay', 'history', path=rel_path, deltas=len(chain)):
+        for delta_path in reversed(chain):
+            store.put_delta(delta_path)
+    return store.blob_path(history[index]['files'][rel_path])
+
+def __prune__(
+    history: list
+) -> list:
+    """
+    Utility function that drops the oldest steps beyond MAX_STEPS, up to the
+    next checkpoint, so that every step left can still be rebuilt.
+
+    Args:
+        history (list) : steps of the history, updated in place
+
+    Returns:
+        list: dropped steps
+
+    """
+    dropped = []
+    while len(history) > MAX_STEPS:
+        checkpoint = next((i for i in range(1, len(history)) if history[i]['checkpoint']), None)
+        if checkpoint is None:
+            break
+        dropped += history[:checkpoint]
+        del history[:checkpoint]
+    return dropped
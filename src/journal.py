@@ -0,0 +1,209 @@
+"""Module applying game files as a transaction, through a staging area and a write-ahead journal.
+
+Every changed file is first staged next to the game folder, then the staged
+files and the staging folder are flushed to disk and the journal records the renames to be
+done. Only then are the game files replaced, through atomic renames. If the
+Mod Manager stops midway, the next start rolls the renames forward when the
+journal was written, and discards the staged files otherwise: the game files
+are either all updated or all left as they were.
+"""
+
+import json
+import os
+import shutil
+from pathlib import Path
+
+from . import store
+from . import trace
+from .pipeline import Pipeline, Task
+from .paths import PATH, home
+
+@trace.traced('journal')
+def apply(
+    entries: dict,
+    task   : Task = None
+) -> list:
+    """
+    Places stored contents onto the game folder as a single transaction, only
+    for the files whose contents changed.
+
+    Args:
+        entries (dict) : relative path -> digest of the stored contents
+        task    (Task) : task reporting the progress and checking for cancellation, if any
+
+    Returns:
+        list: absolute paths of the written files
+
+    Raises:
+        CancelledError: task cancelled before the commit, the game files being left as they were
+
+    """
+    recover()
+    staging = home() / PATH.STAGING.value
+
+    # Finds the files that differ.
+    operations = Pipeline()
+    for rel_path, digest in entries.items():
+        operations.add(rel_path, __changed__, home() / rel_path, digest)
+    changes = [(rel_path, digest) for (rel_path, digest), changed
+               in zip(entries.items(), operations.run()) if changed]
+    if not changes:
+        store.save_index()
+        return []
+
+    # Stages the changed files, and flushes them at once.
+    files = [(staging / str(i), home() / rel_path, digest)
+             for i, (rel_path, digest) in enumerate(changes)]
+    try:
+        operations = Pipeline()
+        for staged_path, _, digest in files:
+            operations.add(staged_path, store.materialize, digest, staged_path, task)
+        operations.run(task=task)
+        if task is not None:
+            task.check()
+        __sync__([staged_path for staged_path, _, _ in files] + [staging])
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        store.save_index()
+        raise
+
+    # Records the renames, then commits them.
+    __write_journal__(files)
+    commit(files)
+    return [to_path for _, to_path, _ in files]
+
+def commit(
+    files: list
+):
+    """
+    Replaces the game files with the staged ones, then removes the journal.
+    Files already renamed, or lost, are placed again from the store.
+
+    Args:
+        files (list) : (staged path, game file path, digest) of each file
+
+    Returns:
+        None
+
+    """
+    with trace.span('commit', 'journal', files=len(files)):
+        for staged_path, to_path, digest in files:
+            if Path.exists(staged_path):
+                store.rename(staged_path, to_path)
+            elif not Path.exists(to_path) or store.digest_path(to_path) != digest:
+                store.materialize(digest, to_path)
+        __sync__(list({to_path.parent for _, to_path, _ in files}))
+        store.save_index()
+
+        os.unlink(home() / PATH.JOURNAL.value)
+        shutil.rmtree(home() / PATH.STAGING.value, ignore_errors=True)
+
+def recover() -> bool:
+    """
+    Completes an apply interrupted by a crash: rolls it forward if its journal
+    was written, otherwise discards its staged files.
+
+    Args:
+        None
+
+    Returns:
+        bool: True if an interrupted apply was rolled forward
+
+    """
+    journal_path = home() / PATH.JOURNAL.value
+    try:
+        with open(journal_path, 'r', encoding='utf-8') as handle:
+            journal = json.load(handle)
+    except FileNotFoundError:
+        journal = None
+    except ValueError:
+        # the journal is written atomically, so this can only be a foreign file
+        os.unlink(journal_path)
+        journal = None
+
+    if journal is None:
+        shutil.rmtree(home() / PATH.STAGING.value, ignore_errors=True)
+        return False
+
+    print('> Completing interrupted apply...')
+    commit([(home() / staged_path, home() / to_path, digest)
+            for staged_path, to_path, digest in journal['files']])
+    return True
+
+####################          Utility functions          ####################
+
+def __changed__(
+    abs_path: Path,
+    digest  : str
+) -> bool:
+    """
+    Utility function that checks if a game file differs from stored contents.
+
+    Args:
+        abs_path (Path) : absolute path of the game file
+        digest   (str)  : hex digest of the stored contents
+
+    Returns:
+        bool: True if the file is missing or differs
+
+    """
+    try:
+        return store.digest_path(abs_path) != digest
+    except (FileNotFoundError, NotADirectoryError):
+        return True
+
+def __write_journal__(
+    files: list
+):
+    """
+    Utility function that durably writes the journal of the renames to be done.
+
+    Args:
+        files (list) : (staged path, game file path, digest) of each file
+
+    Returns:
+        None
+
+    """
+    journal_path = home() / PATH.JOURNAL.value
+    tmp_path = journal_path.with_name(journal_path.name + '.tmp')
+    journal = {
+        'files': [[staged_path.relative_to(home()).as_posix(),
+                   to_path.relative_to(home()).as_posix(),
+                   digest] for staged_path, to_path, digest in files]
+    }
+    with open(tmp_path, 'w', encoding='utf-8') as handle:
+        json.dump(journal, handle)
+        handle.flush()
+        os.fsync(handle.fileno())
+    os.replace(tmp_path, journal_path)
+    __sync__([journal_path.parent])
+
+def __sync__(
+    paths: list
+):
+    """
+    Utility function that flushes files and folders to disk, one at a time,
+    so that only the data of the transaction is waited for (not the whole
+    page cache of the system, as os.sync does). Files are listed before the
+    folders holding them, whose entries are flushed last.
+
+    Args:
+        paths (list) : absolute paths of the files and folders
+
+    Returns:
+        None
+
+    """
+    with trace.span('sync', 'journal', paths=len(paths)):
+        for path in paths:
+            try:
+                fd = os.open(path, os.O_RDWR if Path.is_file(path) else os.O_RDONLY)
+            except OSError:
+                continue                                # folders can't be opened on Windows
+            try:
+                os.fsync(fd)
+            except OSError:
+                pass
+            finally:
+                os.close(fd)
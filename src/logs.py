@@ -7,6 +7,13 @@ class LOG(Enum):
 
     INIT = 'Loaded last environment.'
     PENDING_CHANGES = 'Pending changes...'
+    NO_CHANGES      = 'No pending changes.'
+    CANCELLED       = 'Cancelled, game files left unchanged.'
+
+    # Progress messages
+    PROGRESS_PLAN   = 'Preparing mods...'
+    PROGRESS_APPLY  = 'Placing game files...'
+    PROGRESS_DETECT = 'Detecting applied mods...'
 
     # Error messages
     ERR_BAK_NOBAK  = 'No backup found.'
@@ -14,21 +21,52 @@ class LOG(Enum):
     ERR_BAK_DELETE = 'Can\'t find path to be deleted.'
     ERR_BAK_COPY   = 'Can\'t find path to be copied.'
     ERR_BAK_RENAME = 'Can\'t find path to be renamed.'
+    ERR_STORE_MISSING = 'Can\'t find data in the store.'
+    ERR_STORE_CORRUPTED = 'Stored data doesn\'t match its digest:'
+    ERR_DELTA_FORMAT  = 'Can\'t read delta patch.'
+    ERR_DELTA_SOURCE  = 'Delta patch doesn\'t match its source file:'
+    ERR_DELTA_TARGET  = 'Delta patch produced a corrupted file:'
 
     ERR_CFG_ORIG   = 'Can\'t reset original config. '
-    ERR_CFG_WSFIX  = 'Can\'t apply widescreen-fix. '
-    ERR_CFG_NOEXTV = 'Can\'t apply no-ext-view. '
+    ERR_CFG_MODS   = 'Can\'t apply mods. '
+    ERR_CFG_APPLY  = 'Can\'t write game files. '
     ERR_CFG_NO_DIR = 'Can\'t find source folder.'
     ERR_CHANGE_CFG_FILE = 'Can\'t find cfg file.'
+    ERR_CFG_PARSE  = 'Can\'t parse cfg file at offset'
+    ERR_CFG_KEY    = 'Can\'t find cfg key'
+    ERR_CFG_BINARY = 'Can\'t read binary cfg file.'
+    ERR_CFG_BINARY_SET = 'Can\'t change the structure of binary cfg key'
+    ERR_CFG_VALUE  = 'Can\'t set a value of another kind to cfg key'
+    ERR_CFG_ASSIGNMENT = 'Can\'t read assignment, expected KEY=VALUE:'
+    ERR_TABLE_OPERATION = 'Can\'t read table edit of column'
+
+    ERR_MOD_MANIFEST = 'Can\'t read mod manifest'
+    ERR_MOD_UNKNOWN  = 'Can\'t find mod'
+    ERR_MOD_TARGET   = 'Can\'t write outside the game folder:'
+    ERR_ARCHIVE_MEMBER = 'Can\'t find archive member'
+    ERR_PROFILE_UNKNOWN = 'Can\'t find profile'
+    ERR_PROFILE_NAME    = 'Can\'t use profile name'
+    ERR_PROFILE_LINK    = 'Can\'t tell which folder the config folder links to:'
+    ERR_BATCH_ACTION    = 'Can\'t run batch operation'
+    ERR_BATCH_ROOT      = 'Can\'t find install root'
+    ERR_HISTORY_STEP    = 'Can\'t find history step'
 
     ERR_RUN_GAME   = 'Can\'t run the game. Exe not found in predefined path.'
 
     ERR_STATE_SAVE = 'Can\'t save the state.'
     ERR_STATE_LOAD = 'No saved environments. Using default.'
-    ERR_STATE_KEY  = 'Can\'t change state. State key not found.'
+    ERR_STATE_FORMAT = 'Can\'t read the saved state.'
+
+    # Warning messages
+    WARN_CFG_MISSING    = 'Option not found:'
+    WARN_CFG_DUPLICATED = 'Option found more than once:'
+    WARN_STATE_DRIFT    = 'Game files changed outside the Mod Manager.'
+    WARN_MOD_CONFLICT   = 'Conflicting edits of'
+    WARN_MOD_CONFLICTS  = 'conflicting edits, resolved by priority.'
+    WARN_BATCH_MISMATCH = 'Unexpected mods applied:'
 
     # Success messages
     OK_CFG_ORIG         = 'Restored original config!'
-    OK_CFG_WSFIX        = 'Widescreen fix active!'
-    OK_CFG_NOEXTV       = 'No-external-view active!'
-    OK_CFG_WSFIX_NOEXTV = 'Widescreen fix and No-external-view active!'
+    OK_CFG_MODS         = 'active!'
+    OK_PROFILE          = 'profile active!'
+    OK_HISTORY          = 'Restored game files of history step'
@@ -0,0 +1,237 @@
+"""Module discovering the mods declared by manifest files.
+
+Each mod is a folder of the Mod Manager (e.g. `modsmgr/wsfix/`) holding a
+`manifest.json`, or a zip archive (e.g. `modsmgr/menus.zip`) laid out the same
+way. The fields of a manifest are all optional but the name:
+    name     : name of the mod shown to the user
+    priority : mods with a higher priority are applied later, overriding the others (default 0)
+    files    : game file -> replacement file, relative to the mod folder or archive
+    options  : config file -> {option: value} to be changed
+    patches  : game file -> delta patch applied onto it, relative to the mod folder or archive
+    tables   : config file -> column edits of its records (see table.Table.edit)
+"""
+
+import hashlib
+import json
+import os
+import zipfile
+from pathlib import Path
+
+from . import archive
+from . import trace
+from .paths import PATH, home, on_home_change
+from .logs import LOG
+
+# file name of the manifest in the folder of a mod
+MANIFEST = 'manifest.json'
+
+class Mod:
+    """Mod declared by a manifest file."""
+
+    __slots__ = ('id', 'name', 'priority', 'files', 'options', 'patches', 'tables', 'digest')
+
+    # name of the mod folder, and name shown to the user
+    id  : str
+    name: str
+
+    # order of the mod when applied, the highest overriding the others
+    priority: int
+
+    # (source, target) pairs of replaced files, relative to the game folder, which they never leave
+    files: tuple
+
+    # options to be changed, for each config file
+    options: dict
+
+    # (delta, target) pairs of patched files, relative to the game folder
+    patches: tuple
+
+    # column edits of the records, for each config file
+    tables: dict
+
+    # hex digest of the manifest, identifying this version of the mod
+    digest: str
+
+    def __init__(self,
+        mod_id  : str,
+        manifest: dict,
+        digest  : str,
+        folder  : Path
+    ):
+        """
+        Constructor method to initialize a mod from its parsed manifest.
+
+        Args:
+            mod_id   (str)  : name of the mod folder or archive
+            manifest (dict) : parsed manifest
+            digest   (str)  : hex digest of the manifest
+            folder   (Path) : relative path of the mod folder or archive
+
+        Returns:
+            None
+
+        Raises:
+            ValueError: malformed manifest, or game file outside the game folder
+
+        """
+        try:
+            self.id = mod_id
+            self.name = str(manifest['name'])
+            self.priority = int(manifest.get('priority', 0))
+            self.files = tuple((folder / from_path, Path(to_path))
+                               for to_path, from_path in dict(manifest.get('files', {})).items())
+            self.options = {Path(cfg_path): {str(option): str(value) for option, value in dict(options).items()}
+                            for cfg_path, options in dict(manifest.get('options', {})).items()}
+            self.patches = tuple((folder / delta_path, Path(to_path))
+                                 for to_path, delta_path in dict(manifest.get('patches', {})).items())
+            self.tables = {Path(cfg_path): [dict(operation, column=str(operation['column'])) for operation in operations]
+                           for cfg_path, operations in dict(manifest.get('tables', {})).items()}
+        except (KeyError, TypeError, ValueError) as err:
+            raise ValueError(f'{LOG.ERR_MOD_MANIFEST.value} "{mod_id}"') from err
+
+        # a mod, e.g. downloaded as an archive, must not write anywhere but in the game folder
+        self.files = tuple((from_path, __check_target__(mod_id, to_path)) for from_path, to_path in self.files)
+        self.patches = tuple((delta_path, __check_target__(mod_id, to_path)) for delta_path, to_path in self.patches)
+        self.options = {__check_target__(mod_id, cfg_path): options for cfg_path, options in self.options.items()}
+        self.tables = {__check_target__(mod_id, cfg_path): operations for cfg_path, operations in self.tables.items()}
+        self.digest = digest
+
+    @property
+    def state_key(self) -> str:
+        """
+        Gets the key of the mod in the state of the environment.
+
+        Args:
+            None
+
+        Returns:
+            str: state key (e.g. 'mod_wsfix')
+
+        """
+        return f'mod_{self.id}'
+
+# mods discovered so far, in the order they're applied; None until discovered
+__mods__ = None
+
+@trace.traced('manifest')
+def discover(
+    refresh: bool = False
+) -> list:
+    """
+    Discovers the mods declared in the folders and archives of the Mod Manager.
+    Only the manifests are read, archives being opened only if they changed.
+    Mods are discovered once per run, malformed manifests being reported and skipped.
+
+    Args:
+        refresh (bool) : defines if the folders are scanned again
+
+    Returns:
+        list: discovered mods, in the order they're applied
+
+    """
+    global __mods__
+    if __mods__ is not None and not refresh:
+        return __mods__
+
+    mods_path = home() / PATH.MODS.value
+    folders = [(path.parent.name, path.parent) for path in mods_path.glob(f'*/{MANIFEST}')]
+    archives = [(path.name[:-len(archive.SUFFIX)], path) for path in mods_path.glob(f'*{archive.SUFFIX}')]
+
+    found = []
+    for mod_id, abs_path in sorted(folders + archives):
+        folder = abs_path.relative_to(home())
+        try:
+            if Path.is_dir(abs_path):
+                contents = (abs_path / MANIFEST).read_bytes()
+            else:
+                contents = archive.read_manifest(folder)
+            found.append(Mod(mod_id, json.loads(contents), hashlib.sha256(contents).hexdigest(), folder))
+        except (OSError, ValueError, KeyError, zipfile.BadZipFile) as err:
+            print(f'> {LOG.ERR_MOD_MANIFEST.value} "{mod_id}": {err}')
+    __mods__ = sorted(found, key=lambda mod: (mod.priority, mod.id))
+    return __mods__
+
+def get(
+    mod_id: str
+) -> Mod:
+    """
+    Gets a discovered mod.
+
+    Args:
+        mod_id (str) : name of the mod folder
+
+    Returns:
+        Mod: the mod
+
+    Raises:
+        KeyError: no mod with that name
+
+    """
+    for mod in discover():
+        if mod.id == mod_id:
+            return mod
+    raise KeyError(f'{LOG.ERR_MOD_UNKNOWN.value} "{mod_id}"')
+
+def selection(
+    mod_ids: list
+) -> tuple:
+    """
+    Gets the mods of a selection, in the order they're applied.
+
+    Args:
+        mod_ids (list) : names of the selected mods
+
+    Returns:
+        tuple: selected mods, without duplicates
+
+    Raises:
+        KeyError: no mod with one of the names
+
+    """
+    selected = {get(mod_id) for mod_id in mod_ids}
+    return tuple(mod for mod in discover() if mod in selected)
+
+####################          Utility functions          ####################
+
+def __check_target__(
+    mod_id : str,
+    to_path: Path
+) -> Path:
+    """
+    Utility function that checks that a game file written by a mod stays within
+    the install root, once '..' components are resolved.
+
+    Args:
+        mod_id  (str)  : name of the mod
+        to_path (Path) : path of the game file, relative to the install root
+
+    Returns:
+        Path: normalized path of the game file, relative to the install root
+
+    Raises:
+        ValueError: absolute path, or leaving the install root
+
+    """
+    abs_path = os.path.normpath(home() / to_path)
+    try:
+        inside = abs_path != str(home()) and os.path.commonpath([abs_path, home()]) == str(home())
+    except ValueError:                              # on another drive
+        inside = False
+    if not inside:
+        raise ValueError(f'{LOG.ERR_MOD_TARGET.value} "{to_path}" ({mod_id})')
+    return Path(os.path.relpath(abs_path, home()))
+
+@on_home_change
+def __reset__():
+    """
+    Utility function that drops the mods discovered in the previous install, when the install root changes.
+
+    Args:
+        None
+
+    Returns:
+        None
+
+    """
+    global __mods__
+    __mods__ = None
@@ -0,0 +1,166 @@
+"""Module merging the edits of a selection of mods, detecting the conflicting ones.
+
+Every edit of the selected mods is indexed by file then key name in a single pass,
+so that conflicts are found in time linear in the number of edits. Options are
+indexed by the name of their key, a bare name (e.g. 'fFOV') overlapping every
+section-qualified key with that name (e.g. '.PREFERENCES.fFOV'). Replaced files
+are indexed as a whole, and conflict with every earlier edit of the file by
+another mod (patches, options and table edits), which they override. Table
+edits compose rather than override (e.g. two scales of the same column
+multiply), so they never conflict with each other. Conflicting edits are
+resolved by priority: the mod applied last, i.e. with the highest priority
+(then the last name), wins.
+"""
+
+from pathlib import Path
+
+from . import trace
+from .logs import LOG
+
+class Conflict:
+    """Edits of several mods to the same file or config key."""
+
+    __slots__ = ('path', 'key', 'winner', 'losers')
+
+    # relative path of the file, and option edited by the mods (None for the whole file)
+    path: Path
+    key : str
+
+    # mod whose edit is applied, and mods whose edits are overridden
+    winner: object
+    losers: list
+
+    def __init__(self,
+        path  : Path,
+        key   : str,
+        winner: object,
+        losers: list
+    ):
+        """
+        Constructor method to initialize a conflict.
+
+        Args:
+            path   (Path) : relative path of the file
+            key    (str)  : option edited by the mods, None for the whole file
+            winner (Mod)  : mod whose edit is applied
+            losers (list) : mods whose edits are overridden
+
+        Returns:
+            None
+
+        """
+        self.path = path
+        self.key = key
+        self.winner = winner
+        self.losers = losers
+
+    def __str__(self) -> str:
+        """Describes the conflict."""
+        target = f'"{self.key}" in "{self.path.as_posix()}"' if self.key else f'"{self.path.as_posix()}"'
+        overridden = ', '.join(f'"{mod.name}"' for mod in self.losers)
+        return f'{LOG.WARN_MOD_CONFLICT.value} {target}: "{self.winner.name}" overrides {overridden}'
+
+@trace.traced('merge')
+def merge(
+    base    : tuple,
+    selected: tuple
+) -> tuple:
+    """
+    Merges the edits of the selected mods on top of the base files, in the order
+    the mods are applied, detecting the conflicting edits on the way.
+
+    Args:
+        base     (tuple) : (source, target) pairs of the original files
+        selected (tuple) : selected mods, in the order they're applied
+
+    Returns:
+        tuple: (source, target) pairs of the read files, (delta, target) pairs
+        of the patches, options to be changed and table edits for each config
+        file, and conflicts
+
+    """
+    files = {to_path: (None, from_path) for from_path, to_path in base}
+    patches = {}
+    options = {}
+    tables = {}
+
+    # file -> key name -> {section: (mod, value)}, section None for bare names
+    index = {}
+
+    # config file -> mods whose options or table edits apply to it, overridden when the file is replaced
+    edited = {}
+    conflicts = {}
+    for mod in selected:
+        for from_path, to_path in mod.files:
+            previous = files[to_path][0] if to_path in files else None
+            if previous is not None and files[to_path][1] != from_path:
+                __add_conflict__(conflicts, (to_path, None), mod, previous)
+            for patch_mod, _ in patches.pop(to_path, []):
+                __add_conflict__(conflicts, (to_path, None), mod, patch_mod)
+            overridden = [other for other in edited.pop(to_path, []) if other is not mod]
+            for other in overridden:
+                __add_conflict__(conflicts, (to_path, None), mod, other)
+            if overridden:
+                options.pop(to_path, None)
+                tables.pop(to_path, None)
+                index.pop(to_path, None)
+            files[to_path] = (mod, from_path)
+
+        for delta_path, to_path in mod.patches:
+            patches.setdefault(to_path, []).append((mod, delta_path))
+
+        for cfg_path, cfg_options in mod.options.items():
+            edited.setdefault(cfg_path, []).append(mod)
+            merged = options.setdefault(cfg_path, {})
+            cfg_index = index.setdefault(cfg_path, {})
+            for option, value in cfg_options.items():
+                section, _, name = option.rpartition('.') if option.startswith('.') else (None, '', option)
+                edits = cfg_index.setdefault(name, {})
+                for other_section, (other, other_value) in edits.items():
+                    if other is not mod and other_value != value and \
+                       (section is None or other_section is None or section == other_section):
+                        __add_conflict__(conflicts, (cfg_path, option), mod, other)
+                edits[section] = (mod, value)
+
+                # re-inserted, so the edits are applied in the order of the mods
+                merged.pop(option, None)
+                merged[option] = value
+
+        for cfg_path, operations in mod.tables.items():
+            edited.setdefault(cfg_path, []).append(mod)
+            tables.setdefault(cfg_path, []).extend(operations)
+
+    return (tuple((from_path, to_path) for to_path, (_, from_path) in files.items()),
+            tuple((delta_path, to_path) for to_path, edits in patches.items() for _, delta_path in edits),
+            options,
+            tables,
+            list(conflicts.values()))
+
+####################          Utility functions          ####################
+
+def __add_conflict__(
+    conflicts: dict,
+    target   : tuple,
+    winner   : object,
+    loser    : object
+):
+    """
+    Utility function that records a mod overriding another one.
+
+    Args:
+        conflicts (dict)  : (path, key) -> conflict, to be updated
+        target    (tuple) : (path, key) edited by both mods
+        winner    (Mod)   : mod applied later
+        loser     (Mod)   : mod overridden
+
+    Returns:
+        None
+
+    """
+    conflict = conflicts.get(target)
+    if conflict is None:
+        conflict = conflicts[target] = Conflict(target[0], target[1], winner, [])
+    for mod in (conflict.winner, loser):
+        if mod is not winner and mod not in conflict.losers:
+            conflict.losers.append(mod)
+    conflict.winner = winner
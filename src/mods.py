@@ -2,84 +2,26 @@
 
 import os
 from pathlib import Path
-import re
 
-from .backup import recover
-from .paths import PATH
+from . import csffbs
+from . import trace
+from .config import Config
+from .paths import PATH, home
 from .logs import LOG
 
-def set_cfg_orig():
-    """
-    Reset config files to originals.
-    
-    Args:
-        None
-
-    Returns: 
-        None
-
-    Raises:
-        FileNotFoundError: missing config files to be recovered
-
-    """
-    # recover config files
-    recover(from_path = PATH.DEMO.value / PATH.CFG_CONTROL.value,
-            to_path   =                   PATH.CFG_CONTROL.value)
-    recover(from_path = PATH.DEMO.value / PATH.CFG_EDITOR.value,
-            to_path   =                   PATH.CFG_EDITOR.value)
-    recover(from_path = PATH.DEMO.value / PATH.CFG_JUEGO.value,
-            to_path   =                   PATH.CFG_JUEGO.value)
-    recover(from_path = PATH.DEMO.value / PATH.CFG_JUEGOPLA.value,
-            to_path   =                   PATH.CFG_JUEGOPLA.value)
-    recover(from_path = PATH.DEMO.value / PATH.CFG_JUEGOPLA.value,
-            to_path   =                   PATH.CFG_JUEGOPLA.value)
-    recover(from_path = PATH.DEMO.value / PATH.CFG_MULTIP.value,
-            to_path   =                   PATH.CFG_MULTIP.value)
-    recover(from_path = PATH.DEMO.value / PATH.CFG_PUNTERIA.value,
-            to_path   =                   PATH.CFG_PUNTERIA.value)
-    recover(from_path = PATH.DEMO.value / PATH.CFG_RED.value,
-            to_path   =                   PATH.CFG_RED.value)
-    recover(from_path = PATH.DEMO.value / PATH.CFG_SONIDOS.value,
-            to_path   =                   PATH.CFG_SONIDOS.value)
-
-    # recover exe
-    recover(from_path = PATH.ORIG.value / PATH.EXE.value,
-            to_path   =                   PATH.EXE.value)
-
-def set_wsfix():
-    """
-    Apply widescreen fix mod.
-
-    Args:
-        None
-    
-    Returns: 
-        None
-
-    """
-    recover(from_path = PATH.WSFIX.value / PATH.EXE.value,
-            to_path   =                    PATH.EXE.value)
-
-    change_config_options(cfg_path = PATH.CFG_JUEGOPLA.value,
-                          options  = {'fFOV': '90.000000'})
-
-def set_noextview():
-    """
-    Apply no-external-view mod.
-
-    Args:
-        None
-    
-    Returns: 
-        None
-
-    """
-    change_config_options(cfg_path = PATH.CFG_JUEGO.value,
-                          options  = {'CameraExternaDistancia'    : '0.000000',
-                                      'CameraExternaAnguloInicial': '0.000000',
-                                      'CameraExternaAnguloMinimo' : '0.000000',
-                                      'CameraExternaAnguloMaximo' : '0.000000',
-                                      'CameraExternaIncFOV'       : '0.000000' })
+# (source, target) pairs of the original files, relative to the game folder, planned under every selection
+ORIG_FILES = (
+    (PATH.DEMO.value / PATH.CFG_CONTROL.value,  PATH.CFG_CONTROL.value),
+    (PATH.DEMO.value / PATH.CFG_EDITOR.value,   PATH.CFG_EDITOR.value),
+    (PATH.DEMO.value / PATH.CFG_JUEGO.value,    PATH.CFG_JUEGO.value),
+    (PATH.DEMO.value / PATH.CFG_JUEGOPLA.value, PATH.CFG_JUEGOPLA.value),
+    (PATH.DEMO.value / PATH.CFG_JUEGOVER.value, PATH.CFG_JUEGOVER.value),
+    (PATH.DEMO.value / PATH.CFG_MULTIP.value,   PATH.CFG_MULTIP.value),
+    (PATH.DEMO.value / PATH.CFG_PUNTERIA.value, PATH.CFG_PUNTERIA.value),
+    (PATH.DEMO.value / PATH.CFG_RED.value,      PATH.CFG_RED.value),
+    (PATH.DEMO.value / PATH.CFG_SONIDOS.value,  PATH.CFG_SONIDOS.value),
+    (PATH.ORIG.value / PATH.EXE.value,          PATH.EXE.value),
+)
 
 def run_game():
     """
@@ -95,7 +37,7 @@ def run_game():
         FileNotFoundError: missing exe file to run the game
 
     """
-    exe_path = PATH.HOME.value / PATH.EXE.value
+    exe_path = home() / PATH.EXE.value
     if Path.exists(exe_path):
         os.startfile(exe_path)
     else:
@@ -113,25 +55,92 @@ def change_config_options(
         options (dict) : dictionary containing option names and corresponding updated values.
 
     Returns: 
-        None
+        tuple: the list of options not found and the list of options found more than once
 
     Raises:
         FileNotFoundError: missing config files to be updated
 
     """
-    cfg_absolute_path = PATH.HOME.value / cfg_path
+    cfg_absolute_path = home() / cfg_path
 
-    if Path.exists(cfg_absolute_path):
-        with open(cfg_absolute_path, 'r', encoding='utf-8') as handle:
-            contents = handle.read()
+    if not Path.exists(cfg_absolute_path):
+        raise FileNotFoundError(LOG.ERR_CHANGE_CFG_FILE.value)
 
-        updated_contents = contents
-        for option, value in options.items():
-            pattern = fr'(\.{option}\s+)(\-?\d+(?:\.\d+)?|\(\s+\d+(?:\.\d+)?\s+\d+(?:\.\d+)?\s+\))'
-            replacement = fr'\1 {value}'
-            updated_contents = re.sub(pattern, replacement, updated_contents)
+    with open(cfg_absolute_path, 'rb') as handle:
+        binary = csffbs.is_binary(handle.read(len(csffbs.MAGIC)))
+
+    with trace.span('patch', 'mods', path=cfg_path) as span:
+        if binary:
+            # binary configs are patched in place, through a writable memory mapping
+            config = csffbs.BinaryConfig.open(cfg_absolute_path, writable=True)
+            try:
+                missing, duplicated = set_config_options(config, options)
+                contents = None if config.in_place() else config.to_bytes()
+            finally:
+                config.close()
+        else:
+            with open(cfg_absolute_path, 'rb') as handle:
+                config = Config.from_bytes(handle.read())
+            missing, duplicated = set_config_options(config, options)
+            contents = config.to_bytes() if config.edits else None
+        span.add(read=os.stat(cfg_absolute_path).st_size)
+
+        if contents is not None:
+            with open(cfg_absolute_path, 'wb') as handle:
+                handle.write(contents)
+            span.add(written=len(contents))
+
+    report_config_options(cfg_path, missing, duplicated)
+
+    return missing, duplicated
+
+def set_config_options(
+    config : Config,
+    options: dict
+) -> tuple:
+    """
+    Change configuration values of a parsed config file (text or binary), through
+    its key index. Options can be bare names, changing every key with that name,
+    or section-qualified keys (e.g. '.PREFERENCES.fFOV').
+    
+    Args:
+        config (Config) : parsed config file, or BinaryConfig
+        options (dict)  : dictionary containing option names and corresponding updated values.
 
-        with open(cfg_absolute_path, 'w', encoding='utf-8') as handle:
-            handle.write(updated_contents)
-    else:
-        raise FileNotFoundError(LOG.ERR_CHANGE_CFG_FILE.value)
+    Returns: 
+        tuple: the list of options not found and the list of options found more than once
+
+    """
+    missing    = []
+    duplicated = []
+    for option, value in options.items():
+        keys = config.find(option)
+        if not keys:
+            missing.append(option)
+        elif len(keys) > 1:
+            duplicated.append(option)
+        for key in keys:
+            config.set(key, value)
+    return missing, duplicated
+
+def report_config_options(
+    cfg_path  : str,
+    missing   : list,
+    duplicated: list
+):
+    """
+    Notify the options of a config file that were not found or found more than once.
+    
+    Args:
+        cfg_path (str)    : path of the config file
+        missing (list)    : options not found
+        duplicated (list) : options found more than once
+
+    Returns: 
+        None
+
+    """
+    for option in missing:
+        print(f'> {LOG.WARN_CFG_MISSING.value} "{option}" in "{cfg_path}"')
+    for option in duplicated:
+        print(f'> {LOG.WARN_CFG_DUPLICATED.value} "{option}" in "{cfg_path}"')
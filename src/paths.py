@@ -1,4 +1,9 @@
-"""Module storing any file/folder useful path."""
+"""Module storing any file/folder useful path.
+
+Paths are relative to the install root of the game, the working directory
+unless another install is injected through set_home (e.g. to manage many
+installs from a single process).
+"""
 
 import os
 from pathlib import Path
@@ -7,8 +12,6 @@ from enum import Enum
 class PATH(Enum):
     """Enum class containing association between path variables and textual ones."""
 
-    HOME = Path(os.getcwd())
-
     EXE = Path('CommXPC.exe')
 
     CFG = Path('config')
@@ -20,12 +23,78 @@ class PATH(Enum):
     CFG_MULTIP   = Path('config/MultiP.cfg')
     CFG_PUNTERIA = Path('config/Punteria.cfg')
     CFG_RED      = Path('config/Red.cfg')
-    CFG_SONIDOS  = Path('config/Sonidos.cfg')
+    CFG_SONIDOS  = Path('config/sonidos.cfg')
 
     ORIG = Path('modsmgr/orig/')
     DEMO = Path('modsmgr/demo/')
     WSFIX = Path('modsmgr/wsfix/')
+    MODS = Path('modsmgr/')
+    PROFILES = Path('modsmgr/profiles/')
+    HISTORY = Path('modsmgr/history/')
+
+    STORE = Path('modsmgr/store/')
+    STORE_INDEX = Path('modsmgr/store/index.json')
+    CACHE = Path('modsmgr/cache/')
+    STAGING = Path('modsmgr/staging/')
+    JOURNAL = Path('modsmgr/journal.json')
 
     RES_ICO   = Path('modsmgr/resources/modsmgr.ico')
     RES_CSF   = Path('modsmgr/resources/csf.png')
-    RES_STATE = Path('modsmgr/resources/env.dat')
+    RES_STATE = Path('modsmgr/resources/state.json')
+    RES_STATE_LEGACY = Path('modsmgr/resources/env.dat')
+
+# install root of the game the Mod Manager works on
+__home__ = Path(os.getcwd())
+
+# functions called when the install root changes, dropping what was cached for the previous one
+__listeners__ = []
+
+def home() -> Path:
+    """
+    Gets the install root of the game the Mod Manager works on.
+
+    Args:
+        None
+
+    Returns:
+        Path: absolute path of the install root
+
+    """
+    return __home__
+
+def set_home(
+    root: Path
+) -> Path:
+    """
+    Points the Mod Manager at another install of the game.
+
+    Args:
+        root (Path) : path of the install root
+
+    Returns:
+        Path: absolute path of the previous install root
+
+    """
+    global __home__
+    previous, __home__ = __home__, Path(os.path.abspath(root))
+    if __home__ != previous:
+        for listener in __listeners__:
+            listener()
+    return previous
+
+def on_home_change(
+    listener: object
+) -> object:
+    """
+    Registers a function to be called when the install root changes, usually
+    as a decorator dropping the module caches tied to an install.
+
+    Args:
+        listener (object) : function called without arguments
+
+    Returns:
+        object: the function
+
+    """
+    __listeners__.append(listener)
+    return listener
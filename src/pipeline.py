@@ -0,0 +1,306 @@
+"""Module running file operations as a dependency graph on a bounded thread pool, as cancellable tasks."""
+
+import threading
+from concurrent.futures import CancelledError, ThreadPoolExecutor, FIRST_COMPLETED, wait
+from pathlib import Path
+
+# worker threads running independent file operations, most of their time being spent in I/O
+MAX_WORKERS = 8
+
+class Operation:
+    """Operation on a single file, run once its dependencies are done."""
+
+    __slots__ = ('path', 'func', 'args', 'kwargs', 'after')
+
+    # relative path of the file the operation works on
+    path: Path
+
+    # function run by the operation, with its arguments
+    func  : object
+    args  : tuple
+    kwargs: dict
+
+    # operations that must be done before this one
+    after: list
+
+    def __init__(self,
+        path  : Path,
+        func  : object,
+        args  : tuple,
+        kwargs: dict
+    ):
+        """
+        Constructor method to initialize an operation with no dependencies.
+
+        Args:
+            path   (Path)   : relative path of the file the operation works on
+            func   (object) : function run by the operation
+            args   (tuple)  : positional arguments of the function
+            kwargs (dict)   : keyword arguments of the function
+
+        Returns:
+            None
+
+        """
+        self.path = path
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.after = []
+
+class Pipeline:
+    """
+    Dependency graph of file operations. Operations on the same file keep the
+    order they were added in, operations on different files run concurrently.
+    """
+
+    # operations in the order they were added
+    operations: list
+
+    # identity of every added operation, to drop duplicates
+    seen: set
+
+    # last operation added for each file
+    last: dict
+
+    def __init__(self):
+        """
+        Constructor method to initialize an empty pipeline.
+
+        Args:
+            None
+
+        Returns:
+            None
+
+        """
+        self.operations = []
+        self.seen = set()
+        self.last = {}
+
+    def add(self,
+        path: Path,
+        func: object,
+        *args,
+        **kwargs
+    ) -> Operation:
+        """
+        Adds an operation on a file, after every operation already added on the
+        same file. An operation identical to one already added is dropped.
+
+        Args:
+            path   (Path)   : relative path of the file the operation works on
+            func   (object) : function run by the operation
+            args   (tuple)  : positional arguments of the function
+            kwargs (dict)   : keyword arguments of the function
+
+        Returns:
+            Operation: the added operation, None if it was a duplicate
+
+        """
+        path = Path(path)
+        identity = (path, func, repr(args), repr(sorted(kwargs.items())))
+        if identity in self.seen:
+            return None
+        self.seen.add(identity)
+
+        operation = Operation(path, func, args, kwargs)
+        if path in self.last:
+            operation.after.append(self.last[path])
+        self.last[path] = operation
+        self.operations.append(operation)
+        return operation
+
+    def run(self,
+        max_workers: int    = MAX_WORKERS,
+        task       : 'Task' = None
+    ) -> list:
+        """
+        Runs every operation as soon as its dependencies are done. On the first
+        failure, or once the task is cancelled, no other operation is started,
+        and the error is raised once the running ones are done.
+
+        Args:
+            max_workers (int)  : maximum number of concurrent operations
+            task        (Task) : task reporting the progress and checking for cancellation, if any
+
+        Returns:
+            list: results of the operations, in the order they were added
+
+        Raises:
+            CancelledError: task cancelled before every operation was run
+
+        """
+        results = {}
+        if len(self.operations) <= 1 or max_workers <= 1:
+            for operation in self.operations:
+                if task is not None:
+                    task.check()
+                results[operation] = operation.func(*operation.args, **operation.kwargs)
+                if task is not None:
+                    task.report(len(results), len(self.operations))
+            return [results[operation] for operation in self.operations]
+
+        waiting = list(self.operations)
+        running = {}
+        error = None
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            while waiting or running:
+                if error is None and task is not None and task.cancelled():
+                    error = CancelledError()
+                if error is None:
+                    ready = [op for op in waiting if all(dep in results for dep in op.after)]
+                    for operation in ready[:max_workers - len(running)]:
+                        waiting.remove(operation)
+                        future = executor.submit(operation.func, *operation.args, **operation.kwargs)
+                        running[future] = operation
+                if not running:
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    operation = running.pop(future)
+                    try:
+                        results[operation] = future.result()
+                    except Exception as err:
+                        error = error or err
+                if task is not None:
+                    task.report(len(results), len(self.operations))
+
+        if error is not None:
+            raise error
+        return [results[operation] for operation in self.operations]
+
+class Task:
+    """
+    Handle of a long running job, e.g. an apply run by a worker thread: it
+    reports the progress of the job, and lets another thread cancel it.
+    """
+
+    # function called with (message, done, total) on progress, if any
+    on_progress: object
+
+    # set once the task is cancelled
+    cancel_event: threading.Event
+
+    # description of the current step
+    message: str
+
+    def __init__(self,
+        on_progress: object = None
+    ):
+        """
+        Constructor method to initialize a task, not cancelled.
+
+        Args:
+            on_progress (object) : function called with (message, done, total) on progress
+
+        Returns:
+            None
+
+        """
+        self.on_progress = on_progress
+        self.cancel_event = threading.Event()
+        self.message = ''
+
+    def step(self,
+        message: str
+    ):
+        """
+        Reports the start of a new step of the job.
+
+        Args:
+            message (str) : description of the step
+
+        Returns:
+            None
+
+        Raises:
+            CancelledError: task cancelled
+
+        """
+        self.check()
+        self.message = message
+        if self.on_progress is not None:
+            self.on_progress(message, 0, 0)
+
+    def report(self,
+        done : int,
+        total: int
+    ):
+        """
+        Reports the progress of the current step.
+
+        Args:
+            done  (int) : operations done
+            total (int) : operations of the step
+
+        Returns:
+            None
+
+        """
+        if self.on_progress is not None:
+            self.on_progress(self.message, done, total)
+
+    def report_transfer(self,
+        copied: int,
+        total : int,
+        rate  : float
+    ):
+        """
+        Reports the progress of a large file copy within the current step.
+
+        Args:
+            copied (int)   : bytes copied
+            total  (int)   : size of the file
+            rate   (float) : throughput, in bytes per second
+
+        Returns:
+            None
+
+        """
+        if self.on_progress is not None:
+            self.on_progress(f'{self.message} ({copied >> 20}/{total >> 20} MiB, {rate / (1 << 20):.1f} MiB/s)', 0, 0)
+
+    def cancel(self):
+        """
+        Requests the cancellation of the job, effective at its next check.
+
+        Args:
+            None
+
+        Returns:
+            None
+
+        """
+        self.cancel_event.set()
+
+    def cancelled(self) -> bool:
+        """
+        Checks if the cancellation of the job was requested.
+
+        Args:
+            None
+
+        Returns:
+            bool: True if cancelled
+
+        """
+        return self.cancel_event.is_set()
+
+    def check(self):
+        """
+        Stops the job if its cancellation was requested.
+
+        Args:
+            None
+
+        Returns:
+            None
+
+        Raises:
+            CancelledError: task cancelled
+
+        """
+        if self.cancelled():
+            raise CancelledError()
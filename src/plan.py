@@ -0,0 +1,446 @@
+"""Module that plans the target state of the game files for a selection of mods."""
+
+from pathlib import Path
+
+from . import cache
+from . import csffbs
+from . import delta
+from . import history
+from . import journal
+from . import manifest
+from . import merge
+from . import mods
+from . import profile
+from . import store
+from . import table
+from . import trace
+from .pipeline import Pipeline, Task
+from .paths import home, on_home_change
+from .logs import LOG
+
+# compiled plans of the selections of mods, keyed by the digests of their manifests
+__compiled__ = {}
+
+@trace.traced('plan')
+def plan_selection(
+    compiled: tuple
+) -> dict:
+    """
+    Builds in memory the target contents of the game files for a compiled
+    selection of mods.
+
+    Args:
+        compiled (tuple) : compiled plan of the mods, as (files, patches, options, tables, conflicts)
+
+    Returns:
+        dict: target contents (bytes), or digest (str) of the stored contents, for each
+        path relative to the game folder
+
+    Raises:
+        FileNotFoundError: missing mod files or config files to be updated
+        ValueError: game file not matching the source of a delta patch
+
+    """
+    files, patches, options, tables, _ = compiled
+    plan = {}
+    __plan_files__(plan, files)
+    __plan_patches__(plan, patches)
+    __plan_options__(plan, options, tables)
+    return plan
+
+def compile_selection(
+    selected: tuple
+) -> tuple:
+    """
+    Compiles a selection of mods into a single plan, memoized by the digests of
+    their manifests. Each game file is read once, from the last mod replacing
+    it, then the delta patches are applied in order, and the options and table
+    edits of each config file are merged, so it's parsed and written once. Conflicting edits
+    are resolved by priority.
+
+    Args:
+        selected (tuple) : selected mods, in the order they're applied
+
+    Returns:
+        tuple: (source, target) pairs of the read files, (delta, target) pairs
+        of the patches, options to be changed and table edits for each config
+        file, and conflicts
+
+    """
+    key = tuple((mod.id, mod.digest) for mod in selected)
+    if key not in __compiled__:
+        __compiled__[key] = merge.merge(mods.ORIG_FILES, selected)
+    return __compiled__[key]
+
+def selection_conflicts(
+    mod_ids: tuple
+) -> list:
+    """
+    Gets the conflicting edits of a selection of mods, without planning it.
+
+    Args:
+        mod_ids (tuple) : names of the selected mods
+
+    Returns:
+        list: conflicts, resolved by priority
+
+    Raises:
+        KeyError: unknown mod
+
+    """
+    return compile_selection(manifest.selection(mod_ids))[4]
+
+@trace.traced('plan')
+def apply_selection(
+    mod_ids: tuple,
+    task   : Task = None
+) -> list:
+    """
+    Applies a selection of mods onto the game folder, writing only the files that differ.
+
+    Args:
+        mod_ids (tuple) : names of the selected mods, none to restore the original files
+        task    (Task)  : task reporting the progress and checking for cancellation, if any
+
+    Returns:
+        list: absolute paths of the written files
+
+    Raises:
+        KeyError: unknown mod
+        FileNotFoundError: missing original or mod files
+        OSError: game files can't be written
+        CancelledError: task cancelled, the game files being left as they were
+
+    """
+    if task is not None:
+        task.step(LOG.PROGRESS_PLAN.value)
+
+    # Reports the conflicting edits before anything is written.
+    for conflict in selection_conflicts(mod_ids):
+        print(f'> {conflict}')
+    entries = selection_entries(mod_ids)
+
+    # Places only the files that differ from the cached ones.
+    if task is not None:
+        task.step(LOG.PROGRESS_APPLY.value)
+    try:
+        return apply_entries(entries, task, 'apply ' + (' '.join(mod_ids) or '(original)'))
+    except OSError as err:
+        raise OSError(LOG.ERR_CFG_APPLY.value + str(err)) from err
+
+@trace.traced('plan')
+def selection_entries(
+    mod_ids: tuple
+) -> dict:
+    """
+    Gets the stored game files of a selection of mods. The files of the selection
+    are looked up in the cache of materialized combinations, and planned only
+    when missing.
+
+    Args:
+        mod_ids (tuple) : names of the selected mods
+
+    Returns:
+        dict: relative path -> digest of the stored contents
+
+    Raises:
+        KeyError: unknown mod
+        FileNotFoundError: missing original or mod files
+
+    """
+    selected = manifest.selection(mod_ids)
+    compiled = compile_selection(selected)
+
+    # Looks up the cached files for the selected mods.
+    try:
+        key = cache.selection_key(selected, compiled)
+    except FileNotFoundError as err:
+        raise FileNotFoundError(LOG.ERR_CFG_MODS.value + str(err)) from err
+    entries = cache.load(key)
+    if entries is not None:
+        return entries
+
+    # Plans the original files, then the selected mods.
+    try:
+        target = plan_selection(compiled)
+    except (FileNotFoundError, ValueError) as err:
+        raise FileNotFoundError(LOG.ERR_CFG_MODS.value + str(err)) from err
+
+    return cache.save(key, target, tuple(mod.id for mod in selected))
+
+@trace.traced('plan')
+def applied_selection(
+    candidates: list = ()
+) -> tuple:
+    """
+    Detects the selection of mods actually applied onto the game folder, by
+    matching the digests of the game files against the files of the candidate
+    selections, of the original files and of the cached selections. Game files
+    are only hashed when their stat signature changed, so this usually takes a
+    single stat sweep.
+
+    Args:
+        candidates (list) : selections of mods (e.g. the last applied one) to be matched first
+
+    Returns:
+        tuple: names of the mods of the applied selection, None if the game
+        files match no selection (e.g. edited by hand, or partially applied)
+
+    Raises:
+        FileNotFoundError: missing original or mod files
+
+    """
+    known = {mod.id for mod in manifest.discover()}
+    variants = {}
+    for mod_ids in [*candidates, (), *cache.selections()]:
+        if set(mod_ids) <= known:
+            selection = tuple(mod.id for mod in manifest.selection(mod_ids))
+            if selection not in variants:
+                variants[selection] = selection_entries(selection)
+
+    current = {}
+    for entries in variants.values():
+        for rel_path in entries:
+            if rel_path in current:
+                continue
+            try:
+                current[rel_path] = store.digest_path(home() / rel_path)
+            except (FileNotFoundError, NotADirectoryError):
+                current[rel_path] = None
+    store.save_index()
+
+    for selection, entries in variants.items():
+        if all(current[rel_path] == digest for rel_path, digest in entries.items()):
+            return selection
+    return None
+
+def selection_message(
+    mod_ids: tuple
+) -> str:
+    """
+    Gets the notification message of a successfully applied selection of mods.
+
+    Args:
+        mod_ids (tuple) : names of the selected mods
+
+    Returns:
+        str: notification message
+
+    """
+    if not mod_ids:
+        return LOG.OK_CFG_ORIG.value
+    names = [mod.name for mod in manifest.selection(mod_ids)]
+    if len(names) > 1:
+        names = [', '.join(names[:-1]) + ' and ' + names[-1]]
+    return f'{names[0]} {LOG.OK_CFG_MODS.value}'
+
+def selection_metadata(
+    mod_ids: tuple
+) -> dict:
+    """
+    Gets the metadata identifying the applied version of each mod of a selection.
+
+    Args:
+        mod_ids (tuple) : names of the selected mods
+
+    Returns:
+        dict: name of each mod -> {'digest': hex digest of its manifest, 'selection':
+        cache key of the selection, 'sources': relative path of each source file -> identity}
+
+    Raises:
+        KeyError: unknown mod
+        FileNotFoundError: missing mod files
+
+    """
+    selected = manifest.selection(mod_ids)
+    key = cache.selection_key(selected, compile_selection(selected))
+    return {mod.id: {'digest'   : mod.digest,
+                     'selection': key,
+                     'sources'  : {Path(from_path).as_posix(): cache.source_identity(from_path)
+                                   for from_path, _ in (*mod.files, *mod.patches)}}
+            for mod in selected}
+
+@trace.traced('plan')
+def apply_entries(
+    entries: dict,
+    task   : Task = None,
+    label  : str  = 'apply'
+) -> list:
+    """
+    Places stored contents onto the game folder, only for the files whose
+    contents changed. The files are staged, then committed all at once, so
+    the game files are never left half-updated. The game files are recorded
+    in the history before, if changed outside the Mod Manager, and after.
+
+    Args:
+        entries (dict) : relative path -> digest of the stored contents
+        task    (Task) : task reporting the progress and checking for cancellation, if any
+        label   (str)  : operation recorded in the history (e.g. 'apply wsfix')
+
+    Returns:
+        list: absolute paths of the written files
+
+    Raises:
+        CancelledError: task cancelled, the game files being left as they were
+
+    """
+    # writing into the folder of a profile would change the profile
+    profile.detach()
+    history.record(history.EXTERNAL)
+    written = journal.apply(entries, task)
+    history.record(label)
+    if not written:
+        print('> Game files already up to date.')
+    for abs_path in written:
+        print(f'> Placed "{abs_path.relative_to(home())}"')
+    return written
+
+####################          Utility functions          ####################
+
+def __plan_files__(
+    plan : dict,
+    files: tuple
+):
+    """
+    Utility function that stores replacement files into the plan, concurrently.
+    Their contents are only read when a later step of the plan edits them.
+
+    Args:
+        plan  (dict)  : target plan to be updated
+        files (tuple) : (source, target) pairs of relative paths
+
+    Returns:
+        None
+
+    Raises:
+        FileNotFoundError: missing source files
+
+    """
+    operations = Pipeline()
+    for from_path, to_path in files:
+        operations.add(to_path, __read_source__, from_path)
+    targets = [to_path for _, to_path in dict.fromkeys(files)]
+    try:
+        plan.update(zip(targets, operations.run()))
+    finally:
+        store.save_index()
+
+def __read_source__(
+    from_path: Path
+) -> str:
+    """
+    Utility function that stores a source file, from disk, from the store or from a mod archive.
+
+    Args:
+        from_path (Path) : relative path of the source file
+
+    Returns:
+        str: hex digest of the stored source file
+
+    Raises:
+        FileNotFoundError: missing source file
+
+    """
+    try:
+        entries = store.resolve(from_path)
+    except FileNotFoundError as err:
+        raise FileNotFoundError(LOG.ERR_BAK_NOBAK.value) from err
+    return entries['']
+
+def __contents__(
+    plan    : dict,
+    rel_path: Path
+) -> bytes:
+    """
+    Utility function that gets the planned contents of a file, reading them from the store if needed.
+
+    Args:
+        plan     (dict) : target plan
+        rel_path (Path) : relative path of the file
+
+    Returns:
+        bytes: planned contents of the file
+
+    """
+    contents = plan[rel_path]
+    return store.read_blob(contents) if isinstance(contents, str) else contents
+
+def __plan_patches__(
+    plan   : dict,
+    patches: tuple
+):
+    """
+    Utility function that applies delta patches onto the planned files, through the store.
+
+    Args:
+        plan    (dict)  : target plan to be updated
+        patches (tuple) : (delta, target) pairs of relative paths, in the order they're applied
+
+    Returns:
+        None
+
+    Raises:
+        FileNotFoundError: files to be patched not in the plan
+        ValueError: planned file not matching the source of the delta
+
+    """
+    for delta_path, to_path in patches:
+        if to_path not in plan:
+            raise FileNotFoundError(f'{LOG.ERR_DELTA_SOURCE.value} {delta_path}')
+        delta_blob = store.blob_path(__read_source__(delta_path))
+        source, _, _ = delta.read_header(delta_blob)
+        contents = plan[to_path]
+        if (contents if isinstance(contents, str) else store.put_bytes(contents)) != source:
+            raise ValueError(f'{LOG.ERR_DELTA_SOURCE.value} {delta_path}')
+        plan[to_path] = store.put_delta(delta_blob)
+
+def __plan_options__(
+    plan   : dict,
+    options: dict,
+    tables : dict = None
+):
+    """
+    Utility function that patches config options, then table edits, of the planned files.
+
+    Args:
+        plan    (dict) : target plan to be updated
+        options (dict) : options to be changed, for each config file
+        tables  (dict) : column edits of the records, for each config file
+
+    Returns:
+        None
+
+    Raises:
+        FileNotFoundError: config files to be updated not in the plan
+        KeyError: no such column
+        ValueError: malformed table edit
+
+    """
+    tables = tables or {}
+    for cfg_path in dict.fromkeys([*options, *tables]):
+        if cfg_path not in plan:
+            raise FileNotFoundError(LOG.ERR_CHANGE_CFG_FILE.value)
+        with trace.span('patch', 'plan', path=cfg_path) as span:
+            contents = __contents__(plan, cfg_path)
+            config = csffbs.load(contents)
+            missing, duplicated = mods.set_config_options(config, options.get(cfg_path, {}))
+            if cfg_path in tables:
+                table.edit_config(config, tables[cfg_path])
+            span.add(read=len(contents))
+            plan[cfg_path] = config.to_bytes()
+            span.add(written=len(plan[cfg_path]))
+        mods.report_config_options(cfg_path, missing, duplicated)
+
+@on_home_change
+def __reset__():
+    """
+    Utility function that drops the plans compiled for the previous install, when the install root changes.
+
+    Args:
+        None
+
+    Returns:
+        None
+
+    """
+    __compiled__.clear()
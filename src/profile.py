@@ -0,0 +1,427 @@
+"""Module switching between named profiles, prebuilt config folders swapped in at once.
+
+A profile is a named selection of mods (e.g. 'competitive', 'cinematic'). Its
+config files are materialized into a folder of its own, e.g.
+`modsmgr/profiles/competitive.1a2b3c4d5e6f/`, and the config folder of the game
+becomes a link to the folder of the active profile. Activating a profile swaps
+that link through a single atomic rename, so it takes the same time however many
+files and keys the profile changes; the exe and the other game files are
+referenced by digest, and placed only if they differ. A profile is built on its
+first activation, and rebuilt only when its manifests or source files changed.
+"""
+
+import json
+import os
+import shutil
+import stat
+from pathlib import Path
+
+from . import cache
+from . import history
+from . import journal
+from . import manifest
+from . import plan
+from . import store
+from . import trace
+from .pipeline import Pipeline, Task
+from .paths import PATH, home
+from .logs import LOG
+
+try:
+    import _winapi
+except ImportError:                                 # only available on Windows
+    _winapi = None
+
+# file name of the profile definitions, in the profiles folder
+PROFILES = 'profiles.json'
+
+# folder where the config folder of the game is moved when a profile replaces it, numbered
+# (e.g. 'detached.1') when an earlier one is kept
+DETACHED = 'detached'
+
+# file name suffix of the link being swapped in, next to the config folder
+SWAP_SUFFIX = '.swap'
+
+# reparse tag of the junctions on Windows, which os.path.isjunction only detects from Python 3.12
+IO_REPARSE_TAG_MOUNT_POINT = 0xA0000003
+
+def profiles() -> dict:
+    """
+    Loads the profile definitions.
+
+    Args:
+        None
+
+    Returns:
+        dict: name -> {'mods': names of the mods, 'key': selection key of the built
+        folder, 'folder': name of the built folder, 'files': other game files -> digest}
+
+    """
+    try:
+        with open(home() / PATH.PROFILES.value / PROFILES, 'r', encoding='utf-8') as handle:
+            return json.load(handle)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+def save(
+    name   : str,
+    mod_ids: tuple
+):
+    """
+    Defines a profile, replacing the one with the same name. It is built on its first activation.
+
+    Args:
+        name    (str)   : name of the profile
+        mod_ids (tuple) : names of the mods of the profile
+
+    Returns:
+        None
+
+    Raises:
+        KeyError: unknown mod
+        ValueError: name not fit for a folder name
+
+    """
+    __check_name__(name)
+    definitions = profiles()
+    previous = definitions.get(name)
+    definitions[name] = {'mods': [mod.id for mod in manifest.selection(mod_ids)], 'key': None, 'folder': None, 'files': {}}
+    __save__(definitions)
+    if previous and previous['folder'] and previous['folder'] != __active_folder__():
+        shutil.rmtree(home() / PATH.PROFILES.value / previous['folder'], ignore_errors=True)
+
+def delete(
+    name: str
+):
+    """
+    Deletes a profile, and its built folder unless it's the active one.
+
+    Args:
+        name (str) : name of the profile
+
+    Returns:
+        None
+
+    Raises:
+        KeyError: unknown profile
+
+    """
+    definitions = profiles()
+    if name not in definitions:
+        raise KeyError(f'{LOG.ERR_PROFILE_UNKNOWN.value} "{name}"')
+    folder = definitions.pop(name)['folder']
+    __save__(definitions)
+    if folder and folder != __active_folder__():
+        shutil.rmtree(home() / PATH.PROFILES.value / folder, ignore_errors=True)
+
+def active() -> str:
+    """
+    Gets the profile whose folder the config folder of the game links to.
+
+    Args:
+        None
+
+    Returns:
+        str: name of the active profile, None if the config folder is not a profile
+
+    """
+    folder = __active_folder__()
+    if folder is None:
+        return None
+    for name, definition in profiles().items():
+        if definition['folder'] == folder:
+            return name
+    return None
+
+@trace.traced('profile')
+def activate(
+    name: str,
+    task: Task = None
+) -> tuple:
+    """
+    Activates a profile, building its folder first if its sources changed since
+    it was built, then swapping the config folder of the game for it at once.
+
+    Args:
+        name (str)  : name of the profile
+        task (Task) : task reporting the progress and checking for cancellation, if any
+
+    Returns:
+        tuple: names of the mods of the profile
+
+    Raises:
+        KeyError: unknown profile or mod
+        FileNotFoundError: missing original or mod files
+        OSError: game files can't be written
+        CancelledError: task cancelled, the game files being left as they were
+
+    """
+    definitions = profiles()
+    if name not in definitions:
+        raise KeyError(f'{LOG.ERR_PROFILE_UNKNOWN.value} "{name}"')
+    definition = definitions[name]
+    selected = manifest.selection(definition['mods'])
+
+    # Rebuilds the folder of the profile only if its sources changed.
+    try:
+        key = cache.selection_key(selected, plan.compile_selection(selected))
+    except FileNotFoundError as err:
+        raise FileNotFoundError(LOG.ERR_CFG_MODS.value + str(err)) from err
+    previous = definition['folder']
+    if key != definition['key'] or previous is None or \
+       not Path.is_dir(home() / PATH.PROFILES.value / previous):
+        if task is not None:
+            task.step(LOG.PROGRESS_PLAN.value)
+        build(name, definition, key, task)
+        __save__(definitions)
+
+    # Places the other game files, e.g. the exe, then swaps the config folder.
+    if task is not None:
+        task.step(LOG.PROGRESS_APPLY.value)
+    history.record(history.EXTERNAL)
+    journal.apply({Path(rel_path): digest for rel_path, digest in definition['files'].items()}, task)
+    __swap__(home() / PATH.PROFILES.value / definition['folder'])
+    history.record(f'profile {name}')
+    if previous and previous != definition['folder']:
+        shutil.rmtree(home() / PATH.PROFILES.value / previous, ignore_errors=True)
+    return tuple(definition['mods'])
+
+@trace.traced('profile')
+def build(
+    name      : str,
+    definition: dict,
+    key       : str,
+    task      : Task = None
+):
+    """
+    Builds the folder of a profile, holding the complete config folder of its
+    selection of mods. Config files not managed by the Mod Manager are copied
+    from the current config folder.
+
+    Args:
+        name       (str)  : name of the profile
+        definition (dict) : definition of the profile, updated with the built folder
+        key        (str)  : selection key of the mods of the profile
+        task       (Task) : task reporting the progress and checking for cancellation, if any
+
+    Returns:
+        None
+
+    Raises:
+        KeyError: unknown mod
+        FileNotFoundError: missing original or mod files
+
+    """
+    print(f'> Building profile "{name}"...')
+    entries = plan.selection_entries(tuple(definition['mods']))
+    folder = f'{name}.{key[:12]}'
+    folder_path = home() / PATH.PROFILES.value / folder
+    shutil.rmtree(folder_path, ignore_errors=True)
+
+    files = {}
+    operations = Pipeline()
+    for rel_path, digest in entries.items():
+        if PATH.CFG.value in Path(rel_path).parents:
+            to_path = folder_path / Path(rel_path).relative_to(PATH.CFG.value)
+            operations.add(to_path, store.materialize, digest, to_path)
+        else:
+            files[Path(rel_path).as_posix()] = digest
+    operations.run(task=task)
+    store.save_index()
+
+    cfg_path = home() / PATH.CFG.value
+    if Path.is_dir(cfg_path):
+        for from_path in cfg_path.rglob('*'):
+            to_path = folder_path / from_path.relative_to(cfg_path)
+            if Path.is_file(from_path) and not Path.exists(to_path):
+                to_path.parent.mkdir(parents=True, exist_ok=True)
+                shutil.copy2(from_path, to_path)
+
+    definition.update(key=key, folder=folder, files=files)
+
+@trace.traced('profile')
+def detach():
+    """
+    Turns the config folder of the game back into a folder of its own, if it
+    links to a profile, so that writing game files leaves the profile intact.
+    This copies the whole config folder of the profile, but only once after
+    each activation: the config folder is a folder of its own from then on.
+
+    Args:
+        None
+
+    Returns:
+        None
+
+    """
+    cfg_path = home() / PATH.CFG.value
+    if not __is_link__(cfg_path):
+        return
+    print('> Detaching config folder from profile...')
+    swap_path = cfg_path.with_name(cfg_path.name + SWAP_SUFFIX)
+    shutil.rmtree(swap_path, ignore_errors=True)
+    shutil.copytree(os.path.realpath(cfg_path), swap_path)
+    __unlink__(cfg_path)
+    os.replace(swap_path, cfg_path)
+
+####################          Utility functions          ####################
+
+def __check_name__(
+    name: str
+):
+    """
+    Utility function that checks that a profile name can be used in a folder name.
+
+    Args:
+        name (str) : name of the profile
+
+    Returns:
+        None
+
+    Raises:
+        ValueError: name not fit for a folder name
+
+    """
+    if not name or name.startswith('.') or Path(name).name != name or name == DETACHED:
+        raise ValueError(f'{LOG.ERR_PROFILE_NAME.value} "{name}"')
+
+def __save__(
+    definitions: dict
+):
+    """
+    Utility function that saves the profile definitions.
+
+    Args:
+        definitions (dict) : name -> definition of each profile
+
+    Returns:
+        None
+
+    """
+    store.save_json(home() / PATH.PROFILES.value / PROFILES, definitions)
+
+def __active_folder__() -> str:
+    """
+    Utility function that gets the profile folder the config folder of the game links to.
+
+    Args:
+        None
+
+    Returns:
+        str: name of the folder, None if the config folder is not a link to a profile folder
+
+    """
+    cfg_path = home() / PATH.CFG.value
+    if not __is_link__(cfg_path):
+        return None
+    target = Path(os.path.realpath(cfg_path))
+    if target.parent != Path(os.path.realpath(home() / PATH.PROFILES.value)):
+        return None
+    return target.name
+
+def __swap__(
+    folder_path: Path
+):
+    """
+    Utility function that points the config folder of the game at a profile
+    folder, through a single atomic rename of a link. A config folder that is
+    not a link (the original one, or one left by detach) is moved to the
+    detached folder instead of being replaced, under a numbered name (e.g.
+    'detached.1') if a detached folder is already there, which is never
+    overwritten.
+
+    Args:
+        folder_path (Path) : absolute path of the profile folder
+
+    Returns:
+        None
+
+    Raises:
+        OSError: config folder being a link of an unknown kind, which is left as it is
+
+    """
+    cfg_path = home() / PATH.CFG.value
+    swap_path = cfg_path.with_name(cfg_path.name + SWAP_SUFFIX)
+    if __is_link__(swap_path):
+        __unlink__(swap_path)
+    __link__(folder_path, swap_path)
+
+    if Path.exists(cfg_path) and not __is_link__(cfg_path):
+        # moving a link taken for a folder would move it into the detached folder, after emptying it
+        if getattr(os.lstat(cfg_path), 'st_file_attributes', 0) & stat.FILE_ATTRIBUTE_REPARSE_POINT:
+            __unlink__(swap_path)
+            raise OSError(f'{LOG.ERR_PROFILE_LINK.value} "{cfg_path}"')
+        detached_path = home() / PATH.PROFILES.value / DETACHED
+        number = 0
+        while Path.exists(detached_path):
+            number += 1
+            detached_path = detached_path.with_name(f'{DETACHED}.{number}')
+        os.replace(cfg_path, detached_path)
+    with trace.span('swap', 'profile', path=folder_path):
+        try:
+            os.replace(swap_path, cfg_path)
+        except OSError:
+            # junctions can't be renamed over each other
+            __unlink__(cfg_path)
+            os.replace(swap_path, cfg_path)
+
+def __link__(
+    folder_path: Path,
+    link_path  : Path
+):
+    """
+    Utility function that links to a folder, through a relative symbolic link,
+    or through a junction on Windows without the symbolic link privilege.
+
+    Args:
+        folder_path (Path) : absolute path of the folder
+        link_path   (Path) : absolute path of the link
+
+    Returns:
+        None
+
+    """
+    try:
+        os.symlink(os.path.relpath(folder_path, link_path.parent), link_path, target_is_directory=True)
+    except OSError:
+        if _winapi is None:
+            raise
+        _winapi.CreateJunction(str(folder_path), str(link_path))
+
+def __is_link__(
+    path: Path
+) -> bool:
+    """
+    Utility function that checks if a path is a symbolic link or a junction.
+
+    Args:
+        path (Path) : absolute path
+
+    Returns:
+        bool: True if the path is a link
+
+    """
+    try:
+        stat_result = os.lstat(path)
+    except (FileNotFoundError, NotADirectoryError):
+        return False
+    return stat.S_ISLNK(stat_result.st_mode) or \
+           getattr(stat_result, 'st_reparse_tag', 0) == IO_REPARSE_TAG_MOUNT_POINT
+
+def __unlink__(
+    path: Path
+):
+    """
+    Utility function that removes a link, leaving the folder it links to intact.
+
+    Args:
+        path (Path) : absolute path of the link
+
+    Returns:
+        None
+
+    """
+    if os.path.islink(path):
+        os.unlink(path)
+    else:
+        os.rmdir(path)
@@ -0,0 +1,204 @@
+"""Module querying and editing the keys of every config file, through a persistent key index.
+
+The index maps every section-qualified key of every file under `config/` to its
+value. It is built once, then refreshed incrementally: only the files whose stat
+signature changed are parsed again. Keys are matched by glob patterns, against
+their bare name (e.g. 'fCansancio*') or their section-qualified key when the
+pattern starts with a dot (e.g. '.PREFERENCES.f*'). Brackets of indexed keys are
+literal (e.g. '.LISTADATOS[2].*'), and a pattern without wildcards is looked up
+directly. A bare name also matches the keys of an option found more than once
+in a section (e.g. 'PM_ITEM' matching '.PM_ITEM[0]'), as it does in a config.
+Edits are placed through the journal, and recorded in the history.
+"""
+
+import fnmatch
+import json
+import os
+import re
+from pathlib import Path
+
+from . import csffbs
+from . import store
+from . import trace
+from .config import Config
+from .paths import PATH, home
+
+# config files indexed, relative to the config folder
+CFG_PATTERN = '*.cfg'
+
+# version of the key index, bumped whenever the keys of a config change scheme
+INDEX_VERSION = 2
+
+@trace.traced('query')
+def refresh() -> dict:
+    """
+    Loads the key index, parsing again only the config files that changed,
+    were added or were removed since it was saved.
+
+    Args:
+        None
+
+    Returns:
+        dict: relative path of each config file -> {qualified key: value text}
+
+    """
+    index_path = home() / PATH.CACHE.value / 'keys.json'
+    try:
+        with open(index_path, 'r', encoding='utf-8') as handle:
+            saved = json.load(handle)
+    except (FileNotFoundError, ValueError):
+        saved = {}
+    index = saved.get('files', {}) if saved.get('version') == INDEX_VERSION else {}
+
+    changed = not index
+    cfg_paths = {cfg_path.relative_to(home()).as_posix(): cfg_path
+                 for cfg_path in sorted((home() / PATH.CFG.value).rglob(CFG_PATTERN))}
+    for rel_path in set(index) - set(cfg_paths):
+        del index[rel_path]
+        changed = True
+    for rel_path, cfg_path in cfg_paths.items():
+        stat = os.stat(cfg_path)
+        signature = [stat.st_size, stat.st_mtime_ns, stat.st_ino]
+        if rel_path in index and index[rel_path]['signature'] == signature:
+            continue
+        with trace.span('index', 'query', path=rel_path):
+            try:
+                keys = __values__(csffbs.load(cfg_path.read_bytes()))
+            except ValueError as err:
+                print(f'> {err} in "{rel_path}"')
+                keys = {}
+        index[rel_path] = {'signature': signature, 'keys': keys}
+        changed = True
+
+    if changed:
+        store.save_json(index_path, {'version': INDEX_VERSION, 'files': index})
+    return {rel_path: entry['keys'] for rel_path, entry in index.items()}
+
+def find(
+    pattern: str,
+    files  : str  = '*',
+    index  : dict = None
+) -> list:
+    """
+    Finds the keys matching a glob pattern.
+
+    Args:
+        pattern (str)  : glob pattern of the bare option names, or of the qualified keys if starting with a dot
+        files   (str)  : glob pattern of the config file names (e.g. 'Juego*.cfg')
+        index   (dict) : key index loaded by refresh, refreshed if None
+
+    Returns:
+        list: (relative path of the config file, qualified key, value text) of each match
+
+    """
+    if index is None:
+        index = refresh()
+    qualified = pattern.startswith('.')
+    literal = not any(char in pattern for char in '*?')
+    if not literal:
+        pattern = re.sub(r'([\[\]])', r'[\1]', pattern)
+
+    matches = []
+    for rel_path, keys in index.items():
+        if not fnmatch.fnmatch(Path(rel_path).name, files):
+            continue
+        if literal and qualified:
+            if pattern in keys:
+                matches.append((rel_path, pattern, keys[pattern]))
+            continue
+        for key, value in keys.items():
+            name = key if qualified else __bare_name__(key, keys)
+            if (name == pattern) if literal else fnmatch.fnmatchcase(name, pattern):
+                matches.append((rel_path, key, value))
+    return matches
+
+@trace.traced('query')
+def set_values(
+    values: dict,
+    files : str  = '*',
+    index : dict = None
+) -> dict:
+    """
+    Sets the values of the keys matching glob patterns. The edits are grouped by
+    config file, so that each file is parsed once however many keys change, then
+    the edited files are placed at once, like an apply.
+
+    Args:
+        values (dict) : glob pattern of the keys (see find) -> new value text
+        files  (str)  : glob pattern of the config file names
+        index  (dict) : key index loaded by refresh, refreshed if None
+
+    Returns:
+        dict: relative path of each edited config file -> {qualified key: new value text}
+
+    Raises:
+        ValueError: value not fitting the structure of a key
+        OSError: game files can't be written
+
+    """
+    from . import plan
+
+    if index is None:
+        index = refresh()
+    edits = {}
+    for pattern, value in values.items():
+        for rel_path, key, _ in find(pattern, files, index):
+            edits.setdefault(rel_path, {})[key] = value
+
+    entries = {}
+    for rel_path, options in edits.items():
+        with trace.span('patch', 'query', path=rel_path) as span:
+            contents = (home() / rel_path).read_bytes()
+            config = csffbs.load(contents)
+            for key, value in options.items():
+                config.set(key, value)
+            span.add(read=len(contents))
+            contents = config.to_bytes()
+            span.add(written=len(contents))
+        entries[Path(rel_path)] = store.put_bytes(contents)
+    if entries:
+        plan.apply_entries(entries, label='set ' + ' '.join(f'{pattern}={value}' for pattern, value in values.items()))
+    return edits
+
+####################          Utility functions          ####################
+
+def __bare_name__(
+    key : str,
+    keys: dict
+) -> str:
+    """
+    Utility function that gets the bare option name of a key. The index of an
+    option found more than once in its section is dropped (e.g. '.PM_ITEM[0]'
+    named 'PM_ITEM'), not the position of an unnamed value in a tuple, whose
+    tuple is a key itself.
+
+    Args:
+        key  (str)  : section-qualified key
+        keys (dict) : qualified keys of the config file
+
+    Returns:
+        str: bare option name
+
+    """
+    named = re.sub(r'\[\d+\]$', '', key)
+    if named != key and named not in keys:
+        key = named
+    return key.rpartition('.')[2]
+
+def __values__(
+    config: object
+) -> dict:
+    """
+    Utility function that gets the values of the keys of a parsed config, blocks excluded.
+
+    Args:
+        config (Config or BinaryConfig) : parsed config
+
+    Returns:
+        dict: qualified key -> value text
+
+    """
+    if isinstance(config, Config):
+        return {key: config.get(key) for key, node in config.index.items() if node.kind != 'block'}
+    return {key: config.get(key) for key, node_index in config.index.items()
+            if config.node(node_index)[3] != csffbs.T_BLOCK}
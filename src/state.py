@@ -0,0 +1,221 @@
+"""Module persisting the state of the environment, as a small versioned JSON file.
+
+The state holds the flags of the environment (e.g. 'cfg_orig', 'mod_wsfix'),
+whose keys follow the discovered mods, and the metadata of each applied mod:
+the digest of its manifest, the key of the applied selection, when it was
+applied and the identity of its source files. It also lists the discovered
+mods with their display names, and the digest of each game file as the applied
+selection left it, so that the status of the mods is told from the state and
+the stat index of the store alone, without discovering or planning the mods.
+It is written atomically, and loaded through a single small read. States written by older versions are
+migrated step by step on load; version 1 is the pickled `env.dat` of earlier
+releases, read through an unpickler refusing anything but plain data.
+"""
+
+import io
+import json
+import os
+from pathlib import Path
+
+from .paths import PATH, home
+from .logs import LOG
+
+# version of the state written, bumped with a migration whenever its layout changes
+STATE_VERSION = 3
+
+def load(
+    path: Path = PATH.RES_STATE.value
+) -> dict:
+    """
+    Loads the state, migrating the legacy state if there is no other.
+
+    Args:
+        path (Path) : path of the state, relative to the install root
+
+    Returns:
+        dict: state, as {'version', 'flags', 'mods', 'names', 'files'}
+
+    Raises:
+        FileNotFoundError: no saved state
+        ValueError: unreadable state, or written by a newer version
+
+    """
+    try:
+        with open(home() / path, 'rb') as handle:
+            contents = handle.read()
+    except FileNotFoundError:
+        with open(home() / PATH.RES_STATE_LEGACY.value, 'rb') as handle:
+            return migrate({'version': 1, 'flags': __unpickle__(handle.read())})
+    try:
+        return migrate(json.loads(contents))
+    except (UnicodeDecodeError, json.JSONDecodeError) as err:
+        raise ValueError(f'{LOG.ERR_STATE_FORMAT.value} {err}') from err
+
+def save(
+    state: dict,
+    path : Path = PATH.RES_STATE.value
+):
+    """
+    Atomically writes the state.
+
+    Args:
+        state (dict) : state, as {'flags', 'mods', 'names': [name, display name] of
+                       each discovered mod, 'files': relative path -> digest of each game file}
+        path  (Path) : path of the state, relative to the install root
+
+    Returns:
+        None
+
+    """
+    # imported only here, reading the state being much more frequent than writing it
+    from . import store
+    store.save_json(home() / path, {**state, 'version': STATE_VERSION})
+
+def migrate(
+    state: dict
+) -> dict:
+    """
+    Migrates a state to the current version, one version at a time.
+
+    Args:
+        state (dict) : loaded state
+
+    Returns:
+        dict: state of the current version
+
+    Raises:
+        ValueError: malformed state, or written by a newer version
+
+    """
+    if not isinstance(state, dict) or not isinstance(state.get('version'), int) or \
+       state['version'] > STATE_VERSION:
+        raise ValueError(LOG.ERR_STATE_FORMAT.value)
+    while state['version'] < STATE_VERSION:
+        state = MIGRATIONS[state['version']](state)
+    if not isinstance(state.get('flags'), dict) or not isinstance(state.get('mods'), dict) or \
+       not isinstance(state.get('names'), list) or not isinstance(state.get('files'), dict):
+        raise ValueError(LOG.ERR_STATE_FORMAT.value)
+    return state
+
+def is_current(
+    state: dict
+) -> bool:
+    """
+    Checks, through a single stat sweep, that the game files are still the ones
+    the state was saved with: each must have the stat signature recorded in the
+    stat index of the store along with the digest recorded by the state. Nothing
+    is hashed, so a file merely touched since makes the state look outdated.
+
+    Args:
+        state (dict) : loaded state
+
+    Returns:
+        bool: True if the game files are the ones recorded by the state
+
+    """
+    if not state['files']:
+        return False
+    try:
+        with open(home() / PATH.STORE_INDEX.value, 'r', encoding='utf-8') as handle:
+            index = json.load(handle)
+    except (FileNotFoundError, ValueError):
+        return False
+    for rel_path, digest in state['files'].items():
+        abs_path = home() / rel_path
+        try:
+            stat = os.stat(abs_path)
+        except (FileNotFoundError, NotADirectoryError):
+            return False
+        if index.get(str(abs_path)) != [stat.st_size, stat.st_mtime_ns, stat.st_ino, digest]:
+            return False
+    return True
+
+####################          Utility functions          ####################
+
+def __unpickle__(
+    contents: bytes
+) -> dict:
+    """
+    Utility function that reads the legacy pickled state.
+
+    Args:
+        contents (bytes) : contents of the legacy state
+
+    Returns:
+        dict: state key -> value
+
+    Raises:
+        ValueError: not a pickled dict of plain data
+
+    """
+    # only needed once, for the releases that pickled the state
+    import pickle
+
+    class RestrictedUnpickler(pickle.Unpickler):
+        """Unpickler of the legacy state, refusing to load any class or function."""
+
+        def find_class(self,
+            module: str,
+            name  : str
+        ):
+            """
+            Refuses every global referenced by the pickle, so that loading it can't run code.
+
+            Args:
+                module (str) : module of the global
+                name   (str) : name of the global
+
+            Returns:
+                None
+
+            Raises:
+                pickle.UnpicklingError: always
+
+            """
+            raise pickle.UnpicklingError(f'forbidden global {module}.{name}')
+
+    try:
+        flags = RestrictedUnpickler(io.BytesIO(contents)).load()
+    except (pickle.UnpicklingError, EOFError, TypeError, AttributeError) as err:
+        raise ValueError(f'{LOG.ERR_STATE_FORMAT.value} {err}') from err
+    if not isinstance(flags, dict):
+        raise ValueError(LOG.ERR_STATE_FORMAT.value)
+    return flags
+
+def __migrate_v1__(
+    state: dict
+) -> dict:
+    """
+    Utility function that migrates the legacy state, a dict of flags, to version 2.
+
+    Args:
+        state (dict) : state of version 1
+
+    Returns:
+        dict: state of version 2, without metadata of the applied mods
+
+    """
+    flags = {str(key): int(value) for key, value in state['flags'].items() if isinstance(value, (int, bool))}
+    return {'version': 2, 'flags': flags, 'mods': {}}
+
+def __migrate_v2__(
+    state: dict
+) -> dict:
+    """
+    Utility function that migrates a state of version 2 to version 3.
+
+    Args:
+        state (dict) : state of version 2
+
+    Returns:
+        dict: state of version 3, without names of the mods nor game files,
+        so that they're detected again
+
+    """
+    return {**state, 'version': 3, 'names': [], 'files': {}}
+
+# version -> function migrating a state of that version to the next one
+MIGRATIONS = {
+    1: __migrate_v1__,
+    2: __migrate_v2__
+}
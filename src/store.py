@@ -0,0 +1,779 @@
+"""Module implementing a content-addressed store of game files."""
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+from pathlib import Path
+
+from .paths import PATH, home, on_home_change
+from . import archive
+from . import delta
+from . import trace
+from . import transfer
+from .pipeline import Pipeline, Task
+from .logs import LOG
+
+try:
+    import fcntl
+except ImportError:                                 # not available on Windows
+    fcntl = None
+
+# ioctl request cloning a file on copy-on-write filesystems (btrfs, xfs)
+FICLONE = 0x40049409
+
+CHUNK_SIZE = 1 << 20
+
+# largest read buffer when hashing a file, hashlib releasing the GIL so threads hash in parallel
+HASH_BUFFER = 8 << 20
+
+# absolute path -> [size, mtime_ns, inode, digest] of every file seen by the store
+__index__ = None
+
+# relative path -> digest, for every file recorded in a manifest
+__manifests__ = None
+
+def digest_path(
+    abs_path: Path
+) -> str:
+    """
+    Gets the digest of a file, hashing it only when its stat signature
+    (size, mtime, inode) changed since the last time it was seen.
+
+    Args:
+        abs_path (Path) : absolute path of the file
+
+    Returns:
+        str: hex digest of the file contents
+
+    Raises:
+        FileNotFoundError: missing file
+
+    """
+    index = __load_index__()
+    stat = os.stat(abs_path)
+    key = str(abs_path)
+    entry = index.get(key)
+    if entry and entry[:3] == __signature__(stat):
+        return entry[3]
+
+    hasher = hashlib.sha256()
+    buffer = memoryview(bytearray(min(max(stat.st_size, 1), HASH_BUFFER)))
+    with trace.span('hash', 'store', path=abs_path) as span, open(abs_path, 'rb', buffering=0) as handle:
+        for length in iter(lambda: handle.readinto(buffer), 0):
+            hasher.update(buffer[:length])
+        span.add(read=stat.st_size)
+    digest = hasher.hexdigest()
+    index[key] = __signature__(stat) + [digest]
+    return digest
+
+def digest_bytes(
+    contents: bytes
+) -> str:
+    """
+    Gets the digest of in-memory contents.
+
+    Args:
+        contents (bytes) : contents to be hashed
+
+    Returns:
+        str: hex digest of the contents
+
+    """
+    return hashlib.sha256(contents).hexdigest()
+
+def blob_path(
+    digest: str
+) -> Path:
+    """
+    Gets the absolute path of a stored blob.
+
+    Args:
+        digest (str) : hex digest of the blob
+
+    Returns:
+        Path: absolute path of the blob
+
+    """
+    return home() / PATH.STORE.value / 'blobs' / digest[:2] / digest
+
+def put_path(
+    abs_path: Path
+) -> str:
+    """
+    Stores a file, unless a blob with the same contents is already stored.
+
+    Args:
+        abs_path (Path) : absolute path of the file
+
+    Returns:
+        str: hex digest of the stored blob
+
+    Raises:
+        FileNotFoundError: missing file to be stored
+
+    """
+    digest = digest_path(abs_path)
+    blob = blob_path(digest)
+    if not Path.exists(blob):
+        blob.parent.mkdir(parents=True, exist_ok=True)
+        tmp_blob = __tmp_path__(blob)
+        with trace.span('put', 'store', path=abs_path) as span:
+            __copy__(abs_path, tmp_blob, __part_path__(digest, abs_path))
+            os.chmod(tmp_blob, 0o444)
+            os.replace(tmp_blob, blob)
+            span.add(written=os.stat(blob).st_size)
+    return digest
+
+def put_bytes(
+    contents: bytes
+) -> str:
+    """
+    Stores in-memory contents, unless a blob with the same contents is already stored.
+
+    Args:
+        contents (bytes) : contents to be stored
+
+    Returns:
+        str: hex digest of the stored blob
+
+    """
+    digest = digest_bytes(contents)
+    blob = blob_path(digest)
+    if not Path.exists(blob):
+        blob.parent.mkdir(parents=True, exist_ok=True)
+        tmp_blob = __tmp_path__(blob)
+        with trace.span('put_bytes', 'store', digest=digest) as span:
+            with open(tmp_blob, 'wb') as handle:
+                handle.write(contents)
+            os.chmod(tmp_blob, 0o444)
+            os.replace(tmp_blob, blob)
+            span.add(written=len(contents))
+    return digest
+
+def put_stream(
+    handle: object
+) -> str:
+    """
+    Stores the contents read from a binary stream, hashed while they're written,
+    unless a blob with the same contents is already stored.
+
+    Args:
+        handle (object) : binary stream of the contents (e.g. an archive member)
+
+    Returns:
+        str: hex digest of the stored blob
+
+    """
+    tmp_blob = __tmp_path__(home() / PATH.STORE.value / 'blobs' / 'stream')
+    tmp_blob.parent.mkdir(parents=True, exist_ok=True)
+    hasher = hashlib.sha256()
+    with trace.span('put_stream', 'store') as span:
+        with open(tmp_blob, 'wb') as target:
+            for chunk in iter(lambda: handle.read(CHUNK_SIZE), b''):
+                hasher.update(chunk)
+                target.write(chunk)
+            span.add(written=target.tell())
+
+        digest = hasher.hexdigest()
+        blob = blob_path(digest)
+        if Path.exists(blob):
+            os.unlink(tmp_blob)
+            return digest
+        blob.parent.mkdir(parents=True, exist_ok=True)
+        os.chmod(tmp_blob, 0o444)
+        os.replace(tmp_blob, blob)
+    return digest
+
+def put_delta(
+    delta_path: Path
+) -> str:
+    """
+    Stores the target of a delta, rebuilt from its source blob unless already stored.
+
+    Args:
+        delta_path (Path) : absolute path of the delta
+
+    Returns:
+        str: hex digest of the stored target
+
+    Raises:
+        FileNotFoundError: source of the delta not in the store
+        ValueError: malformed delta, or corrupted target
+
+    """
+    source, target, _ = delta.read_header(delta_path)
+    blob = blob_path(target)
+    if Path.exists(blob):
+        return target
+
+    source_blob = blob_path(source)
+    if not Path.exists(source_blob):
+        raise FileNotFoundError(f'{LOG.ERR_DELTA_SOURCE.value} {delta_path}')
+
+    blob.parent.mkdir(parents=True, exist_ok=True)
+    tmp_blob = __tmp_path__(blob)
+    with trace.span('put_delta', 'store', path=delta_path) as span:
+        delta.apply(delta_path, source_blob, tmp_blob, source_digest=source)
+        os.chmod(tmp_blob, 0o444)
+        os.replace(tmp_blob, blob)
+        span.add(read=os.stat(delta_path).st_size, written=os.stat(blob).st_size)
+    return target
+
+def read_blob(
+    digest: str
+) -> bytes:
+    """
+    Reads the contents of a stored blob.
+
+    Args:
+        digest (str) : hex digest of the blob
+
+    Returns:
+        bytes: contents of the blob
+
+    Raises:
+        FileNotFoundError: missing blob in the store
+
+    """
+    try:
+        with trace.span('read_blob', 'store', digest=digest) as span, open(blob_path(digest), 'rb') as handle:
+            contents = handle.read()
+            span.add(read=len(contents))
+            return contents
+    except FileNotFoundError as err:
+        raise FileNotFoundError(LOG.ERR_STORE_MISSING.value) from err
+
+@trace.traced('store')
+def snapshot(
+    name    : str,
+    rel_path: Path,
+    prune   : bool = False
+) -> dict:
+    """
+    Stores every file under a path and records them in the manifest with the given name.
+
+    Args:
+        name     (str)  : name of the manifest (e.g. the variant name)
+        rel_path (Path) : relative path of the file/folder to be stored
+        prune    (bool) : defines if the stored files should be removed from their location
+
+    Returns:
+        dict: path relative to rel_path ('' for a file) -> digest
+
+    Raises:
+        FileNotFoundError: missing data to be stored
+        ValueError: stored blob not matching its digest, nothing being pruned
+
+    """
+    abs_path = home() / rel_path
+    if not Path.exists(abs_path):
+        raise FileNotFoundError(LOG.ERR_BAK_NOORIG.value)
+
+    entries = resolve(rel_path)
+    record(name, rel_path, entries)
+
+    if prune:
+        prune_stored(rel_path, entries)
+    return entries
+
+def prune_stored(
+    rel_path: Path,
+    entries : dict
+):
+    """
+    Removes stored files from their location, once every blob has been checked
+    against its digest, then the folders they leave empty.
+
+    Args:
+        rel_path (Path) : relative path of the stored file/folder
+        entries  (dict) : path relative to rel_path ('' for a file) -> digest
+
+    Returns:
+        None
+
+    Raises:
+        ValueError: stored blob not matching its digest, nothing being removed
+
+    """
+    for digest in set(entries.values()):
+        if __hash_blob__(digest) != digest:
+            raise ValueError(f'{LOG.ERR_STORE_CORRUPTED.value} {digest}')
+
+    abs_path = home() / rel_path
+    for suffix in entries:
+        file_path = abs_path / suffix if suffix else abs_path
+        os.chmod(file_path, 0o777)
+        os.unlink(file_path)
+    if Path.is_dir(abs_path):
+        for dir_path in sorted(abs_path.rglob('*'), reverse=True):
+            if Path.is_dir(dir_path) and not any(dir_path.iterdir()):
+                dir_path.rmdir()
+
+def record(
+    name    : str,
+    rel_path: Path,
+    entries : dict
+):
+    """
+    Records stored files in a manifest, replacing any previous entry under the same path.
+
+    Args:
+        name     (str)  : name of the manifest
+        rel_path (Path) : relative path of the recorded file/folder
+        entries  (dict) : path relative to rel_path ('' for a file) -> digest
+
+    Returns:
+        None
+
+    """
+    key = Path(rel_path).as_posix()
+    prefix = key.rstrip('/') + '/'
+    manifest = {k: v for k, v in load_manifest(name).items() if k != key and not k.startswith(prefix)}
+    manifest.update({(f'{prefix}{suffix}' if suffix else key): digest for suffix, digest in entries.items()})
+    save_json(__manifest_path__(name), manifest)
+
+    global __manifests__
+    __manifests__ = None
+    save_index()
+
+def load_manifest(
+    name: str
+) -> dict:
+    """
+    Loads a manifest of the store.
+
+    Args:
+        name (str) : name of the manifest
+
+    Returns:
+        dict: relative file path -> digest (empty if the manifest does not exist)
+
+    """
+    try:
+        with open(__manifest_path__(name), 'r', encoding='utf-8') as handle:
+            return json.load(handle)
+    except FileNotFoundError:
+        return {}
+
+def resolve(
+    rel_path: Path
+) -> dict:
+    """
+    Resolves a file/folder into the digests of the files it contains. Files
+    still on disk are stored on the fly, files shipped as a delta are rebuilt
+    from the stored source of the delta, members of mod archives are extracted
+    once, the others are looked up in the manifests.
+
+    Args:
+        rel_path (Path) : relative path of the file/folder
+
+    Returns:
+        dict: path relative to rel_path ('' for a file) -> digest
+
+    Raises:
+        FileNotFoundError: data neither on disk nor in any manifest
+
+    """
+    abs_path = home() / rel_path
+    if Path.is_file(abs_path):
+        return {'': put_path(abs_path)}
+    if Path.is_dir(abs_path):
+        return {p.relative_to(abs_path).as_posix(): put_path(p)
+                for p in sorted(abs_path.rglob('*')) if p.is_file() and p.suffix != delta.SUFFIX}
+    delta_path = abs_path.with_name(abs_path.name + delta.SUFFIX)
+    if Path.is_file(delta_path):
+        return {'': put_delta(delta_path)}
+    member = archive.split(rel_path)
+    if member is not None:
+        return {'': archive.extract(*member)}
+
+    key = Path(rel_path).as_posix()
+    manifests = __load_manifests__()
+    if key in manifests:
+        return {'': manifests[key]}
+    prefix = key.rstrip('/') + '/'
+    entries = {k[len(prefix):]: v for k, v in manifests.items() if k.startswith(prefix)}
+    if not entries:
+        raise FileNotFoundError(LOG.ERR_STORE_MISSING.value)
+    return entries
+
+@trace.traced('store')
+def restore(
+    entries : dict,
+    rel_path: Path,
+    task    : Task = None
+) -> list:
+    """
+    Restores stored files in a location, skipping the ones already matching.
+    Files are checked and placed concurrently.
+
+    Args:
+        entries  (dict) : path relative to rel_path ('' for a file) -> digest
+        rel_path (Path) : relative path of the restored file/folder
+        task     (Task) : task reporting the progress and checking for cancellation, if any
+
+    Returns:
+        list: absolute paths of the written files
+
+    Raises:
+        CancelledError: task cancelled, some files being already written
+
+    """
+    abs_path = home() / rel_path
+    __load_index__()
+    operations = Pipeline()
+    for suffix, digest in entries.items():
+        to_path = abs_path / suffix if suffix else abs_path
+        operations.add(to_path, __restore_path__, digest, to_path, task)
+    try:
+        written = [to_path for to_path in operations.run(task=task) if to_path is not None]
+    finally:
+        save_index()
+    return written
+
+def materialize(
+    digest : str,
+    to_path: Path,
+    task   : Task = None
+):
+    """
+    Places a stored blob at the given location, through a reflink where the
+    filesystem allows it, otherwise through a copy. Placed files are never
+    hardlinked to the blob, since they're made writable when replaced.
+
+    Args:
+        digest  (str)  : hex digest of the blob
+        to_path (Path) : absolute path where to place the blob
+        task    (Task) : task the progress of large copies is reported to, printed if None
+
+    Returns:
+        None
+
+    Raises:
+        FileNotFoundError: missing blob in the store
+
+    """
+    blob = blob_path(digest)
+    if not Path.exists(blob):
+        raise FileNotFoundError(LOG.ERR_STORE_MISSING.value)
+
+    to_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = __tmp_path__(to_path)
+    if Path.exists(tmp_path):
+        os.unlink(tmp_path)
+
+    with trace.span('materialize', 'store', path=to_path) as span:
+        if not __reflink__(blob, tmp_path):
+            __copy__(blob, tmp_path, __part_path__(digest, to_path), task)
+            span.add(written=os.stat(tmp_path).st_size)
+
+        if Path.exists(to_path):
+            os.chmod(to_path, 0o777)
+        os.replace(tmp_path, to_path)
+
+    __load_index__()[str(to_path)] = __signature__(os.stat(to_path)) + [digest]
+
+def rename(
+    from_path: Path,
+    to_path  : Path
+):
+    """
+    Atomically moves a file over another, keeping its stat signature cached.
+
+    Args:
+        from_path (Path) : absolute path of the file to be moved
+        to_path   (Path) : absolute path of the replaced file
+
+    Returns:
+        None
+
+    """
+    to_path.parent.mkdir(parents=True, exist_ok=True)
+    if Path.exists(to_path):
+        os.chmod(to_path, 0o777)
+    os.replace(from_path, to_path)
+
+    index = __load_index__()
+    entry = index.pop(str(from_path), None)
+    if entry is not None:
+        index[str(to_path)] = entry
+
+def save_index():
+    """
+    Saves the stat signature cache of the store.
+
+    Args:
+        None
+
+    Returns:
+        None
+
+    """
+    # saved from a copy, the index being updated concurrently by the pipelines
+    if __index__ is not None:
+        save_json(home() / PATH.STORE_INDEX.value, dict(__index__))
+
+def discard(
+    digests: set
+):
+    """
+    Removes stored blobs, keeping the ones still recorded in a manifest.
+
+    Args:
+        digests (set) : hex digests of the blobs
+
+    Returns:
+        None
+
+    """
+    for digest in set(digests) - set(__load_manifests__().values()):
+        blob = blob_path(digest)
+        if Path.exists(blob):
+            os.chmod(blob, 0o777)
+            os.unlink(blob)
+
+def save_json(
+    to_path : Path,
+    contents: dict
+):
+    """
+    Atomically writes a json file.
+
+    Args:
+        to_path  (Path) : absolute path of the file
+        contents (dict) : data to be written
+
+    Returns:
+        None
+
+    """
+    to_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = __tmp_path__(to_path)
+    with open(tmp_path, 'w', encoding='utf-8') as handle:
+        json.dump(contents, handle, indent=1, sort_keys=True)
+    os.replace(tmp_path, to_path)
+
+####################          Utility functions          ####################
+
+def __restore_path__(
+    digest : str,
+    to_path: Path,
+    task   : Task = None
+) -> Path:
+    """
+    Utility function that places a stored blob, unless the file already matches it.
+
+    Args:
+        digest  (str)  : hex digest of the blob
+        to_path (Path) : absolute path where to place the blob
+        task    (Task) : task the progress of large copies is reported to, printed if None
+
+    Returns:
+        Path: to_path if it was written, None otherwise
+
+    """
+    try:
+        if digest_path(to_path) == digest:
+            return None
+    except (FileNotFoundError, NotADirectoryError):
+        pass
+    materialize(digest, to_path, task)
+    return to_path
+
+def __signature__(
+    stat: os.stat_result
+) -> list:
+    """
+    Utility function that gets the stat signature of a file, changing whenever
+    its contents may have changed.
+
+    Args:
+        stat (os.stat_result) : stat of the file
+
+    Returns:
+        list: size, modification time (ns) and inode of the file
+
+    """
+    return [stat.st_size, stat.st_mtime_ns, stat.st_ino]
+
+def __tmp_path__(
+    abs_path: Path
+) -> Path:
+    """
+    Utility function that gets a temporary sibling of a file, unique to the running thread.
+
+    Args:
+        abs_path (Path) : absolute path of the file
+
+    Returns:
+        Path: absolute path of the temporary file
+
+    """
+    return abs_path.with_name(f'{abs_path.name}.{threading.get_ident()}.tmp')
+
+def __manifest_path__(
+    name: str
+) -> Path:
+    """
+    Utility function that gets the absolute path of a manifest.
+
+    Args:
+        name (str) : name of the manifest
+
+    Returns:
+        Path: absolute path of the manifest
+
+    """
+    return home() / PATH.STORE.value / 'manifests' / f'{name}.json'
+
+def __load_index__() -> dict:
+    """
+    Utility function that lazily loads the stat signature cache.
+
+    Args:
+        None
+
+    Returns:
+        dict: absolute path -> [size, mtime_ns, inode, digest]
+
+    """
+    global __index__
+    if __index__ is None:
+        try:
+            with open(home() / PATH.STORE_INDEX.value, 'r', encoding='utf-8') as handle:
+                __index__ = json.load(handle)
+        except (FileNotFoundError, ValueError):
+            __index__ = {}
+    return __index__
+
+def __load_manifests__() -> dict:
+    """
+    Utility function that lazily loads the entries of every manifest.
+
+    Args:
+        None
+
+    Returns:
+        dict: relative file path -> digest
+
+    """
+    global __manifests__
+    if __manifests__ is None:
+        __manifests__ = {}
+        manifests_dir = home() / PATH.STORE.value / 'manifests'
+        if Path.is_dir(manifests_dir):
+            for manifest_path in sorted(manifests_dir.glob('*.json')):
+                __manifests__.update(load_manifest(manifest_path.stem))
+    return __manifests__
+
+def __copy__(
+    from_path: Path,
+    to_path  : Path,
+    part_path: Path,
+    task     : Task = None
+):
+    """
+    Utility function that copies a file, large files through resumable chunked
+    copies whose partial copy is kept across runs.
+
+    Args:
+        from_path (Path) : absolute path of the source file
+        to_path   (Path) : absolute path of the copy
+        part_path (Path) : absolute path of the partial copy, for large files
+        task      (Task) : task the progress of large copies is reported to, printed if None
+
+    Returns:
+        None
+
+    """
+    if os.stat(from_path).st_size < transfer.COPY_THRESHOLD:
+        shutil.copyfile(from_path, to_path)
+    else:
+        transfer.copy(from_path, to_path, part_path, None if task is None else task.report_transfer)
+
+def __part_path__(
+    digest: str,
+    path  : Path
+) -> Path:
+    """
+    Utility function that gets the partial copy of a large blob, kept across
+    runs under the store so that an interrupted copy resumes. It's keyed by the
+    other end of the copy too, so that concurrent copies of the same blob (e.g.
+    onto two game files) never write into the same partial copy.
+
+    Args:
+        digest (str)  : hex digest of the blob
+        path   (Path) : absolute path of the file the blob is copied from or to
+
+    Returns:
+        Path: absolute path of the partial copy
+
+    """
+    key = hashlib.sha256(str(path).encode('utf-8')).hexdigest()[:16]
+    return home() / PATH.STORE.value / 'partial' / f'{digest}.{key}{transfer.SUFFIX}'
+
+def __reflink__(
+    from_path: Path,
+    to_path  : Path
+) -> bool:
+    """
+    Utility function that clones a file on copy-on-write filesystems.
+
+    Args:
+        from_path (Path) : absolute path of the file to be cloned
+        to_path   (Path) : absolute path of the clone
+
+    Returns:
+        bool: True if the clone was created
+
+    """
+    if fcntl is None:
+        return False
+    try:
+        with open(from_path, 'rb') as src, open(to_path, 'wb') as dst:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        return True
+    except OSError:
+        if Path.exists(to_path):
+            os.unlink(to_path)
+        return False
+
+def __hash_blob__(
+    digest: str
+) -> str:
+    """
+    Utility function that hashes a stored blob, bypassing the stat cache.
+
+    Args:
+        digest (str) : hex digest the blob is stored under
+
+    Returns:
+        str: hex digest of the contents of the blob, None if missing
+
+    """
+    hasher = hashlib.sha256()
+    try:
+        with open(blob_path(digest), 'rb') as handle:
+            for chunk in iter(lambda: handle.read(CHUNK_SIZE), b''):
+                hasher.update(chunk)
+    except FileNotFoundError:
+        return None
+    return hasher.hexdigest()
+
+@on_home_change
+def __reset__():
+    """
+    Utility function that drops the stat cache and manifests of the previous install, when the install root changes.
+
+    Args:
+        None
+
+    Returns:
+        None
+
+    """
+    global __index__, __manifests__
+    __index__ = None
+    __manifests__ = None
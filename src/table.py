@@ -0,0 +1,271 @@
+"""Module editing the records of a config file as columns of numbers.
+
+Configs such as `Punteria.cfg` hold tables: many records (e.g. the aiming data
+of each weapon class and difficulty) sharing the same numeric fields. A table
+gathers every record of a config into one array per field, so that a mod can
+scale, offset, clamp or replace a whole column, or the rows matching a glob
+pattern, in a single operation. Only the changed cells are written back, in a
+single pass over the config. Columns are NumPy arrays when NumPy is installed,
+or arrays of the standard library otherwise.
+"""
+
+import array
+import fnmatch
+import math
+
+from . import csffbs
+from . import trace
+from .config import Config
+from .logs import LOG
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# operations of a table edit, in the order they're applied
+OPERATIONS = ('set', 'scale', 'offset', 'clamp')
+
+class Table:
+    """Numeric fields of the records of a config, as columns."""
+
+    __slots__ = ('rows', 'columns', 'keys', 'original')
+
+    # section-qualified keys of the records (e.g. '.LISTADATOS[0].SMG.FACIL')
+    rows: list
+
+    # field name -> values of the field in each row, NaN where a row lacks it
+    columns: dict
+
+    # field name -> qualified key of the field in each row, None where a row lacks it
+    keys: dict
+
+    # field name -> values of the field as loaded, to find the changed cells
+    original: dict
+
+    def __init__(self,
+        config: object,
+        rows  : str = '*'
+    ):
+        """
+        Constructor method to gather the numeric fields of the records of a config.
+
+        Args:
+            config (Config or BinaryConfig) : parsed config
+            rows   (str)                    : glob pattern of the qualified keys of the records
+
+        Returns:
+            None
+
+        """
+        records = {}
+        for key in __numbers__(config):
+            row, _, name = key.rpartition('.')
+            if row and not name.endswith(']') and fnmatch.fnmatchcase(row, rows):
+                records.setdefault(row, {})[name] = key
+
+        self.rows = list(records)
+        self.keys = {}
+        for i, fields in enumerate(records.values()):
+            for name, key in fields.items():
+                self.keys.setdefault(name, [None] * len(self.rows))[i] = key
+        self.columns = {name: __column__([math.nan if key is None else float(config.get(key)) for key in keys])
+                        for name, keys in self.keys.items()}
+        self.original = {name: __column__(column) for name, column in self.columns.items()}
+
+    def select(self,
+        rows: str = '*'
+    ) -> list:
+        """
+        Selects the rows whose qualified key matches a glob pattern.
+
+        Args:
+            rows (str) : glob pattern of the qualified keys of the records (e.g. '*.SMG.*')
+
+        Returns:
+            list: indexes of the matching rows
+
+        """
+        return [i for i, row in enumerate(self.rows) if fnmatch.fnmatchcase(row, rows)]
+
+    def edit(self,
+        operation: dict
+    ):
+        """
+        Edits a column, the operations being applied in the order of OPERATIONS.
+
+        Args:
+            operation (dict) : 'column' name, 'rows' glob pattern (default '*'),
+                               and any of 'set' value, 'scale' factor, 'offset'
+                               value and 'clamp' [low, high] bounds (None for no bound)
+
+        Returns:
+            None
+
+        Raises:
+            KeyError: no such column
+            ValueError: malformed operation
+
+        """
+        name = operation['column']
+        if name not in self.columns:
+            raise KeyError(f'{LOG.ERR_CFG_KEY.value} {name}')
+        if not any(key in operation for key in OPERATIONS):
+            raise ValueError(f'{LOG.ERR_TABLE_OPERATION.value} {name}')
+        column = self.columns[name]
+        # rows without the field are left missing
+        indexes = [i for i in self.select(operation.get('rows', '*')) if self.keys[name][i] is not None]
+
+        if 'clamp' in operation:
+            low, high = operation['clamp']
+            low = -math.inf if low is None else float(low)
+            high = math.inf if high is None else float(high)
+        if np is not None:
+            indexes = np.array(indexes, dtype=np.intp)
+            if 'set' in operation:
+                column[indexes] = float(operation['set'])
+            if 'scale' in operation:
+                column[indexes] *= float(operation['scale'])
+            if 'offset' in operation:
+                column[indexes] += float(operation['offset'])
+            if 'clamp' in operation:
+                column[indexes] = np.clip(column[indexes], low, high)
+            return
+
+        for i in indexes:
+            value = column[i]
+            if 'set' in operation:
+                value = float(operation['set'])
+            if 'scale' in operation:
+                value *= float(operation['scale'])
+            if 'offset' in operation:
+                value += float(operation['offset'])
+            if 'clamp' in operation:
+                value = min(max(value, low), high)
+            column[i] = value
+
+    def changes(self) -> tuple:
+        """
+        Gets the cells whose value changed, missing cells excluded.
+
+        Args:
+            None
+
+        Returns:
+            tuple: qualified keys of the changed cells, and their new values
+
+        """
+        keys, values = [], []
+        for name, column in self.columns.items():
+            if np is not None:
+                changed = np.flatnonzero((column != self.original[name]) & ~np.isnan(column)).tolist()
+            else:
+                original = self.original[name]
+                changed = [i for i, value in enumerate(column) if value != original[i] and not math.isnan(value)]
+            cell_keys = self.keys[name]
+            changed = [i for i in changed if cell_keys[i] is not None]
+            keys.extend(cell_keys[i] for i in changed)
+            values.extend(float(column[i]) for i in changed)
+        return keys, values
+
+    def save(self,
+        config: object
+    ) -> int:
+        """
+        Writes the changed cells back into the config, in a single pass. Each
+        field keeps its type, values of int fields being rounded.
+
+        Args:
+            config (Config or BinaryConfig) : parsed config the table was gathered from
+
+        Returns:
+            int: number of changed cells
+
+        """
+        keys, values = self.changes()
+        if isinstance(config, Config):
+            for key, value in zip(keys, values):
+                config.set(key, __format_value__(config.index[key].kind, value))
+        else:
+            config.set_numbers(keys, values)
+        self.original = {name: __column__(column) for name, column in self.columns.items()}
+        return len(keys)
+
+@trace.traced('table')
+def edit_config(
+    config    : object,
+    operations: list
+) -> int:
+    """
+    Edits the tables of a parsed config.
+
+    Args:
+        config     (Config or BinaryConfig) : parsed config
+        operations (list)                   : column edits, in the order they're applied (see Table.edit)
+
+    Returns:
+        int: number of changed cells
+
+    Raises:
+        KeyError: no such column
+        ValueError: malformed operation
+
+    """
+    table = Table(config)
+    for operation in operations:
+        table.edit(operation)
+    return table.save(config)
+
+####################          Utility functions          ####################
+
+def __numbers__(
+    config: object
+) -> list:
+    """
+    Utility function that lists the keys of a parsed config holding a number.
+
+    Args:
+        config (Config or BinaryConfig) : parsed config
+
+    Returns:
+        list: qualified keys of the int and float values, in the order of the file
+
+    """
+    if isinstance(config, Config):
+        return [key for key, node in config.index.items() if node.kind in ('int', 'float')]
+    return [key for key, node_index in config.index.items()
+            if config.node(node_index)[3] in (csffbs.T_INT, csffbs.T_FLOAT)]
+
+def __column__(
+    values: object
+) -> object:
+    """
+    Utility function that makes a column of floats.
+
+    Args:
+        values (object) : values of the column
+
+    Returns:
+        object: NumPy array, or array of the standard library without NumPy
+
+    """
+    if np is not None:
+        return np.array(values, dtype=np.float64)
+    return array.array('d', values)
+
+def __format_value__(
+    kind : str,
+    value: float
+) -> str:
+    """
+    Utility function that formats the new value of a field, keeping its type.
+
+    Args:
+        kind  (str)   : kind of the field ('int' or 'float')
+        value (float) : new value
+
+    Returns:
+        str: text of the value
+
+    """
+    return str(int(round(value))) if kind == 'int' else csffbs.format_float(value)
@@ -0,0 +1,321 @@
+"""Module tracing timed spans of the Mod Manager operations, exported as Chrome trace JSON.
+
+Tracing is disabled by default, and then costs a single check per span. It is
+enabled by setting the MODSMGR_TRACE environment variable (or passing --trace
+on the command line) to the path of the trace file, written at exit together
+with a summary table. The trace opens in chrome://tracing or ui.perfetto.dev.
+Worker processes write their spans to their own file, suffixed with their pid,
+which the main process merges into the trace.
+"""
+
+import atexit
+import functools
+import json
+import os
+import time
+# thread ids, without importing threading on the startup of quick commands
+from _thread import get_ident
+
+# environment variable holding the path of the trace file
+ENV_VAR = 'MODSMGR_TRACE'
+
+class Span:
+    """Timed span of an operation, with the bytes it read and wrote."""
+
+    __slots__ = ('name', 'category', 'args', 'start', 'read', 'written')
+
+    # name and category of the span (e.g. 'materialize', 'store')
+    name    : str
+    category: str
+
+    # details of the operation (e.g. the path of the file)
+    args: dict
+
+    # start time in ns
+    start: int
+
+    # bytes read and written by the operation
+    read   : int
+    written: int
+
+    def __init__(self,
+        name    : str,
+        category: str,
+        args    : dict
+    ):
+        """
+        Constructor method to initialize a span, not started yet.
+
+        Args:
+            name     (str)  : name of the span
+            category (str)  : category of the span
+            args     (dict) : details of the operation
+
+        Returns:
+            None
+
+        """
+        self.name = name
+        self.category = category
+        self.args = args
+        self.start = 0
+        self.read = 0
+        self.written = 0
+
+    def add(self,
+        read   : int = 0,
+        written: int = 0
+    ):
+        """
+        Accounts bytes read and written by the operation.
+
+        Args:
+            read    (int) : bytes read
+            written (int) : bytes written
+
+        Returns:
+            None
+
+        """
+        self.read += read
+        self.written += written
+
+    def __enter__(self) -> 'Span':
+        """Starts the span."""
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc_info):
+        """Ends the span, recording it as a complete Chrome trace event."""
+        end = time.perf_counter_ns()
+        args = {key: str(value) for key, value in self.args.items()}
+        if self.read:
+            args['bytes_read'] = self.read
+        if self.written:
+            args['bytes_written'] = self.written
+        if exc_info[0] is not None:
+            args['error'] = exc_info[0].__name__
+        __events__.append({
+            'name': self.name,
+            'cat' : self.category,
+            'ph'  : 'X',
+            'ts'  : (self.start - __origin__) / 1000,
+            'dur' : (end - self.start) / 1000,
+            'pid' : os.getpid(),
+            'tid' : get_ident(),
+            'args': args
+        })
+
+class NullSpan:
+    """Span of a disabled tracer, doing nothing."""
+
+    __slots__ = ()
+
+    def add(self,
+        read   : int = 0,
+        written: int = 0
+    ):
+        """
+        Ignores the bytes read and written by the operation.
+
+        Args:
+            read    (int) : bytes read
+            written (int) : bytes written
+
+        Returns:
+            None
+
+        """
+
+    def __enter__(self) -> 'NullSpan':
+        """Does nothing."""
+        return self
+
+    def __exit__(self, *exc_info):
+        """Does nothing, letting exceptions propagate."""
+        return None
+
+NULL_SPAN = NullSpan()
+
+# recorded events, None when tracing is disabled
+__events__ = None
+
+# path of the trace file
+__output__ = None
+
+# reference time of the trace, in ns
+__origin__ = 0
+
+# defines if the process is a worker, whose spans are merged by the main process
+__worker__ = False
+
+def span(
+    name    : str,
+    category: str = 'modsmgr',
+    **args
+) -> Span:
+    """
+    Opens a span around an operation, to be used as a context manager.
+
+    Args:
+        name     (str)  : name of the span
+        category (str)  : category of the span
+        args     (dict) : details of the operation
+
+    Returns:
+        Span: the span, a shared no-op span when tracing is disabled
+
+    """
+    if __events__ is None:
+        return NULL_SPAN
+    return Span(name, category, args)
+
+def traced(
+    category: str
+) -> object:
+    """
+    Decorates a function so that each call is wrapped in a span named after it.
+
+    Args:
+        category (str) : category of the spans
+
+    Returns:
+        object: the decorator
+
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if __events__ is None:
+                return func(*args, **kwargs)
+            with Span(func.__name__, category, {}):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def enable(
+    output: str
+):
+    """
+    Enables tracing, the trace being written at exit.
+
+    Args:
+        output (str) : path of the trace file
+
+    Returns:
+        None
+
+    """
+    global __events__, __output__, __origin__
+    if __events__ is None:
+        __events__ = []
+        __origin__ = time.perf_counter_ns()
+        atexit.register(finish)
+    __output__ = output
+
+def enabled() -> bool:
+    """
+    Checks if tracing is enabled.
+
+    Args:
+        None
+
+    Returns:
+        bool: True if spans are recorded
+
+    """
+    return __events__ is not None
+
+def enable_worker():
+    """
+    Makes a worker process, if tracing, write its spans to a file of its own
+    when it exits, next to the trace file and suffixed with its pid, the main
+    process merging them into the trace. Used as the initializer of process pools.
+
+    Args:
+        None
+
+    Returns:
+        None
+
+    """
+    global __events__, __output__, __worker__
+    if __events__ is None or __worker__:
+        return
+    from multiprocessing import util
+
+    # spans copied from the main process by fork are its own
+    __events__ = []
+    __output__ = f'{__output__}.{os.getpid()}'
+    __worker__ = True
+    # worker processes exit without running the atexit handlers
+    util.Finalize(None, finish, exitpriority=0)
+
+def finish():
+    """
+    Writes the recorded spans as a Chrome trace, with the spans of the workers,
+    and prints their summary.
+
+    Args:
+        None
+
+    Returns:
+        None
+
+    """
+    if __events__ is None:
+        return
+    events = list(__events__)
+    __events__.clear()
+    if not __worker__:
+        folder, name = os.path.split(os.path.abspath(__output__))
+        for file_name in sorted(os.listdir(folder)):
+            if file_name.startswith(name + '.') and file_name[len(name) + 1:].isdigit():
+                worker_path = os.path.join(folder, file_name)
+                try:
+                    with open(worker_path, 'r', encoding='utf-8') as handle:
+                        events.extend(json.load(handle)['traceEvents'])
+                except (ValueError, KeyError):
+                    pass
+                os.unlink(worker_path)
+    if not events:
+        return
+    with open(__output__, 'w', encoding='utf-8') as handle:
+        json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, handle)
+    if __worker__:
+        return
+
+    print(f'> Trace written to "{__output__}"')
+    print(summary(events))
+
+def summary(
+    events: list
+) -> str:
+    """
+    Summarizes spans by name, slowest first.
+
+    Args:
+        events (list) : recorded Chrome trace events
+
+    Returns:
+        str: summary table
+
+    """
+    totals = {}
+    for event in events:
+        key = (event['cat'], event['name'])
+        count, duration, read, written = totals.get(key, (0, 0.0, 0, 0))
+        totals[key] = (count + 1,
+                       duration + event['dur'],
+                       read + event['args'].get('bytes_read', 0),
+                       written + event['args'].get('bytes_written', 0))
+
+    lines = [f'{"span":<32} {"calls":>6} {"total ms":>10} {"mean ms":>9} {"read KiB":>10} {"written KiB":>11}']
+    for (category, name), (count, duration, read, written) in \
+            sorted(totals.items(), key=lambda item: -item[1][1]):
+        lines.append(f'{category + "." + name:<32} {count:>6} {duration / 1000:>10.2f} '
+                     f'{duration / 1000 / count:>9.3f} {read / 1024:>10.1f} {written / 1024:>11.1f}')
+    return '\n'.join(lines)
+
+if os.environ.get(ENV_VAR):
+    enable(os.environ[ENV_VAR])
@@ -0,0 +1,182 @@
+"""Module copying large files in aligned chunks, resumable after an interruption.
+
+The copy is written to a partial file next to a checkpoint, recording the stat
+signature of the source and the checksum of every chunk written so far. When
+a copy of the same source is started again, the chunks whose checksum still
+matches are kept, and the copy resumes after them. Progress and throughput are
+reported while copying.
+"""
+
+import json
+import os
+import time
+import zlib
+from pathlib import Path
+
+from . import trace
+
+# files below this size are copied at once
+COPY_THRESHOLD = 64 << 20
+
+# size of the copied chunks, a multiple of the page and sector sizes
+CHUNK_SIZE = 8 << 20
+
+# bytes copied between two checkpoints
+CHECKPOINT_SIZE = 64 << 20
+
+# seconds between two progress reports
+PROGRESS_INTERVAL = 1.0
+
+# file name suffix of the partial copies, and of their checkpoints
+SUFFIX = '.part'
+CHECKPOINT_SUFFIX = '.json'
+
+@trace.traced('transfer')
+def copy(
+    from_path: Path,
+    to_path  : Path,
+    part_path: Path   = None,
+    progress : object = None
+):
+    """
+    Copies a file in chunks, resuming an interrupted copy of the same source.
+
+    Args:
+        from_path (Path)   : absolute path of the source file
+        to_path   (Path)   : absolute path of the copy, replaced once complete
+        part_path (Path)   : absolute path of the partial copy, kept across runs, next to to_path if None
+        progress  (object) : function called with (copied, total, bytes per second), printing if None
+
+    Returns:
+        None
+
+    Raises:
+        FileNotFoundError: missing source file
+
+    """
+    if part_path is None:
+        part_path = to_path.with_name(to_path.name + SUFFIX)
+    if progress is None:
+        progress = __print_progress__(from_path)
+    checkpoint_path = part_path.with_name(part_path.name + CHECKPOINT_SUFFIX)
+
+    stat = os.stat(from_path)
+    checkpoint = {
+        'source'    : [stat.st_size, stat.st_mtime_ns],
+        'chunk_size': CHUNK_SIZE,
+        'checksums' : []
+    }
+    checkpoint['checksums'] = __resume__(part_path, checkpoint_path, checkpoint)
+    copied = len(checkpoint['checksums']) * CHUNK_SIZE
+
+    buffer = memoryview(bytearray(CHUNK_SIZE))
+    start, last_report, resumed = time.perf_counter(), 0.0, copied
+    part_path.parent.mkdir(parents=True, exist_ok=True)
+    with trace.span('chunks', 'transfer', path=from_path) as span, \
+         open(from_path, 'rb', buffering=0) as source, \
+         open(part_path, 'r+b' if copied else 'wb', buffering=0) as target:
+        source.seek(copied)
+        target.seek(copied)
+        target.truncate()
+        while True:
+            length = source.readinto(buffer)
+            if not length:
+                break
+            target.write(buffer[:length])
+            checkpoint['checksums'].append(zlib.crc32(buffer[:length]))
+            copied += length
+            span.add(read=length, written=length)
+
+            if copied % CHECKPOINT_SIZE < CHUNK_SIZE:
+                __write_checkpoint__(checkpoint_path, checkpoint)
+            now = time.perf_counter()
+            if now - last_report >= PROGRESS_INTERVAL:
+                progress(copied, stat.st_size, (copied - resumed) / max(now - start, 1e-9))
+                last_report = now
+
+    now = time.perf_counter()
+    progress(copied, stat.st_size, (copied - resumed) / max(now - start, 1e-9))
+    os.replace(part_path, to_path)
+    try:
+        os.unlink(checkpoint_path)
+    except FileNotFoundError:
+        pass
+
+####################          Utility functions          ####################
+
+def __resume__(
+    part_path      : Path,
+    checkpoint_path: Path,
+    checkpoint     : dict
+) -> list:
+    """
+    Utility function that finds the chunks of a partial copy that can be kept:
+    those recorded by a checkpoint of the same source, whose checksum matches.
+
+    Args:
+        part_path       (Path) : absolute path of the partial copy
+        checkpoint_path (Path) : absolute path of its checkpoint
+        checkpoint      (dict) : checkpoint of the copy to be made
+
+    Returns:
+        list: checksums of the chunks kept, none if the copy starts over
+
+    """
+    try:
+        with open(checkpoint_path, 'r', encoding='utf-8') as handle:
+            previous = json.load(handle)
+        if previous['source'] != checkpoint['source'] or previous['chunk_size'] != checkpoint['chunk_size']:
+            return []
+
+        kept = []
+        with open(part_path, 'rb', buffering=0) as handle:
+            buffer = memoryview(bytearray(CHUNK_SIZE))
+            for checksum in previous['checksums']:
+                length = handle.readinto(buffer)
+                if length != CHUNK_SIZE or zlib.crc32(buffer[:length]) != checksum:
+                    break
+                kept.append(checksum)
+    except (FileNotFoundError, ValueError, KeyError, TypeError):
+        return []
+
+    if kept:
+        print(f'> Resuming copy of "{part_path.name}" after {len(kept) * CHUNK_SIZE >> 20} MiB...')
+    return kept
+
+def __write_checkpoint__(
+    checkpoint_path: Path,
+    checkpoint     : dict
+):
+    """
+    Utility function that atomically writes the checkpoint of a copy.
+
+    Args:
+        checkpoint_path (Path) : absolute path of the checkpoint
+        checkpoint      (dict) : source signature, chunk size and checksums of the chunks written
+
+    Returns:
+        None
+
+    """
+    tmp_path = checkpoint_path.with_name(checkpoint_path.name + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as handle:
+        json.dump(checkpoint, handle)
+    os.replace(tmp_path, checkpoint_path)
+
+def __print_progress__(
+    from_path: Path
+) -> object:
+    """
+    Utility function that makes a progress function printing the progress of a copy.
+
+    Args:
+        from_path (Path) : absolute path of the source file
+
+    Returns:
+        object: function called with (copied, total, bytes per second)
+
+    """
+    def progress(copied: int, total: int, rate: float):
+        print(f'> Copying "{from_path.name}": {copied >> 20}/{total >> 20} MiB '
+              f'({100 * copied // max(total, 1)}%, {rate / (1 << 20):.1f} MiB/s)')
+    return progress
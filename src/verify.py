@@ -0,0 +1,204 @@
+"""Module verifying the game files of an install against the known-good variants.
+
+The config files and the exe are hashed on the thread pool of a pipeline,
+through large read buffers: hashlib releases the GIL while hashing them, so
+verifying a large install is bound by the disk throughput. Digests are cached
+by stat signature in the index of the store, so files left unchanged since the
+last run are not read again. Each file is then matched against the manifests
+of the `orig`, `demo` and `wsfix` variants, and against the files of the
+selections of mods in the cache.
+"""
+
+from pathlib import Path
+
+from . import backup
+from . import cache
+from . import plan
+from . import store
+from . import trace
+from .pipeline import Pipeline, Task
+from .paths import PATH, home
+
+# game files verified, relative to the install root
+PATTERNS = ((PATH.CFG.value / '*.cfg').as_posix(), PATH.EXE.value.as_posix())
+
+class Check:
+    """Outcome of the verification of a game file."""
+
+    __slots__ = ('path', 'digest', 'matches')
+
+    # path of the file, relative to the install root
+    path: Path
+
+    # hex digest of the file, None if missing
+    digest: str
+
+    # variants the file matches (e.g. 'orig'), else the selection of mods it matches (e.g. 'mods wsfix')
+    matches: list
+
+    def __init__(self,
+        path   : Path,
+        digest : str,
+        matches: list
+    ):
+        """
+        Constructor method to initialize the verification of a file.
+
+        Args:
+            path    (Path) : path of the file, relative to the install root
+            digest  (str)  : hex digest of the file, None if missing
+            matches (list) : variants and selections of mods the file matches
+
+        Returns:
+            None
+
+        """
+        self.path = path
+        self.digest = digest
+        self.matches = matches
+
+    @property
+    def ok(self) -> bool:
+        """
+        Checks if the file matches a known-good variant or selection of mods.
+
+        Args:
+            None
+
+        Returns:
+            bool: True if the file is known-good
+
+        """
+        return bool(self.matches)
+
+    def __str__(self) -> str:
+        """Describes the outcome."""
+        if self.digest is None:
+            status = 'missing'
+        elif self.matches:
+            status = ', '.join(self.matches)
+        else:
+            status = 'unknown contents'
+        return f'{"ok  " if self.ok else "FAIL"} {self.path.as_posix():<24} {status}'
+
+@trace.traced('verify')
+def verify(
+    task: Task = None
+) -> list:
+    """
+    Verifies the config files and the exe of the install against the known-good
+    variants and selections of mods. Files of the variants missing from the
+    install are reported too.
+
+    Args:
+        task (Task) : task reporting the progress and checking for cancellation, if any
+
+    Returns:
+        list: checks of the files, sorted by path
+
+    Raises:
+        CancelledError: task cancelled
+
+    """
+    known = variants(task)
+    selections = {}
+    for mod_ids in cache.selections():
+        try:
+            entries = plan.selection_entries(mod_ids)
+        except (KeyError, FileNotFoundError):
+            continue
+        selections['mods ' + (' '.join(mod_ids) or '(original)')] = {Path(rel_path): digest
+                                                                      for rel_path, digest in entries.items()}
+
+    rel_paths = {Path(rel_path) for entries in [*known.values(), *selections.values()] for rel_path in entries}
+    rel_paths.update(abs_path.relative_to(home()) for pattern in PATTERNS for abs_path in home().glob(pattern))
+    rel_paths = sorted(rel_path for rel_path in rel_paths if any(rel_path.match(pattern) for pattern in PATTERNS))
+
+    digests = __hash_files__([home() / rel_path for rel_path in rel_paths], task)
+    checks = []
+    for rel_path, digest in zip(rel_paths, digests):
+        matches = [name for name, entries in known.items() if digest is not None and entries.get(rel_path) == digest]
+        if not matches:
+            # edited by mods: the most recently used selection it matches
+            matches = [name for name, entries in selections.items()
+                       if digest is not None and entries.get(rel_path) == digest][:1]
+        checks.append(Check(rel_path, digest, matches))
+    return checks
+
+@trace.traced('verify')
+def variants(
+    task: Task = None
+) -> dict:
+    """
+    Gets the files of the known-good variants, from their manifests in the
+    store, or by hashing their folders if they were never stored.
+
+    Args:
+        task (Task) : task reporting the progress and checking for cancellation, if any
+
+    Returns:
+        dict: variant name -> {path relative to the install root: digest}
+
+    """
+    known = {}
+    folders = {}
+    for name, rel_path in backup.VARIANTS.items():
+        prefix = Path(rel_path).as_posix().rstrip('/') + '/'
+        manifest = store.load_manifest(name)
+        if manifest:
+            known[name] = {Path(key[len(prefix):]): digest for key, digest in manifest.items() if key.startswith(prefix)}
+        elif Path.is_dir(home() / rel_path):
+            folders[name] = [abs_path for abs_path in sorted((home() / rel_path).rglob('*')) if abs_path.is_file()]
+
+    abs_paths = [abs_path for files in folders.values() for abs_path in files]
+    digests = iter(__hash_files__(abs_paths, task))
+    for name, files in folders.items():
+        known[name] = {abs_path.relative_to(home() / backup.VARIANTS[name]): next(digests) for abs_path in files}
+    return known
+
+####################          Utility functions          ####################
+
+def __hash_files__(
+    abs_paths: list,
+    task     : Task = None
+) -> list:
+    """
+    Utility function that hashes files on the thread pool of a pipeline, unless
+    their digest is cached for their stat signature.
+
+    Args:
+        abs_paths (list) : absolute paths of the files
+        task      (Task) : task reporting the progress and checking for cancellation, if any
+
+    Returns:
+        list: hex digest of each file, None for missing files
+
+    Raises:
+        CancelledError: task cancelled
+
+    """
+    operations = Pipeline()
+    for abs_path in abs_paths:
+        operations.add(abs_path, __digest__, abs_path)
+    try:
+        return operations.run(task=task)
+    finally:
+        store.save_index()
+
+def __digest__(
+    abs_path: Path
+) -> str:
+    """
+    Utility function that gets the digest of a file, if it exists.
+
+    Args:
+        abs_path (Path) : absolute path of the file
+
+    Returns:
+        str: hex digest of the file, None if missing
+
+    """
+    try:
+        return store.digest_path(abs_path)
+    except (FileNotFoundError, NotADirectoryError, IsADirectoryError):
+        return None